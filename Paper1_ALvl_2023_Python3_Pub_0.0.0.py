@@ -3,12 +3,64 @@
 # written by the AQA Programmer Team
 # developed in the Python 3.9 programming environment
 
+import argparse
+import array
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import math
+import mmap
+import multiprocessing.shared_memory
+import os
 import random
+import secrets
+import struct
+import sys
+import time
+import tracemalloc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# An action that is never legal, so applying it just passes the turn. It is used when GenerateLegalMoves finds no moves
+PASS_ACTION = (0, 1, 0, 0)
+
+
+def CheckAction(Action):
+    """
+    It checks that an action names a position in the queue that exists for the offer to replace and a move option that
+    can be used, so that a badly formed action is never half played. The squares are not checked here, as a move to or
+    from the wrong square just loses the turn
+
+    :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+    """
+    ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+    if ReplaceChoice not in range(0, 6):
+        raise ValueError("the move option the offer replaces must be from 0 (none) to 5, not " + str(ReplaceChoice))
+    if Choice not in range(1, 4):
+        raise ValueError("the move option to use must be from 1 to 3, not " + str(Choice))
+
+
+# When PlayGame shows the board: before every turn, before every Nth turn, only once the game is over, or not at all
+DISPLAY_POLICIES = ("always", "every", "final", "never")
+
+# The fixed layout of Dastan.ToBytes: the number of rows, columns and pieces (two bytes each, so boards wider or taller
+# than 255 squares can be packed), the move option offer position, the flags (1 if it is Player Two's turn, 2 if the
+# game is over) and the two scores, then each player's queue as five indexes into MOVE_OPTION_NAMES, then one byte for
+# each square, 0 if it is empty or the hashing kind of its piece plus 1
+PACKED_STATE_HEADER = struct.Struct("<HHHBBii")
 
 
 # It's a class that represents a game of Dastan
 class Dastan:
-    def __init__(self, R, C, NoOfPieces):
+    # When True, the incrementally tracked game state is checked against a full scan of the board after every turn
+    DebugChecks = False
+
+    def __init__(self, R, C, NoOfPieces, Seed=None):
         """
         It creates a board, creates two players, creates a list of move options, creates a list of move options offered,
         creates pieces, and sets the current player to the first player
@@ -16,7 +68,14 @@ class Dastan:
         :param R: Number of rows
         :param C: The number of columns in the board
         :param NoOfPieces: The number of pieces each player has
+        :param Seed: The seed for this game's random number generator, or None for a different game every time; a seed is
+        picked at random then, so that the game can still be recorded and played again. It must be an integer from 0 to
+        2 ** 63 - 1, as that is what a game record can hold
         """
+        if R < 4 or C < 2 or NoOfPieces < 1 or NoOfPieces > C - 1:
+            raise ValueError("a board needs at least 4 rows and 2 columns, and from 1 to (columns - 1) pieces")
+        if Seed is not None and (not isinstance(Seed, int) or isinstance(Seed, bool) or not 0 <= Seed < 2 ** 63):
+            raise ValueError("a seed must be an integer from 0 to 2 ** 63 - 1, not " + repr(Seed))
         self._Board = []
         self._Players = []
         self._MoveOptionOffer = []
@@ -25,51 +84,186 @@ class Dastan:
         self.__CreateMoveOptions()
         self._NoOfRows = R
         self._NoOfColumns = C
+        self._NoOfPieces = NoOfPieces
+        # a square reference is the row number followed by the column number, written with as many digits as the widest
+        # column number needs: 34 is row 3, column 4 on a 6x6 board, and 304 is the same square on a 12x12 board
+        self._ReferenceBase = 10 ** len(str(C))
         self._MoveOptionOfferPosition = 0
+        self._MirzaIndexes = [None, None]
+        self._MirzaAlive = [False, False]
+        self._ScoringSquareIndexes = []
+        self._PointsForOccupancy = [None, None]
+        self._SquareReferences = []
+        self._UndoStack = []
+        self._Controllers = [None, None]
+        self._MoveLog = []
+        self._Profiler = None
+        self._DisplayPolicy = "always"
+        self._DisplayEvery = 1
+        self._Displaying = True
+        self._Input = None
+        self._Output = None
+        self._RowText = [None] * R
+        self._DirtyRows = set(range(R))
+        if Seed is None:
+            Seed = random.getrandbits(63)
+        self._Seed = Seed
+        self._Random = random.Random(Seed)
         self.__CreateMoveOptionOffer()
         self.__CreateBoard()
         self.__CreatePieces(NoOfPieces)
         self._CurrentPlayer = self._Players[0]
+        self._GameOver = False
+        self._ZobristKeys = GetZobristKeys(self._NoOfRows * self._NoOfColumns)
+        self._Hash = self.__CalculateHash()
+        self._AttackTargets = GetAttackTargets(R, C)
+        self._AttackCounts, self._AttackMasks, self._PieceMasks = self.__CalculateAttackMaps()
 
-    def __DisplayBoard(self):
+    def __RenderRow(self, Row):
         """
-        The function prints the board, with the column numbers at the top, the row numbers on the left, and the pieces in
-        the squares
+        It returns the text for one row of the board: the row number and then each square's symbol and piece
+
+        :param Row: The row number, starting from 0
+        :return: The row of the board as a string.
         """
-        print("\n" + "   ", end="")
-        for Column in range(1, self._NoOfColumns + 1):
-            print(str(Column) + "  ", end="")
-        print("\n" + "  ", end="")
-        for Count in range(1, self._NoOfColumns + 1):
-            print("---", end="")
-        print("-")
-        for Row in range(1, self._NoOfRows + 1):
-            print(str(Row) + " ", end="")
-            for Column in range(1, self._NoOfColumns + 1):
-                Index = self.__GetIndexOfSquare(Row * 10 + Column)
-                print("|" + self._Board[Index].GetSymbol(), end="")
-                PieceInSquare = self._Board[Index].GetPieceInSquare()
-                if PieceInSquare is None:
-                    print(" ", end="")
-                else:
-                    print(PieceInSquare.GetSymbol(), end="")
-            print("|")
-        print("  -", end="")
-        for Column in range(1, self._NoOfColumns + 1):
-            print("---", end="")
-        print()
-        print()
+        Parts = [str(Row + 1).rjust(len(str(self._NoOfRows))), " "]
+        for Index in range(Row * self._NoOfColumns, (Row + 1) * self._NoOfColumns):
+            PieceInSquare = self._Board[Index].GetPieceInSquare()
+            Parts.append("|" + self._Board[Index].GetSymbol())
+            Parts.append(" " if PieceInSquare is None else PieceInSquare.GetSymbol())
+        Parts.append("|\n")
+        return "".join(Parts)
+
+    def __RenderBoard(self):
+        """
+        The function returns the board, with the column numbers at the top, the row numbers on the left, and the pieces in
+        the squares. Only the rows that have changed since the last time are rendered again
+        :return: The board as a string.
+        """
+        Header, Footer = GetBoardFrame(self._NoOfRows, self._NoOfColumns)
+        for Row in self._DirtyRows:
+            self._RowText[Row] = self.__RenderRow(Row)
+        self._DirtyRows.clear()
+        return Header + "".join(self._RowText) + Footer
 
     def __DisplayState(self):
         """
-        It displays the board, the move option offer, the current player's state, and the current player's name
+        It displays the board, the move option offer, the current player's state, and the current player's name, all with
+        one write. Nothing is rendered on a turn that is not being shown
+        """
+        if not self._Displaying:
+            return
+        Profiler = self._Profiler
+        if Profiler is not None:
+            Started = Profiler.Clock()
+        self.__Write(self.__RenderBoard() + "Move option offer: " + self._MoveOptionOffer[self._MoveOptionOfferPosition] +
+                     "\n\n" + self._CurrentPlayer.GetPlayerStateAsString() + "\nTurn: " + self._CurrentPlayer.GetName() +
+                     "\n\n")
+        if Profiler is not None:
+            Profiler.AddTime("rendering", Started)
+
+    def __Write(self, Text):
+        """
+        It writes the text to the screen, unless the display policy means this turn is not being shown
+
+        :param Text: The text to write
+        """
+        if self._Displaying:
+            self.__Send(Text)
+
+    def __Send(self, Text):
+        """
+        It writes the text to the output sink, or to the screen if there is not one, whatever the display policy
+
+        :param Text: The text to write
+        """
+        if self._Output is None:
+            sys.stdout.write(Text)
+        else:
+            self._Output(Text)
+
+    def __ReadLine(self, Prompt):
+        """
+        It asks the input source for a line, or the keyboard if there is not one. An answer from an input source is written
+        to the output sink after its prompt, as it would have been shown if it had been typed
+
+        :param Prompt: The question to ask
+        :return: The answer, without a newline.
+        """
+        if self._Input is None:
+            return input(Prompt)
+        Answer = self._Input(Prompt)
+        self.__Send(Prompt + Answer + "\n")
+        return Answer
+
+    def __ReadInteger(self, Prompt):
+        """
+        It asks for a whole number until it gets one
+
+        :param Prompt: The question to ask
+        :return: The number.
+        """
+        while True:
+            Answer = self.__ReadLine(Prompt)
+            try:
+                return int(Answer)
+            except ValueError:
+                self.__Send("Please enter a whole number\n")
+
+    def SetDisplayPolicy(self, Policy, Every=1):
+        """
+        It sets when PlayGame shows the board, which saves time when games are piped to a log or played over a slow
+        connection. What happens on a turn that is not shown is not written out either
+
+        :param Policy: "always", "every" for every Nth turn, "final" to show only the end of the game, or "never"
+        :param Every: N for the "every" policy
+        """
+        if Policy not in DISPLAY_POLICIES:
+            raise ValueError("unknown display policy: " + str(Policy))
+        if Every < 1:
+            raise ValueError("Every must be at least 1")
+        self._DisplayPolicy = Policy
+        self._DisplayEvery = Every
+
+    def GetDisplayPolicy(self):
+        """
+        It returns when PlayGame shows the board
+        :return: A tuple (Policy, Every).
+        """
+        return self._DisplayPolicy, self._DisplayEvery
+
+    def SetInputSource(self, Source):
+        """
+        It sets where PlayGame gets the human players' answers from, so that a game can be played from a script or by a
+        program without a keyboard. The source is called with each prompt, just as the built-in input is, and raises
+        EOFError when it has no more answers, which stops the game
+
+        :param Source: A function that takes the prompt and returns the answer, such as a ScriptedInput or a PolicyInput,
+        or None for the keyboard
+        """
+        self._Input = Source
+
+    def SetOutputSink(self, Sink):
         """
-        self.__DisplayBoard()
-        print("Move option offer: " + self._MoveOptionOffer[self._MoveOptionOfferPosition])
-        print()
-        print(self._CurrentPlayer.GetPlayerStateAsString())
-        print("Turn: " + self._CurrentPlayer.GetName())
-        print()
+        It sets where PlayGame writes to. Each board is written in one piece, so a list's append method captures one frame
+        per call, and DiscardOutput throws everything away
+
+        :param Sink: A function that takes the text to write, or None for the screen
+        """
+        self._Output = Sink
+
+    def __IsTurnDisplayed(self, TurnNumber):
+        """
+        It works out from the display policy whether a turn is shown
+
+        :param TurnNumber: The number of the turn, starting from 1
+        :return: A boolean value.
+        """
+        if self._DisplayPolicy == "always":
+            return True
+        if self._DisplayPolicy == "every":
+            return (TurnNumber - 1) % self._DisplayEvery == 0
+        return False
 
     def __GetIndexOfSquare(self, SquareReference):
         """
@@ -78,8 +272,8 @@ class Dastan:
         :param SquareReference: The reference of the square you want to get the index of
         :return: The index of the square in the list of squares.
         """
-        Row = SquareReference // 10
-        Col = SquareReference % 10
+        Row = SquareReference // self._ReferenceBase
+        Col = SquareReference % self._ReferenceBase
         return (Row - 1) * self._NoOfColumns + (Col - 1)
 
     def __CheckSquareInBounds(self, SquareReference):
@@ -89,8 +283,8 @@ class Dastan:
         :param SquareReference: The square reference of the square you want to check
         :return: a boolean value.
         """
-        Row = SquareReference // 10
-        Col = SquareReference % 10
+        Row = SquareReference // self._ReferenceBase
+        Col = SquareReference % self._ReferenceBase
         if Row < 1 or Row > self._NoOfRows:
             return False
         elif Col < 1 or Col > self._NoOfColumns:
@@ -128,7 +322,26 @@ class Dastan:
 
     def __CheckIfGameOver(self):
         """
-        If a mirza is in a kotla that does not belong to the player who owns the mirza, the game is over
+        The game is over if either mirza has been captured, or if a mirza is in a kotla that does not belong to the player
+        who owns the mirza. The mirzas are tracked by __UpdateBoard, so only their two squares need to be looked at
+        :return: a boolean value.
+        """
+        GameOver = False
+        for PlayerIndex in range(2):
+            if not self._MirzaAlive[PlayerIndex]:
+                GameOver = True
+            else:
+                S = self._Board[self._MirzaIndexes[PlayerIndex]]
+                if S.ContainsKotla() and not self._Players[PlayerIndex].SameAs(S.GetBelongsTo()):
+                    GameOver = True
+        if Dastan.DebugChecks:
+            assert GameOver == self.__CheckIfGameOverByScanningBoard(), "tracked mirzas do not match the board"
+        return GameOver
+
+    def __CheckIfGameOverByScanningBoard(self):
+        """
+        If a mirza is in a kotla that does not belong to the player who owns the mirza, the game is over. This looks at
+        every square, so it is only used to check the tracked mirzas when DebugChecks is on
         :return: a boolean value.
         """
         Player1HasMirza = False
@@ -155,22 +368,92 @@ class Dastan:
         :param Description: The description of the square you want to get
         :return: The square reference is being returned.
         """
-        SelectedSquare = int(input("Enter the square " + Description + " (row number followed by column number): "))
-        return SelectedSquare
+        while True:
+            Answer = self.__ReadLine("Enter the square " + Description + " (row number followed by column number): ")
+            Parts = Answer.replace(",", " ").split()
+            try:
+                if len(Parts) == 2:
+                    SelectedSquare = self.GetSquareReference(int(Parts[0]), int(Parts[1]))
+                else:
+                    SelectedSquare = int(Answer)
+                return SelectedSquare
+            except ValueError:
+                self.__Send("Please enter a row number followed by a column number\n")
 
     def __UseMoveOptionOffer(self):
         """
-        The player chooses a move option from their queue to replace with a new move option from the offer
+        The player chooses a move option from their queue to replace with a new move option from the offer. They are
+        asked again until they choose a position in the queue, so the move log only ever holds one that a game record
+        can store
         """
-        ReplaceChoice = int(input("Choose the move option from your queue to replace (1 to 5): "))
+        while True:
+            ReplaceChoice = self.__ReadInteger("Choose the move option from your queue to replace (1 to 5): ")
+            if 1 <= ReplaceChoice <= 5:
+                break
+            self.__Send("Please enter a number from 1 to 5\n")
+        self.__TakeMoveOptionOffer(ReplaceChoice)
+        # a human can take the offer more than once in a turn, so each time is logged on its own with no move option
+        self._MoveLog.append((ReplaceChoice, 0, 0, 0))
+
+    def __LogTurn(self, Action, MoveLegal):
+        """
+        It adds a turn to the move log. A turn whose move option is not 1 to 3 is logged with move option 1 and no
+        squares, which loses the turn in the same way, so that move option 0 only ever means a human taking the offer
+
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :param MoveLegal: Whether the move was legal, for the profiler's count of illegal moves
+        """
+        if not MoveLegal and self._Profiler is not None:
+            self._Profiler.Count("illegal_moves")
+        if 1 <= Action[1] <= 3:
+            self._MoveLog.append(tuple(Action))
+        else:
+            self._MoveLog.append((Action[0], 1, 0, 0))
+
+    def __TakeMoveOptionOffer(self, ReplaceChoice, NextOfferPosition=None):
+        """
+        It replaces a move option in the current player's queue with the move option on offer, charges the player for it
+        and picks a new move option to offer
+
+        :param ReplaceChoice: The position in the queue (1 to 5) of the move option to replace
+        :param NextOfferPosition: The offer position to use next, or None to pick it at random
+        """
+        PlayerIndex = self.__GetIndexOfPlayer(self._CurrentPlayer)
+        self._Hash ^= self.__GetHashOfQueue(PlayerIndex) ^ self._ZobristKeys.GetOfferKey(self._MoveOptionOfferPosition)
         self._CurrentPlayer.UpdateMoveOptionQueueWithOffer(ReplaceChoice - 1, self.__CreateMoveOption(
             self._MoveOptionOffer[self._MoveOptionOfferPosition], self._CurrentPlayer.GetDirection()))
         self._CurrentPlayer.ChangeScore(-(10 - (ReplaceChoice * 2)))
-        self._MoveOptionOfferPosition = random.randint(0, 4)
+        if NextOfferPosition is None:
+            self._MoveOptionOfferPosition = self._Random.randint(0, 4)
+        else:
+            self._MoveOptionOfferPosition = NextOfferPosition
+        self._Hash ^= self.__GetHashOfQueue(PlayerIndex) ^ self._ZobristKeys.GetOfferKey(self._MoveOptionOfferPosition)
+        if self._Profiler is not None:
+            self._Profiler.Count("offers_taken")
 
     def __GetPointsForOccupancyByPlayer(self, CurrentPlayer):
         """
-        For each square on the board, add the points for occupancy for the current player
+        Only kotlas give points for occupancy, so this adds up the points for the current player from the scoring squares
+        alone. The total is cached for each player until __UpdateBoard changes the piece in a kotla
+
+        :param CurrentPlayer: The player whose score is being adjusted
+        :return: The score adjustment for the current player.
+        """
+        PlayerIndex = self.__GetIndexOfPlayer(CurrentPlayer)
+        if self._PointsForOccupancy[PlayerIndex] is None:
+            ScoreAdjustment = 0
+            for Index in self._ScoringSquareIndexes:
+                ScoreAdjustment += self._Board[Index].GetPointsForOccupancy(CurrentPlayer)
+            self._PointsForOccupancy[PlayerIndex] = ScoreAdjustment
+        if Dastan.DebugChecks:
+            assert self._PointsForOccupancy[PlayerIndex] == self.__GetPointsForOccupancyByScanningBoard(
+                CurrentPlayer), "cached points for occupancy do not match the board"
+        return self._PointsForOccupancy[PlayerIndex]
+
+    def __GetPointsForOccupancyByScanningBoard(self, CurrentPlayer):
+        """
+        For each square on the board, add the points for occupancy for the current player. This is only used to check the
+        cached points when DebugChecks is on
 
         :param CurrentPlayer: The player whose score is being adjusted
         :return: The score adjustment for the current player.
@@ -201,633 +484,6307 @@ class Dastan:
             return self._Board[self.__GetIndexOfSquare(FinishSquareReference)].GetPieceInSquare().GetPointsIfCaptured()
         return 0
 
-    def PlayGame(self):
-        """
-        The function PlayGame() is a while loop that runs until the game is over.
+    def __MakeQueueMove(self, Choice, StartSquareReference, FinishSquareReference):
         """
-        GameOver = False
-        while not GameOver:
-            self.__DisplayState()
-            SquareIsValid = False
-            Choice = 0
-
-            # allows player to choose either a valid move option or the move offer
-            while Choice < 1 or Choice > 3:
-                Choice = int(input("Choose move option to use from queue (1 to 3) or 9 to take the offer: "))
-                if Choice == 9:
-                    self.__UseMoveOptionOffer()
-                    self.__DisplayState()
-
-            # allows the player to select the piece they want to move
-            while not SquareIsValid:
-                StartSquareReference = self.__GetSquareReference("containing the piece to move")
-                SquareIsValid = self.__CheckSquareIsValid(StartSquareReference, True)
-
-            # allows the player to select the position to move the piece to
-            SquareIsValid = False
-            while not SquareIsValid:
-                FinishSquareReference = self.__GetSquareReference("to move to")
-                SquareIsValid = self.__CheckSquareIsValid(FinishSquareReference, False)
-
-            # determines whether the specified move is legal or not
-            MoveLegal = self._CurrentPlayer.CheckPlayerMove(Choice, StartSquareReference, FinishSquareReference)
-            if MoveLegal:
-                # updating game state based on move
-                PointsForPieceCapture = self.__CalculatePieceCapturePoints(FinishSquareReference)
-                self._CurrentPlayer.ChangeScore(-(Choice + (2 * (Choice - 1))))
-                self._CurrentPlayer.UpdateQueueAfterMove(Choice)
-                self.__UpdateBoard(StartSquareReference, FinishSquareReference)
-                self.__UpdatePlayerScore(PointsForPieceCapture)
-                print("New score: " + str(self._CurrentPlayer.GetScore()) + "\n")
-
-            # swapping the currently active player
-            if self._CurrentPlayer.SameAs(self._Players[0]):
-                self._CurrentPlayer = self._Players[1]
-            else:
-                self._CurrentPlayer = self._Players[0]
+        If the move is allowed by the move option in position Choice of the current player's queue, it charges the player
+        for the move option, moves the piece and updates the player's score
 
-            GameOver = self.__CheckIfGameOver()
-
-        self.__DisplayState()
-        self.__DisplayFinalResult()
+        :param Choice: The position in the queue (1 to 3) of the move option being used
+        :param StartSquareReference: The reference of the square that the piece is moving from
+        :param FinishSquareReference: The reference of the square that the piece is moving to
+        :return: True if the move was legal and has been made, otherwise False.
+        """
+        Profiler = self._Profiler
+        if Profiler is not None:
+            Started = Profiler.Clock()
+        MoveLegal = self._CurrentPlayer.CheckPlayerMove(Choice, StartSquareReference, FinishSquareReference,
+                                                        self._ReferenceBase)
+        if Profiler is not None:
+            Started = Profiler.AddTime("validation", Started)
+        if MoveLegal:
+            # updating game state based on move
+            PointsForPieceCapture = self.__CalculatePieceCapturePoints(FinishSquareReference)
+            self._CurrentPlayer.ChangeScore(-(Choice + (2 * (Choice - 1))))
+            if Profiler is not None:
+                Started = Profiler.AddTime("scoring", Started)
+            PlayerIndex = self.__GetIndexOfPlayer(self._CurrentPlayer)
+            self._Hash ^= self.__GetHashOfQueue(PlayerIndex)
+            self._CurrentPlayer.UpdateQueueAfterMove(Choice)
+            self._Hash ^= self.__GetHashOfQueue(PlayerIndex)
+            self.__UpdateBoard(StartSquareReference, FinishSquareReference)
+            if Profiler is not None:
+                Started = Profiler.AddTime("update_board", Started)
+            self.__UpdatePlayerScore(PointsForPieceCapture)
+            if Profiler is not None:
+                Profiler.AddTime("scoring", Started)
+        return MoveLegal
 
-    def __UpdateBoard(self, StartSquareReference, FinishSquareReference):
+    def __CheckAndMakeQueueMove(self, Choice, StartSquareReference, FinishSquareReference):
         """
-        It takes a start square reference and a finish square reference, and it moves the piece from the start square to the
-        finish square
+        It checks that Choice is a position in the queue that can be used and that both squares are valid, and then makes
+        the move if the move option allows it
 
+        :param Choice: The position in the queue (1 to 3) of the move option being used
         :param StartSquareReference: The reference of the square that the piece is moving from
-        :param FinishSquareReference: The square that the piece is moving to
+        :param FinishSquareReference: The reference of the square that the piece is moving to
+        :return: True if the move was legal and has been made, otherwise False.
         """
-        self._Board[self.__GetIndexOfSquare(FinishSquareReference)].SetPiece(
-            self._Board[self.__GetIndexOfSquare(StartSquareReference)].RemovePiece())
+        Profiler = self._Profiler
+        if Profiler is not None:
+            Started = Profiler.Clock()
+        SquaresValid = False
+        if 1 <= Choice <= 3 and self.__CheckSquareIsValid(StartSquareReference, True):
+            SquaresValid = self.__CheckSquareIsValid(FinishSquareReference, False)
+        if Profiler is not None:
+            Profiler.AddTime("validation", Started)
+        return SquaresValid and self.__MakeQueueMove(Choice, StartSquareReference, FinishSquareReference)
 
-    def __DisplayFinalResult(self):
+    def __EndTurn(self):
         """
-        If the scores are equal, print "Draw!", otherwise print the name of the player with the higher score, followed by "
-        is the winner!"
+        It swaps the currently active player and then checks whether the game is over
         """
-        if self._Players[0].GetScore() == self._Players[1].GetScore():
-            print("Draw!")
-        elif self._Players[0].GetScore() > self._Players[1].GetScore():
-            print(self._Players[0].GetName() + " is the winner!")
+        if self._CurrentPlayer.SameAs(self._Players[0]):
+            self._CurrentPlayer = self._Players[1]
         else:
-            print(self._Players[1].GetName() + " is the winner!")
+            self._CurrentPlayer = self._Players[0]
+        self._Hash ^= self._ZobristKeys.GetSideToMoveKey()
+        Profiler = self._Profiler
+        if Profiler is None:
+            self._GameOver = self.__CheckIfGameOver()
+        else:
+            Started = Profiler.Clock()
+            self._GameOver = self.__CheckIfGameOver()
+            Profiler.AddTime("game_over_check", Started)
+            Profiler.Count("turns")
+        if Dastan.DebugChecks:
+            assert self._Hash == self.__CalculateHash(), "incremental hash does not match the position"
+            assert (self._AttackCounts, self._AttackMasks,
+                    self._PieceMasks) == self.__CalculateAttackMaps(), "attack maps do not match the board"
 
-    def __CreateBoard(self):
+    def __GetZobristKindOfPiece(self, APiece):
         """
-        It creates a board with the number of rows and columns specified by the user
+        It numbers the four kinds of piece for hashing: 0 and 1 for Player One's pieces and mirza, 2 and 3 for Player
+        Two's
+
+        :param APiece: The piece
+        :return: The kind of the piece.
         """
-        for Row in range(1, self._NoOfRows + 1):
-            for Column in range(1, self._NoOfColumns + 1):
-                if Row == 1 and Column == self._NoOfColumns // 2:
-                    S = Kotla(self._Players[0], "K")
-                elif Row == self._NoOfRows and Column == self._NoOfColumns // 2 + 1:
-                    S = Kotla(self._Players[1], "k")
-                else:
-                    S = Square()
-                self._Board.append(S)
+        Kind = 2 * self.__GetIndexOfPlayer(APiece.GetBelongsTo())
+        if APiece.GetTypeOfPiece() == "mirza":
+            Kind += 1
+        return Kind
 
-    def __CreatePieces(self, NoOfPieces):
+    def __GetHashOfQueue(self, PlayerIndex):
         """
-        It creates the pieces for the game
+        It combines the keys for the move options in each position of a player's queue
 
-        :param NoOfPieces: The number of pieces each player has
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :return: The hash of the queue.
         """
-        for Count in range(1, NoOfPieces + 1):
-            CurrentPiece = Piece("piece", self._Players[0], 1, "!")
-            self._Board[self.__GetIndexOfSquare(2 * 10 + Count + 1)].SetPiece(CurrentPiece)
-        CurrentPiece = Piece("mirza", self._Players[0], 5, "1")
-        self._Board[self.__GetIndexOfSquare(10 + self._NoOfColumns // 2)].SetPiece(CurrentPiece)
-        for Count in range(1, NoOfPieces + 1):
-            CurrentPiece = Piece("piece", self._Players[1], 1, '"')
-            self._Board[self.__GetIndexOfSquare((self._NoOfRows - 1) * 10 + Count + 1)].SetPiece(CurrentPiece)
-        CurrentPiece = Piece("mirza", self._Players[1], 5, "2")
-        self._Board[self.__GetIndexOfSquare(self._NoOfRows * 10 + (self._NoOfColumns // 2 + 1))].SetPiece(CurrentPiece)
+        QueueHash = 0
+        Slot = 0
+        for AMoveOption in self._Players[PlayerIndex].GetMoveOptionQueueContents():
+            QueueHash ^= self._ZobristKeys.GetQueueKey(PlayerIndex, Slot, AMoveOption.GetName())
+            Slot += 1
+        return QueueHash
 
-    def __CreateMoveOptionOffer(self):
+    def __CalculateHash(self):
         """
-        It appends the names of the units to the list of units that can be moved
+        It works out the hash of the position from scratch, from the pieces on each square, both players' queues, the
+        move option offer position and the player whose turn it is
+        :return: A 64-bit hash.
         """
-        self._MoveOptionOffer.append("jazair")
-        self._MoveOptionOffer.append("chowkidar")
-        self._MoveOptionOffer.append("cuirassier")
-        self._MoveOptionOffer.append("ryott")
-        self._MoveOptionOffer.append("faujdar")
+        PositionHash = 0
+        for Index in range(len(self._Board)):
+            PieceInSquare = self._Board[Index].GetPieceInSquare()
+            if PieceInSquare is not None:
+                PositionHash ^= self._ZobristKeys.GetPieceKey(Index, self.__GetZobristKindOfPiece(PieceInSquare))
+        PositionHash ^= self.__GetHashOfQueue(0) ^ self.__GetHashOfQueue(1)
+        PositionHash ^= self._ZobristKeys.GetOfferKey(self._MoveOptionOfferPosition)
+        if self._CurrentPlayer.SameAs(self._Players[1]):
+            PositionHash ^= self._ZobristKeys.GetSideToMoveKey()
+        return PositionHash
 
-    def __CreateRyottMoveOption(self, Direction):
+    def GetHash(self):
         """
-        It creates a MoveOption object, adds four Move objects to it, and returns the MoveOption object
+        It returns the Zobrist hash of the current position, which is kept up to date as moves are made
+        :return: A 64-bit hash.
+        """
+        return self._Hash
 
-        :param Direction: 1 for white, -1 for black
-        :return: A MoveOption object.
+    def __CalculateAttackMaps(self):
         """
-        NewMoveOption = MoveOption("ryott")
-        NewMove = Move(0, 1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, -1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(1 * Direction, 0)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(-1 * Direction, 0)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        return NewMoveOption
+        It works out the attack maps from scratch. For each player there is a count, for each move option and each square,
+        of how many of the player's pieces that move option would take to the square, laid out as in GetAttackTargets,
+        with a mask that has a bit set for each count above 0, and a mask of the squares that hold the player's pieces
+        :return: A tuple (AttackCounts, AttackMasks, PieceMasks), each a list with Player One's first.
+        """
+        AttackCounts = [[0] * (len(MOVE_OPTION_NAMES) * len(self._Board)) for PlayerIndex in range(2)]
+        AttackMasks = [0, 0]
+        PieceMasks = [0, 0]
+        for Index in range(len(self._Board)):
+            PieceInSquare = self._Board[Index].GetPieceInSquare()
+            if PieceInSquare is not None:
+                PlayerIndex = self.__GetIndexOfPlayer(PieceInSquare.GetBelongsTo())
+                PieceMasks[PlayerIndex] |= 1 << Index
+                for Target in self._AttackTargets[PlayerIndex][Index]:
+                    AttackCounts[PlayerIndex][Target] += 1
+                    AttackMasks[PlayerIndex] |= 1 << Target
+        return AttackCounts, AttackMasks, PieceMasks
 
-    def __CreateFaujdarMoveOption(self, Direction):
+    def __AddToAttackMaps(self, PlayerIndex, Index):
         """
-        It creates a MoveOption object with the name "faujdar" and adds four moves to it
+        It adds the squares a piece can reach to its player's attack maps when the piece arrives on a square
 
-        :param Direction: The direction the piece is moving in
-        :return: A MoveOption object.
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Index: The index of the square the piece is on
         """
-        NewMoveOption = MoveOption("faujdar")
-        NewMove = Move(0, -1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, 1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, 2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, -2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        return NewMoveOption
+        AttackCounts = self._AttackCounts[PlayerIndex]
+        AttackMask = self._AttackMasks[PlayerIndex]
+        for Target in self._AttackTargets[PlayerIndex][Index]:
+            AttackCounts[Target] += 1
+            if AttackCounts[Target] == 1:
+                AttackMask |= 1 << Target
+        self._AttackMasks[PlayerIndex] = AttackMask
+        self._PieceMasks[PlayerIndex] |= 1 << Index
 
-    def __CreateJazairMoveOption(self, Direction):
+    def __RemoveFromAttackMaps(self, PlayerIndex, Index):
         """
-        It creates a MoveOption object that contains all the possible moves for a Jazair piece
+        It takes the squares a piece can reach out of its player's attack maps when the piece leaves a square or is
+        captured
 
-        :param Direction: 1 for white, -1 for black
-        :return: A MoveOption object.
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Index: The index of the square the piece was on
         """
-        NewMoveOption = MoveOption("jazair")
-        NewMove = Move(2 * Direction, 0)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(2 * Direction, -2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(2 * Direction, 2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, 2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, -2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(-1 * Direction, -1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(-1 * Direction, 1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        return NewMoveOption
-
-    def __CreateCuirassierMoveOption(self, Direction):
-        """
-        It creates a MoveOption object for a Cuirassier, which is a type of chess piece
-
-        :param Direction: 1 for white, -1 for black
-        :return: A MoveOption object.
+        AttackCounts = self._AttackCounts[PlayerIndex]
+        AttackMask = self._AttackMasks[PlayerIndex]
+        for Target in self._AttackTargets[PlayerIndex][Index]:
+            AttackCounts[Target] -= 1
+            if AttackCounts[Target] == 0:
+                AttackMask ^= 1 << Target
+        self._AttackMasks[PlayerIndex] = AttackMask
+        self._PieceMasks[PlayerIndex] ^= 1 << Index
+
+    def __GetAttackingOptionNumbers(self, PlayerIndex, IncludeOffer):
         """
-        NewMoveOption = MoveOption("cuirassier")
-        NewMove = Move(1 * Direction, 0)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(2 * Direction, 0)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(1 * Direction, -2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(1 * Direction, 2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        return NewMoveOption
+        It returns the numbers in MOVE_OPTION_NAMES of the move options a player can use on their next turn
 
-    def __CreateChowkidarMoveOption(self, Direction):
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param IncludeOffer: Whether to include the move option on offer
+        :return: A list of (Choice, OptionNumber) tuples, where Choice is the position in the queue (1 to 3) of the move
+        option, or 0 for the move option on offer.
         """
-        It creates a MoveOption object for the chowkidar piece, which is a piece that can move in any direction, but only
-        one square at a time
+        OptionNumbers = []
+        for Choice in range(1, 4):
+            OptionNumbers.append((Choice, MOVE_OPTION_NAMES.index(
+                self._Players[PlayerIndex].GetMoveOptionInPosition(Choice).GetName())))
+        if IncludeOffer:
+            OptionNumbers.append((0, MOVE_OPTION_NAMES.index(self._MoveOptionOffer[self._MoveOptionOfferPosition])))
+        return OptionNumbers
 
-        :param Direction: 1 for white, -1 for black
-        :return: A MoveOption object.
+    def __IsIndexAttacked(self, PlayerIndex, Index, IncludeOffer):
         """
-        NewMoveOption = MoveOption("chowkidar")
-        NewMove = Move(1 * Direction, 1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(1 * Direction, -1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(-1 * Direction, 1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(-1 * Direction, -1 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, 2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        NewMove = Move(0, -2 * Direction)
-        NewMoveOption.AddToPossibleMoves(NewMove)
-        return NewMoveOption
+        It checks the attack counts of the move options a player can use next turn for one square
 
-    def __CreateMoveOption(self, Name, Direction):
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Index: The index of the square
+        :param IncludeOffer: Whether the move option on offer counts
+        :return: A boolean value.
         """
-        It returns a list of all the possible moves for a given piece in a given direction
+        if self._PieceMasks[PlayerIndex] >> Index & 1:
+            return False
+        AttackCounts = self._AttackCounts[PlayerIndex]
+        for Choice, OptionNumber in self.__GetAttackingOptionNumbers(PlayerIndex, IncludeOffer):
+            if AttackCounts[OptionNumber * len(self._Board) + Index] > 0:
+                return True
+        return False
 
-        :param Name: The name of the piece
-        :param Direction: The direction the piece is moving in
-        :return: the move options for the piece.
+    def __GetIndexesOfPiecesBelongingTo(self, APlayer):
         """
-        if Name == "chowkidar":
-            return self.__CreateChowkidarMoveOption(Direction)
-        elif Name == "ryott":
-            return self.__CreateRyottMoveOption(Direction)
-        elif Name == "faujdar":
-            return self.__CreateFaujdarMoveOption(Direction)
-        elif Name == "jazair":
-            return self.__CreateJazairMoveOption(Direction)
-        else:
-            return self.__CreateCuirassierMoveOption(Direction)
+        It returns the indexes of all the squares that contain a piece belonging to APlayer
 
-    def __CreateMoveOptions(self):
+        :param APlayer: The player whose pieces are wanted
+        :return: A list of indexes into the board.
         """
-        It creates a list of move options for each player, and adds them to the player's move option queue
+        Indexes = []
+        for Index in range(len(self._Board)):
+            PieceInSquare = self._Board[Index].GetPieceInSquare()
+            if PieceInSquare is not None and APlayer.SameAs(PieceInSquare.GetBelongsTo()):
+                Indexes.append(Index)
+        return Indexes
+
+    def __GetMovesForMoveOption(self, AMoveOption, StartIndexes):
         """
-        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("ryott", 1))
-        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("chowkidar", 1))
-        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("cuirassier", 1))
-        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("faujdar", 1))
-        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("jazair", 1))
-        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("ryott", -1))
-        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("chowkidar", -1))
-        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("jazair", -1))
-        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("faujdar", -1))
-        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("cuirassier", -1))
+        It lists every (start, finish) pair that AMoveOption allows the current player's pieces to make, looking up the
+        squares each piece can reach in the move option's destination table
 
+        :param AMoveOption: The move option being used
+        :param StartIndexes: The indexes of the squares that contain the current player's pieces
+        :return: A list of (StartSquareReference, FinishSquareReference) tuples.
+        """
+        DestinationTable = AMoveOption.GetDestinationTable(self._NoOfRows, self._NoOfColumns)
+        Moves = []
+        for StartIndex in StartIndexes:
+            for FinishIndex in DestinationTable[StartIndex]:
+                PieceInSquare = self._Board[FinishIndex].GetPieceInSquare()
+                if PieceInSquare is None or not self._CurrentPlayer.SameAs(PieceInSquare.GetBelongsTo()):
+                    Moves.append((self._SquareReferences[StartIndex], self._SquareReferences[FinishIndex]))
+        return Moves
 
-# The Piece class is a class that represents a piece on the board.
-class Piece:
-    def __init__(self, T, B, P, S):
+    def GenerateLegalMoves(self):
         """
-        The function __init__() is a constructor that initializes the data members of the class
+        It lists every legal action for the current player. An action is a tuple (ReplaceChoice, Choice,
+        StartSquareReference, FinishSquareReference), where ReplaceChoice is 0 if the move option offer is not taken or
+        the position in the queue (1 to 5) that the offer replaces, and Choice is the position in the queue (1 to 3) of
+        the move option used
 
-        :param T: Type of piece
-        :param B: The player that the piece belongs to
-        :param P: Points if captured
-        :param S: The symbol that will be used to represent the piece on the board
+        :return: A list of actions.
         """
-        self._TypeOfPiece = T
-        self._BelongsTo = B
-        self._PointsIfCaptured = P
-        self._Symbol = S
+        StartIndexes = self.__GetIndexesOfPiecesBelongingTo(self._CurrentPlayer)
+        MovesForChoice = [None]
+        for Choice in range(1, 4):
+            MovesForChoice.append(self.__GetMovesForMoveOption(
+                self._CurrentPlayer.GetMoveOptionInPosition(Choice), StartIndexes))
+        MovesForOffer = self.__GetMovesForMoveOption(self.__CreateMoveOption(
+            self._MoveOptionOffer[self._MoveOptionOfferPosition], self._CurrentPlayer.GetDirection()), StartIndexes)
+        LegalMoves = []
+        for ReplaceChoice in range(0, 6):
+            for Choice in range(1, 4):
+                if ReplaceChoice == Choice:
+                    Moves = MovesForOffer
+                else:
+                    Moves = MovesForChoice[Choice]
+                for StartSquareReference, FinishSquareReference in Moves:
+                    LegalMoves.append((ReplaceChoice, Choice, StartSquareReference, FinishSquareReference))
+        return LegalMoves
 
-    def GetSymbol(self):
+    def GenerateLegalMovesByChecking(self):
         """
-        It returns the value of the variable _Symbol.
-        :return: The symbol of the stock.
+        It lists the same actions as GenerateLegalMoves, but the slow way that a turn checks a move: every pair of squares
+        is tried with __CheckSquareIsValid and the move option's CheckIfThereIsAMoveToSquare. Perft uses it to check
+        GenerateLegalMoves
+
+        :return: A list of actions.
         """
-        return self._Symbol
+        OfferMoveOption = self.__CreateMoveOption(self._MoveOptionOffer[self._MoveOptionOfferPosition],
+                                                  self._CurrentPlayer.GetDirection())
+        StartSquareReferences = [Reference for Reference in self._SquareReferences
+                                 if self.__CheckSquareIsValid(Reference, True)]
+        FinishSquareReferences = [Reference for Reference in self._SquareReferences
+                                  if self.__CheckSquareIsValid(Reference, False)]
+        LegalMoves = []
+        for ReplaceChoice in range(0, 6):
+            for Choice in range(1, 4):
+                if ReplaceChoice == Choice:
+                    AMoveOption = OfferMoveOption
+                else:
+                    AMoveOption = self._CurrentPlayer.GetMoveOptionInPosition(Choice)
+                for StartSquareReference in StartSquareReferences:
+                    for FinishSquareReference in FinishSquareReferences:
+                        if AMoveOption.CheckIfThereIsAMoveToSquare(StartSquareReference, FinishSquareReference,
+                                                                   self._ReferenceBase):
+                            LegalMoves.append((ReplaceChoice, Choice, StartSquareReference, FinishSquareReference))
+        return LegalMoves
 
-    def GetTypeOfPiece(self):
+    def ApplyMove(self, Action, NextOfferPosition=None):
         """
-        It returns the type of piece.
-        :return: The type of piece.
+        It plays a whole turn for the current player without any input or output. As in PlayGame, the offer is taken
+        first if asked for and, if the move is not legal, the turn is lost
+
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference) as returned by
+        GenerateLegalMoves
+        :param NextOfferPosition: If the offer is taken, the offer position to use next instead of a random one
+        :return: True if the move was legal and has been made, otherwise False. An action whose ReplaceChoice is not 0
+        to 5 or whose Choice is not 1 to 3 raises a ValueError and changes nothing.
         """
-        return self._TypeOfPiece
+        CheckAction(Action)
+        ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+        if ReplaceChoice != 0:
+            self.__TakeMoveOptionOffer(ReplaceChoice, NextOfferPosition)
+        MoveLegal = self.__CheckAndMakeQueueMove(Choice, StartSquareReference, FinishSquareReference)
+        self.__LogTurn(Action, MoveLegal)
+        self.__EndTurn()
+        return MoveLegal
 
-    def GetBelongsTo(self):
+    def MakeMove(self, Action, NextOfferPosition=None):
         """
-        It returns the value of the variable _BelongsTo.
-        :return: The value of the _BelongsTo attribute.
+        It plays a turn in the same way as ApplyMove, but first pushes a record onto the undo stack holding everything
+        UnmakeMove needs to put the game back: the captured piece, the mover's score and queue, the offer position, the
+        random number generator state if the offer is taken, the tracked mirzas and kotla points, the hash and whose turn
+        it was. The attack maps are not saved, as UnmakeMove moves the pieces back through them
+
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :param NextOfferPosition: If the offer is taken, the offer position to use next instead of a random one
+        :return: True if the move was legal and has been made, otherwise False.
         """
-        return self._BelongsTo
+        CheckAction(Action)
+        ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+        CapturedPiece = None
+        if self.__CheckSquareInBounds(FinishSquareReference):
+            CapturedPiece = self._Board[self.__GetIndexOfSquare(FinishSquareReference)].GetPieceInSquare()
+        RandomState = None
+        if ReplaceChoice != 0:
+            RandomState = self._Random.getstate()
+        Mover = self._CurrentPlayer
+        Record = [Mover, Mover.GetScore(), Mover.GetMoveOptionQueueContents(), self._MoveOptionOfferPosition,
+                  RandomState, StartSquareReference, FinishSquareReference, CapturedPiece, tuple(self._MirzaIndexes),
+                  tuple(self._MirzaAlive), tuple(self._PointsForOccupancy), self._GameOver, self._Hash]
+        MoveLegal = self.ApplyMove(Action, NextOfferPosition)
+        Record.append(MoveLegal)
+        self._UndoStack.append(Record)
+        return MoveLegal
 
-    def GetPointsIfCaptured(self):
+    def UnmakeMove(self):
         """
-        It returns the value of the variable _PointsIfCaptured.
-        :return: The points that the player will get if they capture the piece.
+        It takes back the last turn played with MakeMove, restoring the position exactly
         """
-        return self._PointsIfCaptured
+        (Mover, Score, QueueContents, MoveOptionOfferPosition, RandomState, StartSquareReference, FinishSquareReference,
+         CapturedPiece, MirzaIndexes, MirzaAlive, PointsForOccupancy, GameOver, PositionHash,
+         MoveLegal) = self._UndoStack.pop()
+        if MoveLegal:
+            StartIndex = self.__GetIndexOfSquare(StartSquareReference)
+            FinishIndex = self.__GetIndexOfSquare(FinishSquareReference)
+            self._Board[StartIndex].SetPiece(self._Board[FinishIndex].RemovePiece())
+            self._Board[FinishIndex].SetPiece(CapturedPiece)
+            MoverIndex = self.__GetIndexOfPlayer(Mover)
+            self.__RemoveFromAttackMaps(MoverIndex, FinishIndex)
+            self.__AddToAttackMaps(MoverIndex, StartIndex)
+            if CapturedPiece is not None:
+                self.__AddToAttackMaps(1 - MoverIndex, FinishIndex)
+            self._DirtyRows.add(StartIndex // self._NoOfColumns)
+            self._DirtyRows.add(FinishIndex // self._NoOfColumns)
+        Mover.ChangeScore(Score - Mover.GetScore())
+        Mover.SetMoveOptionQueueContents(QueueContents)
+        self._MoveOptionOfferPosition = MoveOptionOfferPosition
+        if RandomState is not None:
+            self._Random.setstate(RandomState)
+        self._MirzaIndexes = list(MirzaIndexes)
+        self._MirzaAlive = list(MirzaAlive)
+        self._PointsForOccupancy = list(PointsForOccupancy)
+        self._CurrentPlayer = Mover
+        self._GameOver = GameOver
+        self._Hash = PositionHash
+        self._MoveLog.pop()
 
-
-# A Square is a place on the board where a piece can be placed
-class Square:
-    def __init__(self):
+    def GetNoOfMovesToUnmake(self):
         """
-        The function __init__() is a constructor that initializes the instance variables of the class Square
+        It returns how many turns played with MakeMove can be taken back
+        :return: The size of the undo stack.
         """
-        self._PieceInSquare = None
-        self._BelongsTo = None
-        self._Symbol = " "
+        return len(self._UndoStack)
 
-    def SetPiece(self, P):
+    def ReplayMove(self, Move):
         """
-        The function SetPiece() takes a piece as an argument and sets the piece in the square
+        It plays one entry of a move log, as returned by GetMoveLog or read from a game record. An entry with move option
+        0 is a human taking the offer, so the offer is taken without ending the turn; any other entry is played with
+        ApplyMove
 
-        :param P: The piece that is being set in the square
+        :param Move: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :return: True if the entry took the offer or made a legal move, otherwise False.
         """
-        self._PieceInSquare = P
+        if Move[1] == 0:
+            self.__TakeMoveOptionOffer(Move[0])
+            self._MoveLog.append(tuple(Move))
+            return True
+        return self.ApplyMove(Move)
 
-    def RemovePiece(self):
+    def IsGameOver(self):
         """
-        It removes the piece from the square and returns it
-        :return: The piece that was in the square.
+        It returns whether the game has finished
+        :return: a boolean value.
         """
-        PieceToReturn = self._PieceInSquare
-        self._PieceInSquare = None
-        return PieceToReturn
+        return self._GameOver
 
-    def GetPieceInSquare(self):
+    def Result(self):
         """
-        This function returns the piece in the square
-        :return: The piece in the square.
+        It returns the result of a finished game: 0 for a draw, 1 if Player One has won or 2 if Player Two has won
+        :return: The result of the game, or None if the game is not over.
         """
-        return self._PieceInSquare
+        if not self._GameOver:
+            return None
+        elif self._Players[0].GetScore() == self._Players[1].GetScore():
+            return 0
+        elif self._Players[0].GetScore() > self._Players[1].GetScore():
+            return 1
+        else:
+            return 2
 
-    def GetSymbol(self):
+    def GetCurrentPlayer(self):
         """
-        It returns the value of the variable _Symbol.
-        :return: The symbol of the stock.
+        It returns the player whose turn it is
+        :return: The current player.
         """
-        return self._Symbol
+        return self._CurrentPlayer
 
-    def GetPointsForOccupancy(self, CurrentPlayer):
+    def GetPlayers(self):
         """
-        > This function returns 0 points for the current player
+        It returns both players, Player One first
+        :return: The list of players.
+        """
+        return self._Players
 
-        :param CurrentPlayer: The player who is currently occupying the space
-        :return: 0
+    def GetNoOfRows(self):
         """
-        return 0
+        It returns the number of rows on the board
+        :return: The number of rows.
+        """
+        return self._NoOfRows
 
-    def GetBelongsTo(self):
+    def GetNoOfColumns(self):
         """
-        It returns the value of the variable _BelongsTo.
-        :return: The value of the _BelongsTo attribute.
+        It returns the number of columns on the board
+        :return: The number of columns.
         """
-        return self._BelongsTo
+        return self._NoOfColumns
 
-    def ContainsKotla(self):
+    def GetReferenceBase(self):
         """
-        If the symbol of the current object is "K" or "k", return True, otherwise return False
-        :return: a boolean value.
+        It returns the number that the row number is multiplied by in a square reference: 10 for boards up to 9 columns
+        wide, 100 for boards up to 99 columns wide and so on
+        :return: The reference base.
         """
-        if self._Symbol == "K" or self._Symbol == "k":
-            return True
-        else:
-            return False
+        return self._ReferenceBase
 
+    def GetSquareReference(self, Row, Column):
+        """
+        It returns the square reference for a row and column
 
-# Kotla is a subclass of Square, and it has a constructor that takes in a Player and a Symbol, and it has a method called
-# GetPointsForOccupancy that takes in a Player and returns an integer
-class Kotla(Square):
-    def __init__(self, P, S):
+        :param Row: The row number, starting from 1
+        :param Column: The column number, starting from 1
+        :return: The square reference.
         """
-        The function __init__() is a constructor that initializes the class Kotla
+        return Row * self._ReferenceBase + Column
 
-        :param P: The player who owns the kotla
-        :param S: The symbol of the Kotla
+    def GetSquare(self, SquareReference):
         """
-        super(Kotla, self).__init__()
-        self._BelongsTo = P
-        self._Symbol = S
+        It returns the square (or kotla) with the given square reference
 
-    def GetPointsForOccupancy(self, CurrentPlayer):
+        :param SquareReference: The reference of the square, row number followed by column number
+        :return: The Square object.
         """
-        If the square is occupied by a piece of the current player, return 5, if it's occupied by a piece of the opponent,
-        return 1, else return 0
+        return self._Board[self.__GetIndexOfSquare(SquareReference)]
 
-        :param CurrentPlayer: The player whose turn it is
+    def GetMoveOptionOffer(self):
+        """
+        It returns the names of the move options that can be offered, in the order they are picked from
+        :return: The list of move option names.
+        """
+        return self._MoveOptionOffer
+
+    def GetMoveOptionOfferPosition(self):
+        """
+        It returns the position in the move option offer list of the move option currently on offer
+        :return: The position of the current offer.
+        """
+        return self._MoveOptionOfferPosition
+
+    def GetRandom(self):
+        """
+        It returns the random number generator this game uses to pick the move option offer
+        :return: A random.Random object.
+        """
+        return self._Random
+
+    def GetSeed(self):
+        """
+        It returns the seed the game's random number generator started from
+        :return: The seed.
+        """
+        return self._Seed
+
+    def GetNoOfPieces(self):
+        """
+        It returns the number of pieces each player started with, not counting the mirza
+        :return: The number of pieces.
+        """
+        return self._NoOfPieces
+
+    def GetBoardAsString(self):
+        """
+        It returns the board as it is displayed, with only the rows that have changed since the last time rendered again
+        :return: The board as a string.
+        """
+        return self.__RenderBoard()
+
+    def GetMoveLog(self):
+        """
+        It returns every turn played so far as a list of (ReplaceChoice, Choice, StartSquareReference,
+        FinishSquareReference) tuples. A tuple with Choice 0 is a human taking the offer, with the turn carrying on
+        :return: The move log.
+        """
+        return self._MoveLog
+
+    def CreateMoveOption(self, Name, Direction):
+        """
+        It returns the shared move option with the given name for a player moving in the given direction
+
+        :param Name: The name of the move option
+        :param Direction: 1 for Player One, -1 for Player Two
+        :return: A MoveOption object.
+        """
+        return self.__CreateMoveOption(Name, Direction)
+
+    def __getstate__(self):
+        """
+        Controllers are left out when a game is copied or pickled, as they may hold things such as process pools that
+        cannot be copied
+        :return: The attributes of the game.
+        """
+        State = self.__dict__.copy()
+        State["_Controllers"] = [None, None]
+        return State
+
+    def Clone(self):
+        """
+        It makes a copy of the game much more cheaply than pickling or deep copying it. Only the squares, players and
+        pieces, which change as the game is played, are made again; the move options, the zobrist keys and the parts of the
+        board that never change are shared with this game. The copy starts with an empty undo stack, so it cannot take
+        back moves made before it was cloned, and it has no controllers, profiler, input source or output sink
+        :return: The copy of the game.
+        """
+        Players = [self._Players[0].Clone(), self._Players[1].Clone()]
+        Pieces = {}
+        Board = []
+        for S in self._Board:
+            if S.ContainsKotla():
+                NewSquare = Kotla(Players[self.__GetIndexOfPlayer(S.GetBelongsTo())], S.GetSymbol())
+            else:
+                NewSquare = Square()
+            PieceInSquare = S.GetPieceInSquare()
+            if PieceInSquare is not None:
+                NewPiece = Pieces.get(PieceInSquare)
+                if NewPiece is None:
+                    NewPiece = Piece(PieceInSquare.GetTypeOfPiece(),
+                                     Players[self.__GetIndexOfPlayer(PieceInSquare.GetBelongsTo())],
+                                     PieceInSquare.GetPointsIfCaptured(), PieceInSquare.GetSymbol())
+                    Pieces[PieceInSquare] = NewPiece
+                NewSquare.SetPiece(NewPiece)
+            Board.append(NewSquare)
+        Copy = Dastan.__new__(Dastan)
+        Copy.__dict__.update(self.__dict__)
+        Copy._Board = Board
+        Copy._Players = Players
+        Copy._CurrentPlayer = Players[self.__GetIndexOfPlayer(self._CurrentPlayer)]
+        Copy._MirzaIndexes = list(self._MirzaIndexes)
+        Copy._MirzaAlive = list(self._MirzaAlive)
+        Copy._PointsForOccupancy = list(self._PointsForOccupancy)
+        Copy._AttackCounts = [list(AttackCounts) for AttackCounts in self._AttackCounts]
+        Copy._AttackMasks = list(self._AttackMasks)
+        Copy._PieceMasks = list(self._PieceMasks)
+        Copy._UndoStack = []
+        Copy._Controllers = [None, None]
+        Copy._MoveLog = list(self._MoveLog)
+        Copy._Profiler = None
+        Copy._Input = None
+        Copy._Output = None
+        Copy._RowText = list(self._RowText)
+        Copy._DirtyRows = set(self._DirtyRows)
+        Copy._Random = random.Random()
+        Copy._Random.setstate(self._Random.getstate())
+        return Copy
+
+    def ToBytes(self):
+        """
+        It packs the position into a few dozen bytes in the layout given by PACKED_STATE_HEADER, which is much quicker to
+        send to another process than the pickled game. The random number generator, the move log and the undo stack are
+        not packed
+        :return: The packed position.
+        """
+        Flags = self.__GetIndexOfPlayer(self._CurrentPlayer)
+        if self._GameOver:
+            Flags |= 2
+        Parts = [PACKED_STATE_HEADER.pack(self._NoOfRows, self._NoOfColumns, self._NoOfPieces,
+                                          self._MoveOptionOfferPosition, Flags, self._Players[0].GetScore(),
+                                          self._Players[1].GetScore())]
+        for P in self._Players:
+            Parts.append(bytes(MOVE_OPTION_NAMES.index(AMoveOption.GetName())
+                               for AMoveOption in P.GetMoveOptionQueueContents()))
+        Parts.append(bytes(0 if S.GetPieceInSquare() is None else self.__GetZobristKindOfPiece(S.GetPieceInSquare()) + 1
+                           for S in self._Board))
+        return b"".join(Parts)
+
+    @staticmethod
+    def FromBytes(Data, Seed=None):
+        """
+        It makes a game in the position packed by ToBytes
+
+        :param Data: The packed position
+        :param Seed: The seed for the new game's random number generator, which picks the offers from now on
+        :return: The Dastan game.
+        """
+        R, C, NoOfPieces = PACKED_STATE_HEADER.unpack_from(Data)[:3]
+        Game = Dastan(R, C, NoOfPieces, Seed)
+        Game.__LoadPackedState(Data)
+        return Game
+
+    def __LoadPackedState(self, Data):
+        """
+        It puts a new game into the position packed by ToBytes, reusing the pieces set up at the start
+
+        :param Data: The packed position
+        """
+        (R, C, NoOfPieces, MoveOptionOfferPosition, Flags, PlayerOneScore,
+         PlayerTwoScore) = PACKED_STATE_HEADER.unpack_from(Data)
+        if len(Data) != PACKED_STATE_HEADER.size + 10 + R * C:
+            raise ValueError("the packed position is the wrong length for its board")
+        Offset = PACKED_STATE_HEADER.size
+        for P, Score in zip(self._Players, (PlayerOneScore, PlayerTwoScore)):
+            P.ChangeScore(Score - P.GetScore())
+            P.SetMoveOptionQueueContents([self.__CreateMoveOption(MOVE_OPTION_NAMES[Number], P.GetDirection())
+                                          for Number in Data[Offset:Offset + 5]])
+            Offset += 5
+        PiecesOfKind = {}
+        for S in self._Board:
+            PieceInSquare = S.RemovePiece()
+            if PieceInSquare is not None:
+                PiecesOfKind[self.__GetZobristKindOfPiece(PieceInSquare) + 1] = PieceInSquare
+        self._MirzaIndexes = [None, None]
+        self._MirzaAlive = [False, False]
+        for Index in range(R * C):
+            Kind = Data[Offset + Index]
+            if Kind != 0:
+                self._Board[Index].SetPiece(PiecesOfKind[Kind])
+                if Kind % 2 == 0:
+                    self._MirzaIndexes[(Kind - 1) // 2] = Index
+                    self._MirzaAlive[(Kind - 1) // 2] = True
+        self._MoveOptionOfferPosition = MoveOptionOfferPosition
+        self._CurrentPlayer = self._Players[Flags & 1]
+        self._GameOver = bool(Flags & 2)
+        self._PointsForOccupancy = [None, None]
+        self._DirtyRows = set(range(R))
+        self._Hash = self.__CalculateHash()
+        self._AttackCounts, self._AttackMasks, self._PieceMasks = self.__CalculateAttackMaps()
+
+    def SetProfiler(self, Profiler):
+        """
+        It turns on timing of the phases of each turn and counting of what happens, or turns it off again
+
+        :param Profiler: A GameProfiler to add the timings and counts to, or None
+        """
+        self._Profiler = Profiler
+
+    def GetProfiler(self):
+        """
+        It returns the profiler for this game
+        :return: The GameProfiler, or None if the game is not being profiled.
+        """
+        return self._Profiler
+
+    def SetController(self, PlayerNumber, Controller):
+        """
+        It lets the computer play for one of the players. The controller must have a ChooseMove(Game) method that returns
+        an action in the form used by GenerateLegalMoves
+
+        :param PlayerNumber: 1 for Player One, 2 for Player Two
+        :param Controller: The computer player, or None for a human player
+        """
+        self._Controllers[PlayerNumber - 1] = Controller
+
+    def GetPointsForOccupancy(self, APlayer):
+        """
+        It returns the points APlayer would get for the kotlas they occupy at the moment
+
+        :param APlayer: The player
+        :return: The points for occupancy.
+        """
+        return self.__GetPointsForOccupancyByPlayer(APlayer)
+
+    def GetPieceCounts(self):
+        """
+        It counts each player's pieces on the board from the attack maps, without looking at the squares
+        :return: A tuple of the number of pieces, mirza included, that Player One and Player Two have.
+        """
+        return bin(self._PieceMasks[0]).count("1"), bin(self._PieceMasks[1]).count("1")
+
+    def CheckSquareIsValid(self, SquareReference, StartSquare):
+        """
+        It runs the check that a move's start or finish square is on the board and holds the right player's piece, on
+        its own. It is kept for the tests and the benchmarks in dastan_benchmarks.py
+
+        :param SquareReference: The square you want to check
+        :param StartSquare: True if the square is the one the piece moves from
+        :return: A boolean value.
+        """
+        return self.__CheckSquareIsValid(SquareReference, StartSquare)
+
+    def CheckIfGameOver(self):
+        """
+        It works out from the mirzas whether the game is over, rather than returning the flag IsGameOver keeps. It is
+        kept for the tests and the benchmarks
+        :return: a boolean value.
+        """
+        return self.__CheckIfGameOver()
+
+    def CalculateAttackMaps(self):
+        """
+        It works out the attack maps from scratch, leaving the ones kept up to date as moves are made alone. It is kept
+        for the tests and the benchmarks
+        :return: A tuple (AttackCounts, AttackMasks, PieceMasks), each a list with Player One's first.
+        """
+        return self.__CalculateAttackMaps()
+
+    def ForgetPointsForOccupancy(self):
+        """
+        It empties the cache of points for occupancy, so that the next GetPointsForOccupancy adds them up from the kotlas
+        again. It is kept for the tests and the benchmarks
+        """
+        self._PointsForOccupancy = [None, None]
+
+    def GetAttackedSquares(self, APlayer, IncludeOffer=False):
+        """
+        It lists the squares APlayer could move a piece to on their next turn with the move options in positions 1 to 3
+        of their queue. The attack maps are kept up to date as pieces move, and a queue that turns round only changes
+        which of them are read, so this does not look at the pieces at all
+
+        :param APlayer: The player
+        :param IncludeOffer: Whether the move option on offer counts as well, as the player could take it first
+        :return: A list of square references, in the order of the squares on the board.
+        """
+        PlayerIndex = self.__GetIndexOfPlayer(APlayer)
+        NoOfSquares = len(self._Board)
+        AttackMask = 0
+        for Choice, OptionNumber in self.__GetAttackingOptionNumbers(PlayerIndex, IncludeOffer):
+            AttackMask |= self._AttackMasks[PlayerIndex] >> (OptionNumber * NoOfSquares)
+        AttackMask &= ((1 << NoOfSquares) - 1) & ~self._PieceMasks[PlayerIndex]
+        SquareReferences = []
+        while AttackMask:
+            LowestBit = AttackMask & -AttackMask
+            SquareReferences.append(self._SquareReferences[LowestBit.bit_length() - 1])
+            AttackMask ^= LowestBit
+        return SquareReferences
+
+    def IsSquareAttacked(self, APlayer, SquareReference, IncludeOffer=False):
+        """
+        It checks whether APlayer could move a piece to a square on their next turn, in the same way as
+        GetAttackedSquares
+
+        :param APlayer: The player
+        :param SquareReference: The reference of the square
+        :param IncludeOffer: Whether the move option on offer counts as well
+        :return: A boolean value, which is False for a square that is not on the board.
+        """
+        if not self.__CheckSquareInBounds(SquareReference):
+            return False
+        return self.__IsIndexAttacked(self.__GetIndexOfPlayer(APlayer), self.__GetIndexOfSquare(SquareReference),
+                                      IncludeOffer)
+
+    def IsMirzaThreatened(self, APlayer, IncludeOffer=False):
+        """
+        It checks whether the other player could capture APlayer's mirza on their next turn
+
+        :param APlayer: The player whose mirza it is
+        :param IncludeOffer: Whether the other player could use the move option on offer
+        :return: A boolean value, which is False once the mirza has been captured.
+        """
+        PlayerIndex = self.__GetIndexOfPlayer(APlayer)
+        if not self._MirzaAlive[PlayerIndex]:
+            return False
+        return self.__IsIndexAttacked(1 - PlayerIndex, self._MirzaIndexes[PlayerIndex], IncludeOffer)
+
+    def GetKotlaEntries(self, APlayer, IncludeOffer=False):
+        """
+        It lists the moves that would take one of APlayer's pieces into a kotla on their next turn. Only the kotlas the
+        attack maps say can be reached are looked at, and the pieces that can reach one are found by looking back from it
+        with the move option for the other direction, which has every move the other way round
+
+        :param APlayer: The player
+        :param IncludeOffer: Whether to include the moves that take the offer in place of the move option they use
+        :return: A list of actions in the form used by GenerateLegalMoves.
+        """
+        PlayerIndex = self.__GetIndexOfPlayer(APlayer)
+        Direction = self._Players[PlayerIndex].GetDirection()
+        PieceMask = self._PieceMasks[PlayerIndex]
+        AttackCounts = self._AttackCounts[PlayerIndex]
+        KotlaEntries = []
+        for FinishIndex in self._ScoringSquareIndexes:
+            if PieceMask >> FinishIndex & 1:
+                continue
+            for Choice, OptionNumber in self.__GetAttackingOptionNumbers(PlayerIndex, IncludeOffer):
+                if AttackCounts[OptionNumber * len(self._Board) + FinishIndex] == 0:
+                    continue
+                Origins = MOVE_OPTION_CATALOG[(MOVE_OPTION_NAMES[OptionNumber], -Direction)].GetDestinationTable(
+                    self._NoOfRows, self._NoOfColumns)[FinishIndex]
+                for StartIndex in Origins:
+                    if not PieceMask >> StartIndex & 1:
+                        continue
+                    if Choice != 0:
+                        KotlaEntries.append((0, Choice, self._SquareReferences[StartIndex],
+                                             self._SquareReferences[FinishIndex]))
+                    else:
+                        # the offer replaces the move option it is then used as
+                        for OfferChoice in range(1, 4):
+                            KotlaEntries.append((OfferChoice, OfferChoice, self._SquareReferences[StartIndex],
+                                                 self._SquareReferences[FinishIndex]))
+        return KotlaEntries
+
+    def PlayGame(self):
+        """
+        The function PlayGame() is a while loop that runs until the game is over.
+        """
+        TurnNumber = 0
+        while not self.IsGameOver():
+            TurnNumber += 1
+            self._Displaying = self.__IsTurnDisplayed(TurnNumber)
+            self.__DisplayState()
+            Controller = self._Controllers[self.__GetIndexOfPlayer(self._CurrentPlayer)]
+            if Controller is None:
+                self.__PlayHumanTurn()
+            else:
+                self.__PlayComputerTurn(Controller)
+
+            # swapping the currently active player
+            self.__EndTurn()
+
+        self._Displaying = self._DisplayPolicy != "never"
+        self.__DisplayState()
+        self.__DisplayFinalResult()
+        self._Displaying = True
+
+    def __PlayHumanTurn(self):
+        """
+        It asks the current player for their move and makes it if it is legal
+        """
+        SquareIsValid = False
+        Choice = 0
+        Profiler = self._Profiler
+        if Profiler is not None:
+            Started = Profiler.Clock()
+            RenderingBefore = Profiler.GetSeconds("rendering")
+
+        # allows player to choose either a valid move option or the move offer
+        while Choice < 1 or Choice > 3:
+            Choice = self.__ReadInteger("Choose move option to use from queue (1 to 3) or 9 to take the offer: ")
+            if Choice == 9:
+                self.__UseMoveOptionOffer()
+                self.__DisplayState()
+
+        # allows the player to select the piece they want to move
+        while not SquareIsValid:
+            StartSquareReference = self.__GetSquareReference("containing the piece to move")
+            SquareIsValid = self.__CheckSquareIsValid(StartSquareReference, True)
+
+        # allows the player to select the position to move the piece to
+        SquareIsValid = False
+        while not SquareIsValid:
+            FinishSquareReference = self.__GetSquareReference("to move to")
+            SquareIsValid = self.__CheckSquareIsValid(FinishSquareReference, False)
+
+        # the time taken to redisplay the board after taking the offer is rendering, not thinking
+        if Profiler is not None:
+            Profiler.AddTime("decision", Started, Profiler.GetSeconds("rendering") - RenderingBefore)
+
+        # determines whether the specified move is legal or not and makes it if it is
+        MoveLegal = self.__MakeQueueMove(Choice, StartSquareReference, FinishSquareReference)
+        self.__LogTurn((0, Choice, StartSquareReference, FinishSquareReference), MoveLegal)
+        if MoveLegal:
+            self.__Write("New score: " + str(self._CurrentPlayer.GetScore()) + "\n\n")
+
+    def __PlayComputerTurn(self, Controller):
+        """
+        It asks the controller for the current player's move, shows what it chose and makes it if it is legal
+
+        :param Controller: The computer player choosing the move
+        """
+        Action = ChooseMoveWithProfiler(self, Controller)
+        CheckAction(Action)
+        ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+        if ReplaceChoice != 0:
+            self.__Write(self._CurrentPlayer.GetName() + " takes the offer in place of move option " + str(ReplaceChoice) +
+                         "\n")
+            self.__TakeMoveOptionOffer(ReplaceChoice)
+            self.__DisplayState()
+        self.__Write(self._CurrentPlayer.GetName() + " uses move option " + str(Choice) + " to move from " + str(
+            StartSquareReference) + " to " + str(FinishSquareReference) + "\n")
+        MoveLegal = self.__CheckAndMakeQueueMove(Choice, StartSquareReference, FinishSquareReference)
+        self.__LogTurn((ReplaceChoice, Choice, StartSquareReference, FinishSquareReference), MoveLegal)
+        if MoveLegal:
+            self.__Write("New score: " + str(self._CurrentPlayer.GetScore()) + "\n\n")
+
+    def __UpdateBoard(self, StartSquareReference, FinishSquareReference):
+        """
+        It takes a start square reference and a finish square reference, and it moves the piece from the start square to the
+        finish square
+
+        :param StartSquareReference: The reference of the square that the piece is moving from
+        :param FinishSquareReference: The square that the piece is moving to
+        """
+        StartIndex = self.__GetIndexOfSquare(StartSquareReference)
+        FinishIndex = self.__GetIndexOfSquare(FinishSquareReference)
+        CapturedPiece = self._Board[FinishIndex].GetPieceInSquare()
+        if CapturedPiece is not None:
+            self._Hash ^= self._ZobristKeys.GetPieceKey(FinishIndex, self.__GetZobristKindOfPiece(CapturedPiece))
+            self.__RemoveFromAttackMaps(self.__GetIndexOfPlayer(CapturedPiece.GetBelongsTo()), FinishIndex)
+            if CapturedPiece.GetTypeOfPiece() == "mirza":
+                self._MirzaAlive[self.__GetIndexOfPlayer(CapturedPiece.GetBelongsTo())] = False
+        MovingPiece = self._Board[StartIndex].RemovePiece()
+        MovingKind = self.__GetZobristKindOfPiece(MovingPiece)
+        self._Hash ^= self._ZobristKeys.GetPieceKey(StartIndex, MovingKind) ^ self._ZobristKeys.GetPieceKey(
+            FinishIndex, MovingKind)
+        self.__RemoveFromAttackMaps(MovingKind // 2, StartIndex)
+        self.__AddToAttackMaps(MovingKind // 2, FinishIndex)
+        if MovingPiece.GetTypeOfPiece() == "mirza":
+            self._MirzaIndexes[self.__GetIndexOfPlayer(MovingPiece.GetBelongsTo())] = FinishIndex
+        self._Board[FinishIndex].SetPiece(MovingPiece)
+        self._DirtyRows.add(StartIndex // self._NoOfColumns)
+        self._DirtyRows.add(FinishIndex // self._NoOfColumns)
+        if self._Profiler is not None:
+            if CapturedPiece is not None:
+                self._Profiler.Count("captures")
+            if self._Board[FinishIndex].ContainsKotla():
+                self._Profiler.Count("kotla_entries")
+        if StartIndex in self._ScoringSquareIndexes or FinishIndex in self._ScoringSquareIndexes:
+            self._PointsForOccupancy = [None, None]
+
+    def __GetIndexOfPlayer(self, APlayer):
+        """
+        It returns 0 for Player One and 1 for Player Two
+
+        :param APlayer: The player
+        :return: The index of the player in the list of players.
+        """
+        if self._Players[0].SameAs(APlayer):
+            return 0
+        return 1
+
+    def __DisplayFinalResult(self):
+        """
+        If the scores are equal, print "Draw!", otherwise print the name of the player with the higher score, followed by "
+        is the winner!"
+        """
+        if self._Players[0].GetScore() == self._Players[1].GetScore():
+            self.__Write("Draw!\n")
+        elif self._Players[0].GetScore() > self._Players[1].GetScore():
+            self.__Write(self._Players[0].GetName() + " is the winner!\n")
+        else:
+            self.__Write(self._Players[1].GetName() + " is the winner!\n")
+
+    def __CreateBoard(self):
+        """
+        It creates a board with the number of rows and columns specified by the user
+        """
+        for Row in range(1, self._NoOfRows + 1):
+            for Column in range(1, self._NoOfColumns + 1):
+                if Row == 1 and Column == self._NoOfColumns // 2:
+                    S = Kotla(self._Players[0], "K")
+                elif Row == self._NoOfRows and Column == self._NoOfColumns // 2 + 1:
+                    S = Kotla(self._Players[1], "k")
+                else:
+                    S = Square()
+                if S.ContainsKotla():
+                    self._ScoringSquareIndexes.append(len(self._Board))
+                self._Board.append(S)
+                self._SquareReferences.append(self.GetSquareReference(Row, Column))
+
+    def __CreatePieces(self, NoOfPieces):
+        """
+        It creates the pieces for the game
+
+        :param NoOfPieces: The number of pieces each player has
+        """
+        # pieces have no state of their own, so one piece object is shared by all of a player's pieces
+        CurrentPiece = Piece("piece", self._Players[0], 1, "!")
+        for Count in range(1, NoOfPieces + 1):
+            self._Board[self.__GetIndexOfSquare(self.GetSquareReference(2, Count + 1))].SetPiece(CurrentPiece)
+        CurrentPiece = Piece("mirza", self._Players[0], 5, "1")
+        self._MirzaIndexes[0] = self.__GetIndexOfSquare(self.GetSquareReference(1, self._NoOfColumns // 2))
+        self._MirzaAlive[0] = True
+        self._Board[self._MirzaIndexes[0]].SetPiece(CurrentPiece)
+        CurrentPiece = Piece("piece", self._Players[1], 1, '"')
+        for Count in range(1, NoOfPieces + 1):
+            self._Board[self.__GetIndexOfSquare(self.GetSquareReference(self._NoOfRows - 1, Count + 1))].SetPiece(
+                CurrentPiece)
+        CurrentPiece = Piece("mirza", self._Players[1], 5, "2")
+        self._MirzaIndexes[1] = self.__GetIndexOfSquare(self.GetSquareReference(self._NoOfRows,
+                                                                                self._NoOfColumns // 2 + 1))
+        self._MirzaAlive[1] = True
+        self._Board[self._MirzaIndexes[1]].SetPiece(CurrentPiece)
+
+    def __CreateMoveOptionOffer(self):
+        """
+        It appends the names of the units to the list of units that can be moved
+        """
+        self._MoveOptionOffer.append("jazair")
+        self._MoveOptionOffer.append("chowkidar")
+        self._MoveOptionOffer.append("cuirassier")
+        self._MoveOptionOffer.append("ryott")
+        self._MoveOptionOffer.append("faujdar")
+
+    def __CreateMoveOption(self, Name, Direction):
+        """
+        It returns the move option for a given piece in a given direction. Move options never change once they have been
+        built, so the same object is shared from MOVE_OPTION_CATALOG rather than a new one being created
+
+        :param Name: The name of the piece
+        :param Direction: The direction the piece is moving in
+        :return: the move options for the piece.
+        """
+        return MOVE_OPTION_CATALOG[(Name, Direction)]
+
+    def __CreateMoveOptions(self):
+        """
+        It creates a list of move options for each player, and adds them to the player's move option queue
+        """
+        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("ryott", 1))
+        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("chowkidar", 1))
+        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("cuirassier", 1))
+        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("faujdar", 1))
+        self._Players[0].AddToMoveOptionQueue(self.__CreateMoveOption("jazair", 1))
+        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("ryott", -1))
+        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("chowkidar", -1))
+        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("jazair", -1))
+        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("faujdar", -1))
+        self._Players[1].AddToMoveOptionQueue(self.__CreateMoveOption("cuirassier", -1))
+
+
+# The kinds of piece that have been made, each a (type, points if captured, symbol) tuple. A piece only keeps the number
+# of its kind, so these details are shared by every piece of that kind
+PIECE_KINDS = []
+PIECE_KIND_NUMBERS = {}
+
+
+# The Piece class is a class that represents a piece on the board.
+class Piece:
+    __slots__ = ("_Kind", "_BelongsTo")
+
+    def __init__(self, T, B, P, S):
+        """
+        The function __init__() is a constructor that initializes the data members of the class
+
+        :param T: Type of piece
+        :param B: The player that the piece belongs to
+        :param P: Points if captured
+        :param S: The symbol that will be used to represent the piece on the board
+        """
+        if (T, P, S) not in PIECE_KIND_NUMBERS:
+            PIECE_KIND_NUMBERS[(T, P, S)] = len(PIECE_KINDS)
+            PIECE_KINDS.append((T, P, S))
+        self._Kind = PIECE_KIND_NUMBERS[(T, P, S)]
+        self._BelongsTo = B
+
+    def __reduce__(self):
+        """
+        A piece is pickled by its details rather than its kind number, as another process may have numbered the kinds
+        differently
+        :return: The class and the arguments to make the piece again.
+        """
+        T, P, S = PIECE_KINDS[self._Kind]
+        return Piece, (T, self._BelongsTo, P, S)
+
+    def GetSymbol(self):
+        """
+        It returns the value of the variable _Symbol.
+        :return: The symbol of the stock.
+        """
+        return PIECE_KINDS[self._Kind][2]
+
+    def GetTypeOfPiece(self):
+        """
+        It returns the type of piece.
+        :return: The type of piece.
+        """
+        return PIECE_KINDS[self._Kind][0]
+
+    def GetBelongsTo(self):
+        """
+        It returns the value of the variable _BelongsTo.
+        :return: The value of the _BelongsTo attribute.
+        """
+        return self._BelongsTo
+
+    def GetPointsIfCaptured(self):
+        """
+        It returns the value of the variable _PointsIfCaptured.
+        :return: The points that the player will get if they capture the piece.
+        """
+        return PIECE_KINDS[self._Kind][1]
+
+
+# A Square is a place on the board where a piece can be placed
+class Square:
+    # every plain square has the same owner and symbol, so only the piece in it is stored in each square
+    __slots__ = ("_PieceInSquare",)
+    _BelongsTo = None
+    _Symbol = " "
+
+    def __init__(self):
+        """
+        The function __init__() is a constructor that initializes the instance variables of the class Square
+        """
+        self._PieceInSquare = None
+
+    def SetPiece(self, P):
+        """
+        The function SetPiece() takes a piece as an argument and sets the piece in the square
+
+        :param P: The piece that is being set in the square
+        """
+        self._PieceInSquare = P
+
+    def RemovePiece(self):
+        """
+        It removes the piece from the square and returns it
+        :return: The piece that was in the square.
+        """
+        PieceToReturn = self._PieceInSquare
+        self._PieceInSquare = None
+        return PieceToReturn
+
+    def GetPieceInSquare(self):
+        """
+        This function returns the piece in the square
+        :return: The piece in the square.
+        """
+        return self._PieceInSquare
+
+    def GetSymbol(self):
+        """
+        It returns the value of the variable _Symbol.
+        :return: The symbol of the stock.
+        """
+        return self._Symbol
+
+    def GetPointsForOccupancy(self, CurrentPlayer):
+        """
+        > This function returns 0 points for the current player
+
+        :param CurrentPlayer: The player who is currently occupying the space
+        :return: 0
+        """
+        return 0
+
+    def GetBelongsTo(self):
+        """
+        It returns the value of the variable _BelongsTo.
+        :return: The value of the _BelongsTo attribute.
+        """
+        return self._BelongsTo
+
+    def ContainsKotla(self):
+        """
+        If the symbol of the current object is "K" or "k", return True, otherwise return False
+        :return: a boolean value.
+        """
+        if self._Symbol == "K" or self._Symbol == "k":
+            return True
+        else:
+            return False
+
+
+# Kotla is a subclass of Square, and it has a constructor that takes in a Player and a Symbol, and it has a method called
+# GetPointsForOccupancy that takes in a Player and returns an integer
+class Kotla(Square):
+    __slots__ = ("_BelongsTo", "_Symbol")
+
+    def __init__(self, P, S):
+        """
+        The function __init__() is a constructor that initializes the class Kotla
+
+        :param P: The player who owns the kotla
+        :param S: The symbol of the Kotla
+        """
+        super(Kotla, self).__init__()
+        self._BelongsTo = P
+        self._Symbol = S
+
+    def GetPointsForOccupancy(self, CurrentPlayer):
+        """
+        If the square is occupied by a piece of the current player, return 5, if it's occupied by a piece of the opponent,
+        return 1, else return 0
+
+        :param CurrentPlayer: The player whose turn it is
         :return: The points for the player who is occupying the square.
         """
-        if self._PieceInSquare is None:
-            return 0
-        elif self._BelongsTo.SameAs(CurrentPlayer):
-            if CurrentPlayer.SameAs(self._PieceInSquare.GetBelongsTo()) and (
-                    self._PieceInSquare.GetTypeOfPiece() == "piece" or self._PieceInSquare.GetTypeOfPiece() == "mirza"):
-                return 5
+        if self._PieceInSquare is None:
+            return 0
+        elif self._BelongsTo.SameAs(CurrentPlayer):
+            if CurrentPlayer.SameAs(self._PieceInSquare.GetBelongsTo()) and (
+                    self._PieceInSquare.GetTypeOfPiece() == "piece" or self._PieceInSquare.GetTypeOfPiece() == "mirza"):
+                return 5
+            else:
+                return 0
+        else:
+            if CurrentPlayer.SameAs(self._PieceInSquare.GetBelongsTo()) and (
+                    self._PieceInSquare.GetTypeOfPiece() == "piece" or self._PieceInSquare.GetTypeOfPiece() == "mirza"):
+                return 1
+            else:
+                return 0
+
+
+# The MoveOption class is a class that contains a list of possible moves that a piece can make. Once it is frozen its
+# moves are kept in a tuple and a frozenset and cannot be added to, which is how the shared ones in MOVE_OPTION_CATALOG
+# are kept
+class MoveOption:
+    __slots__ = ("_Name", "_PossibleMoves", "_Changes", "_DestinationTables", "_Frozen")
+
+    def __init__(self, N):
+        """
+        The function __init__() is a constructor that initializes the object's name and possible moves
+
+        :param N: The name of the player
+        """
+        self._Name = N
+        self._PossibleMoves = []
+        self._Changes = set()
+        self._DestinationTables = {}
+        self._Frozen = False
+
+    def AddToPossibleMoves(self, M):
+        """
+        It takes a move (M) and adds it to the list of possible moves
+
+        :param M: The move to be added to the list of possible moves
+        """
+        if self._Frozen:
+            raise ValueError("the " + self._Name + " move option is frozen and cannot be changed")
+        self._PossibleMoves.append(M)
+        self._Changes.add((M.GetRowChange(), M.GetColumnChange()))
+        self._DestinationTables = {}
+
+    def Freeze(self):
+        """
+        It stops any more moves being added, so that the move option can be shared
+        :return: The move option itself.
+        """
+        self._PossibleMoves = tuple(self._PossibleMoves)
+        self._Changes = frozenset(self._Changes)
+        self._Frozen = True
+        return self
+
+    def IsFrozen(self):
+        """
+        :return: True if the move option has been frozen.
+        """
+        return self._Frozen
+
+    def GetName(self):
+        """
+        The function GetName() returns the value of the private variable _Name
+        :return: The name of the person.
+        """
+        return self._Name
+
+    def GetPossibleMoves(self):
+        """
+        It returns the moves that this move option allows
+        :return: A list of Move objects, or a tuple once the move option is frozen.
+        """
+        return self._PossibleMoves
+
+    def CheckIfThereIsAMoveToSquare(self, StartSquareReference, FinishSquareReference, ReferenceBase=10):
+        """
+        If the start square and the finish square are the same, then the piece can't move
+
+        :param StartSquareReference: The reference of the square the piece is on
+        :param FinishSquareReference: The square that the piece is trying to move to
+        :param ReferenceBase: The number the row number is multiplied by in a square reference
+        :return: A boolean value.
+        """
+        return (FinishSquareReference // ReferenceBase - StartSquareReference // ReferenceBase,
+                FinishSquareReference % ReferenceBase - StartSquareReference % ReferenceBase) in self._Changes
+
+    def GetDestinationTable(self, NoOfRows, NoOfColumns):
+        """
+        It returns a table giving, for the index of each square on a board of the given size, the indexes of the squares
+        on the board that this move option can reach from it. The table is built the first time a board size is asked for
+        and then kept
+
+        :param NoOfRows: The number of rows on the board
+        :param NoOfColumns: The number of columns on the board
+        :return: A tuple of tuples of square indexes.
+        """
+        DestinationTable = self._DestinationTables.get((NoOfRows, NoOfColumns))
+        if DestinationTable is None:
+            Destinations = []
+            for StartRow in range(NoOfRows):
+                for StartColumn in range(NoOfColumns):
+                    Reachable = []
+                    for M in self._PossibleMoves:
+                        FinishRow = StartRow + M.GetRowChange()
+                        FinishColumn = StartColumn + M.GetColumnChange()
+                        if 0 <= FinishRow < NoOfRows and 0 <= FinishColumn < NoOfColumns:
+                            Reachable.append(FinishRow * NoOfColumns + FinishColumn)
+                    Destinations.append(tuple(Reachable))
+            DestinationTable = tuple(Destinations)
+            self._DestinationTables[(NoOfRows, NoOfColumns)] = DestinationTable
+        return DestinationTable
+
+
+# The Move class is a class that represents a move in the game of chess.
+# There are only a few different moves, so each (row change, column change) pair is made once and then shared
+class Move:
+    __slots__ = ("_RowChange", "_ColumnChange")
+    __Interned = {}
+
+    def __new__(cls, R, C):
+        Existing = Move.__Interned.get((R, C))
+        if Existing is None:
+            Existing = super(Move, cls).__new__(cls)
+            Existing._RowChange = R
+            Existing._ColumnChange = C
+            Move.__Interned[(R, C)] = Existing
+        return Existing
+
+    def __getnewargs__(self):
+        return self._RowChange, self._ColumnChange
+
+    def GetRowChange(self):
+        return self._RowChange
+
+    def GetColumnChange(self):
+        return self._ColumnChange
+
+
+# It's a queue of MoveOption objects
+class MoveOptionQueue:
+    __slots__ = ("__Queue",)
+
+    def __init__(self):
+        """
+        The function __init__() initializes the queue
+        """
+        self.__Queue = []
+
+    def GetQueueAsString(self):
+        """
+        It takes a queue of movies and returns a string of the movies in the queue
+        :return: The queue as a string.
+        """
+        QueueAsString = ""
+        Count = 1
+        for M in self.__Queue:
+            QueueAsString += str(Count) + ". " + M.GetName() + "   "
+            Count += 1
+        return QueueAsString
+
+    def Add(self, NewMoveOption):
+        """
+        It adds a new move option to the queue
+
+        :param NewMoveOption: The MoveOption object to add to the queue
+        """
+        self.__Queue.append(NewMoveOption)
+
+    def Replace(self, Position, NewMoveOption):
+        """
+        Replace(self, Position, NewMoveOption) replaces the MoveOption at Position with NewMoveOption.
+
+        :param Position: The position in the queue to replace
+        :param NewMoveOption: The new move option to replace the old one
+        """
+        self.__Queue[Position] = NewMoveOption
+
+    def MoveItemToBack(self, Position):
+        """
+        It takes the item at the position specified by the user and moves it to the back of the queue
+
+        :param Position: The position of the item you want to move to the back of the queue
+        """
+        Temp = self.__Queue[Position]
+        self.__Queue.pop(Position)
+        self.__Queue.append(Temp)
+
+    def GetContents(self):
+        """
+        It returns the move options in the queue, front first
+        :return: A tuple of MoveOption objects.
+        """
+        return tuple(self.__Queue)
+
+    def SetContents(self, MoveOptions):
+        """
+        It replaces the whole queue with the given move options
+
+        :param MoveOptions: The move options to put in the queue, front first
+        """
+        self.__Queue = list(MoveOptions)
+
+    def GetMoveOptionInPosition(self, Pos):
+        """
+        It returns the move option in the position of the queue
+
+        :param Pos: The position of the move option in the queue
+        :return: The move option in the position specified.
+        """
+        return self.__Queue[Pos]
+
+
+# A player has a name, a direction, a score and a queue of move options
+class Player:
+    __slots__ = ("__Score", "__Name", "__Direction", "__Queue")
+
+    def __init__(self, N, D):
+        """
+        The __init__ function initializes the class with the name, direction, and score of the player
+
+        :param N: Name of the player
+        :param D: The direction the player is facing
+        """
+        self.__Score = 100
+        self.__Name = N
+        self.__Direction = D
+        self.__Queue = MoveOptionQueue()
+
+    def SameAs(self, APlayer):
+        """
+        If the player is not None and the player's name is the same as the name of the player who called the function,
+        return True, otherwise return False
+
+        :param APlayer: The player to compare to
+        :return: The name of the player.
+        """
+        if APlayer is None:
+            return False
+        elif APlayer.GetName() == self.__Name:
+            return True
+        else:
+            return False
+
+    def GetPlayerStateAsString(self):
+        """
+        It returns a string that contains the player's name, score, and the contents of the player's move option queue.
+        :return: The player's name, score, and the queue of moves.
+        """
+        return self.__Name + "\n" + "Score: " + str(
+            self.__Score) + "\n" + "Move option queue: " + self.__Queue.GetQueueAsString() + "\n"
+
+    def AddToMoveOptionQueue(self, NewMoveOption):
+        """
+        It adds a new move option to the queue
+
+        :param NewMoveOption: The MoveOption object to add to the queue
+        """
+        self.__Queue.Add(NewMoveOption)
+
+    def UpdateQueueAfterMove(self, Position):
+        """
+        It moves the item at the given position to the back of the queue
+
+        :param Position: The position of the item in the queue
+        """
+        self.__Queue.MoveItemToBack(Position - 1)
+
+    def UpdateMoveOptionQueueWithOffer(self, Position, NewMoveOption):
+        """
+        It replaces the MoveOption at the given position in the queue with the given MoveOption
+
+        :param Position: The position in the queue to replace
+        :param NewMoveOption: This is the new move option that will be added to the queue
+        """
+        self.__Queue.Replace(Position, NewMoveOption)
+
+    def GetScore(self):
+        """
+        The function GetScore() returns the value of the private variable __Score
+        :return: The score of the player.
+        """
+        return self.__Score
+
+    def GetName(self):
+        """
+        The function GetName() returns the value of the private variable __Name
+        :return: The name of the person.
+        """
+        return self.__Name
+
+    def GetDirection(self):
+        """
+        It returns the direction of the robot.
+        :return: The direction of the car.
+        """
+        return self.__Direction
+
+    def ChangeScore(self, Amount):
+        """
+        The function ChangeScore() takes in a parameter called Amount, and adds it to the variable Score
+
+        :param Amount: The amount to change the score by
+        """
+        self.__Score += Amount
+
+    def GetMoveOptionQueueContents(self):
+        """
+        It returns the move options in the player's queue, front first
+        :return: A tuple of MoveOption objects.
+        """
+        return self.__Queue.GetContents()
+
+    def SetMoveOptionQueueContents(self, MoveOptions):
+        """
+        It replaces the player's whole queue with the given move options
+
+        :param MoveOptions: The move options to put in the queue, front first
+        """
+        self.__Queue.SetContents(MoveOptions)
+
+    def Clone(self):
+        """
+        It makes a new player with the same name, direction, score and queue. The move options in the queue are shared
+        :return: The copy of the player.
+        """
+        Copy = Player(self.__Name, self.__Direction)
+        Copy.__Score = self.__Score
+        Copy.__Queue.SetContents(self.__Queue.GetContents())
+        return Copy
+
+    def GetMoveOptionInPosition(self, Pos):
+        """
+        It returns the move option in position Pos of the player's queue
+
+        :param Pos: The position of the move option in the queue (1 to 5)
+        :return: The move option in that position.
+        """
+        return self.__Queue.GetMoveOptionInPosition(Pos - 1)
+
+    def CheckPlayerMove(self, Pos, StartSquareReference, FinishSquareReference, ReferenceBase=10):
+        """
+        It checks if there is a move from StartSquareReference to FinishSquareReference in the position Pos
+
+        :param Pos: The position of the move in the queue
+        :param StartSquareReference: The reference of the square the player wants to move from
+        :param FinishSquareReference: The square that the player wants to move to
+        :param ReferenceBase: The number the row number is multiplied by in a square reference
+        :return: A boolean value.
+        """
+        Temp = self.__Queue.GetMoveOptionInPosition(Pos - 1)
+        return Temp.CheckIfThereIsAMoveToSquare(StartSquareReference, FinishSquareReference, ReferenceBase)
+
+
+# The moves each move option allows for Player One. Player Two's moves are the same with both changes multiplied by -1
+MOVE_OPTION_CHANGES = {
+    "ryott": ((0, 1), (0, -1), (1, 0), (-1, 0)),
+    "faujdar": ((0, -1), (0, 1), (0, 2), (0, -2)),
+    "jazair": ((2, 0), (2, -2), (2, 2), (0, 2), (0, -2), (-1, -1), (-1, 1)),
+    "cuirassier": ((1, 0), (2, 0), (1, -2), (1, 2)),
+    "chowkidar": ((1, 1), (1, -1), (-1, 1), (-1, -1), (0, 2), (0, -2)),
+}
+
+
+def CreateMoveOptionCatalog():
+    """
+    It builds one MoveOption for every move option name and direction. The catalog is built once when the program starts
+    and its move options are shared by every game, so each one is frozen
+
+    :return: A dictionary of frozen MoveOption objects keyed by (name, direction).
+    """
+    Catalog = {}
+    for Name in MOVE_OPTION_CHANGES:
+        for Direction in (1, -1):
+            NewMoveOption = MoveOption(Name)
+            for RowChange, ColumnChange in MOVE_OPTION_CHANGES[Name]:
+                NewMoveOption.AddToPossibleMoves(Move(RowChange * Direction, ColumnChange * Direction))
+            Catalog[(Name, Direction)] = NewMoveOption.Freeze()
+    return Catalog
+
+
+MOVE_OPTION_NAMES = tuple(MOVE_OPTION_CHANGES)
+
+MOVE_OPTION_CATALOG = CreateMoveOptionCatalog()
+
+
+# The random 64-bit numbers that are combined to make the Zobrist hash of a position: one for each kind of piece on each
+# square, one for each move option name in each position of each player's queue, one for each offer position and one
+# for Player Two being the player whose turn it is
+class ZobristKeys:
+    def __init__(self, NoOfSquares):
+        """
+        The keys come from a generator seeded with the number of squares, so every process makes the same keys
+
+        :param NoOfSquares: The number of squares on the board
+        """
+        Generator = random.Random(NoOfSquares)
+        self._NoOfSquares = NoOfSquares
+        self._PieceKeys = []
+        for Index in range(NoOfSquares):
+            self._PieceKeys.append([Generator.getrandbits(64) for Kind in range(4)])
+        self._QueueKeys = {}
+        for PlayerIndex in range(2):
+            for Slot in range(5):
+                for Name in MOVE_OPTION_CHANGES:
+                    self._QueueKeys[(PlayerIndex, Slot, Name)] = Generator.getrandbits(64)
+        self._OfferKeys = [Generator.getrandbits(64) for Position in range(5)]
+        self._SideToMoveKey = Generator.getrandbits(64)
+
+    def GetPieceKey(self, Index, Kind):
+        """
+        It returns the key for a kind of piece on a square
+
+        :param Index: The index of the square
+        :param Kind: 0 or 1 for Player One's pieces and mirza, 2 or 3 for Player Two's
+        :return: A 64-bit key.
+        """
+        return self._PieceKeys[Index][Kind]
+
+    def GetQueueKey(self, PlayerIndex, Slot, Name):
+        """
+        It returns the key for a move option in a position of a player's queue
+
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Slot: The position in the queue, starting from 0
+        :param Name: The name of the move option
+        :return: A 64-bit key.
+        """
+        return self._QueueKeys[(PlayerIndex, Slot, Name)]
+
+    def GetOfferKey(self, Position):
+        """
+        It returns the key for the move option offer position
+
+        :param Position: The offer position (0 to 4)
+        :return: A 64-bit key.
+        """
+        return self._OfferKeys[Position]
+
+    def GetSideToMoveKey(self):
+        """
+        It returns the key that is included when it is Player Two's turn
+        :return: A 64-bit key.
+        """
+        return self._SideToMoveKey
+
+    def __reduce__(self):
+        """
+        The keys are pickled as just the number of squares, so a game copied into another process or from a snapshot
+        shares that process's keys instead of carrying its own
+        :return: The function and the arguments to get the keys again.
+        """
+        return GetZobristKeys, (self._NoOfSquares,)
+
+
+# The phases of a turn that GameProfiler times, and the things it counts
+PROFILE_PHASES = ("decision", "validation", "update_board", "scoring", "game_over_check", "rendering")
+PROFILE_COUNTERS = ("turns", "illegal_moves", "offers_taken", "captures", "kotla_entries")
+
+
+# It collects how long each phase of the turns of one or more games takes, and counts what happens in them, for a game
+# that has been given it with Dastan.SetProfiler. A game without a profiler only checks that it has none at each phase,
+# so profiling costs next to nothing when it is off. Moves a computer player tries out while it is thinking are not
+# counted, as the profiler is taken off the game while the player chooses its move
+class GameProfiler:
+    def __init__(self):
+        self._Seconds = dict.fromkeys(PROFILE_PHASES, 0.0)
+        self._Calls = dict.fromkeys(PROFILE_PHASES, 0)
+        self._Counters = dict.fromkeys(PROFILE_COUNTERS, 0)
+
+    @staticmethod
+    def Clock():
+        """
+        :return: The time now, in seconds, from the clock used for the timings.
+        """
+        return time.perf_counter()
+
+    def AddTime(self, Phase, Started, Excluding=0.0):
+        """
+        It adds the time since Started to a phase
+
+        :param Phase: The name of the phase
+        :param Started: The time returned by Clock at the start of the phase
+        :param Excluding: Time within the phase that belongs to another phase and has already been added to it
+        :return: The time now, so that the next phase can start from it.
+        """
+        Now = time.perf_counter()
+        self._Seconds[Phase] += Now - Started - Excluding
+        self._Calls[Phase] += 1
+        return Now
+
+    def Count(self, Name, Amount=1):
+        """
+        It adds to one of the counters
+
+        :param Name: The name of the counter
+        :param Amount: The amount to add
+        """
+        self._Counters[Name] += Amount
+
+    def GetSeconds(self, Phase):
+        """
+        :param Phase: The name of the phase
+        :return: The total time spent in the phase so far.
+        """
+        return self._Seconds[Phase]
+
+    def GetStats(self):
+        """
+        It returns the timings and counts so far
+        :return: A dictionary with the total seconds and number of timings of each phase, and the counters.
+        """
+        return {"phases": {Phase: {"seconds": self._Seconds[Phase], "calls": self._Calls[Phase]} for Phase in
+                           PROFILE_PHASES}, "counters": dict(self._Counters)}
+
+    def GetJSONLine(self, **Extra):
+        """
+        It returns the timings and counts as one line of JSON, for adding to a JSON lines log
+
+        :param Extra: Anything else to put in the line, such as the game number
+        :return: The line, ending with a newline.
+        """
+        Line = dict(Extra)
+        Line.update(self.GetStats())
+        return json.dumps(Line) + "\n"
+
+    def Reset(self):
+        """
+        It sets all the timings and counts back to 0
+        """
+        self.__init__()
+
+
+def ChooseMoveWithProfiler(Game, Controller):
+    """
+    It asks a computer player for its move. If the game has a profiler the time taken is added to the decision phase,
+    and the profiler is taken off the game until the player has chosen, so that the moves it tries are not counted
+
+    :param Game: The Dastan game
+    :param Controller: The computer player
+    :return: The action the computer player chose.
+    """
+    Profiler = Game.GetProfiler()
+    if Profiler is None:
+        return Controller.ChooseMove(Game)
+    Game.SetProfiler(None)
+    Started = Profiler.Clock()
+    try:
+        return Controller.ChooseMove(Game)
+    finally:
+        Profiler.AddTime("decision", Started)
+        Game.SetProfiler(Profiler)
+
+
+BOARD_FRAMES = {}
+
+
+def GetBoardFrame(NoOfRows, NoOfColumns):
+    """
+    It returns the text that goes above and below the rows of a board of the given size, making it the first time: the
+    column numbers and top border, and the bottom border and blank line
+
+    :param NoOfRows: The number of rows
+    :param NoOfColumns: The number of columns
+    :return: A tuple (Header, Footer).
+    """
+    if (NoOfRows, NoOfColumns) not in BOARD_FRAMES:
+        Margin = " " * (len(str(NoOfRows)) + 1)
+        Header = ("\n" + Margin + " " + "".join(str(Column).ljust(3) for Column in range(1, NoOfColumns + 1)) + "\n" +
+                  Margin + "---" * NoOfColumns + "-\n")
+        Footer = Margin + "-" + "---" * NoOfColumns + "\n\n"
+        BOARD_FRAMES[(NoOfRows, NoOfColumns)] = (Header, Footer)
+    return BOARD_FRAMES[(NoOfRows, NoOfColumns)]
+
+
+ZOBRIST_KEYS = {}
+
+
+def GetZobristKeys(NoOfSquares):
+    """
+    It returns the shared Zobrist keys for boards with the given number of squares, making them the first time
+
+    :param NoOfSquares: The number of squares on the board
+    :return: A ZobristKeys object.
+    """
+    if NoOfSquares not in ZOBRIST_KEYS:
+        ZOBRIST_KEYS[NoOfSquares] = ZobristKeys(NoOfSquares)
+    return ZOBRIST_KEYS[NoOfSquares]
+
+
+ATTACK_TARGETS = {}
+
+
+def GetAttackTargets(NoOfRows, NoOfColumns):
+    """
+    It returns the tables that the attack maps are kept up to date with, making them the first time. For each player and
+    each square there is a tuple of the places in the player's attack counts that a piece on that square adds one to:
+    OptionNumber * NoOfSquares + FinishIndex for every square FinishIndex that the move option numbered OptionNumber in
+    MOVE_OPTION_NAMES can reach from it, in that player's direction
+
+    :param NoOfRows: The number of rows
+    :param NoOfColumns: The number of columns
+    :return: A tuple of Player One's table and Player Two's table.
+    """
+    if (NoOfRows, NoOfColumns) not in ATTACK_TARGETS:
+        NoOfSquares = NoOfRows * NoOfColumns
+        Tables = []
+        for Direction in (1, -1):
+            DestinationTables = [MOVE_OPTION_CATALOG[(Name, Direction)].GetDestinationTable(NoOfRows, NoOfColumns)
+                                 for Name in MOVE_OPTION_NAMES]
+            Tables.append(tuple(tuple(OptionNumber * NoOfSquares + FinishIndex
+                                      for OptionNumber in range(len(MOVE_OPTION_NAMES))
+                                      for FinishIndex in DestinationTables[OptionNumber][StartIndex])
+                                for StartIndex in range(NoOfSquares)))
+        ATTACK_TARGETS[(NoOfRows, NoOfColumns)] = tuple(Tables)
+    return ATTACK_TARGETS[(NoOfRows, NoOfColumns)]
+
+
+# A fixed-size table of search results keyed by position hash. Each bucket has a depth-preferred entry, which is only
+# replaced by a search at least as deep, and an always-replace entry. The replacement policy decides which are used
+class TranspositionTable:
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    def __init__(self, Size, ReplacementPolicy="two-tier"):
+        """
+        :param Size: The number of buckets
+        :param ReplacementPolicy: "two-tier" to use both entries in each bucket, "depth-preferred" to use only the
+        depth-preferred entry or "always-replace" to use only the always-replace entry
+        """
+        if ReplacementPolicy not in ("two-tier", "depth-preferred", "always-replace"):
+            raise ValueError("unknown replacement policy: " + str(ReplacementPolicy))
+        self._Size = Size
+        self._ReplacementPolicy = ReplacementPolicy
+        self._DepthPreferred = [None] * Size
+        self._AlwaysReplace = [None] * Size
+        self._Hits = 0
+        self._Misses = 0
+        self._Collisions = 0
+
+    def Store(self, PositionHash, Depth, Value, Flag, BestMove):
+        """
+        It stores a search result in the bucket for PositionHash, following the replacement policy
+
+        :param PositionHash: The hash of the position
+        :param Depth: The depth the position was searched to
+        :param Value: The value found
+        :param Flag: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param BestMove: The best action found, or None
+        """
+        Bucket = PositionHash % self._Size
+        Entry = (PositionHash, Depth, Value, Flag, BestMove)
+        if self._ReplacementPolicy == "always-replace":
+            self._AlwaysReplace[Bucket] = Entry
+            return
+        Existing = self._DepthPreferred[Bucket]
+        if Existing is None or Existing[0] == PositionHash or Depth >= Existing[1]:
+            self._DepthPreferred[Bucket] = Entry
+        elif self._ReplacementPolicy == "two-tier":
+            self._AlwaysReplace[Bucket] = Entry
+
+    def Probe(self, PositionHash):
+        """
+        It looks for a stored result for PositionHash. Finding a different position in the bucket counts as a collision
+
+        :param PositionHash: The hash of the position
+        :return: The entry (PositionHash, Depth, Value, Flag, BestMove), or None if there is not one.
+        """
+        Bucket = PositionHash % self._Size
+        Occupied = False
+        for Entry in (self._DepthPreferred[Bucket], self._AlwaysReplace[Bucket]):
+            if Entry is not None:
+                if Entry[0] == PositionHash:
+                    self._Hits += 1
+                    return Entry
+                Occupied = True
+        if Occupied:
+            self._Collisions += 1
+        else:
+            self._Misses += 1
+        return None
+
+    def Clear(self):
+        """
+        It empties the table and resets the counters
+        """
+        self._DepthPreferred = [None] * self._Size
+        self._AlwaysReplace = [None] * self._Size
+        self._Hits = 0
+        self._Misses = 0
+        self._Collisions = 0
+
+    def GetStats(self):
+        """
+        It returns the probe counters
+        :return: A dictionary with the number of hits, misses and collisions.
+        """
+        return {"hits": self._Hits, "misses": self._Misses, "collisions": self._Collisions}
+
+
+# Raised inside a search when its time budget has run out
+class SearchTimeout(Exception):
+    pass
+
+
+# A computer player that searches ahead with negamax and alpha-beta pruning. It deepens one ply at a time until its
+# time limit is up and plays the best move of the deepest search it finished. Taking the offer is a chance node: the
+# value is the average over the five offers that could come up next
+class AlphaBetaPlayer:
+    WIN_VALUE = 100000
+
+    def __init__(self, TimeLimit=1.0, MaxDepth=20, TableSize=1 << 16, ReplacementPolicy="two-tier", Tablebase=None):
+        """
+        :param TimeLimit: The most time, in seconds, to spend on each move
+        :param MaxDepth: The deepest search to try
+        :param TableSize: The number of buckets in the transposition table
+        :param ReplacementPolicy: The replacement policy of the transposition table
+        :param Tablebase: An EndgameTablebase whose winning moves are searched first, or None
+        """
+        self._TimeLimit = TimeLimit
+        self._MaxDepth = MaxDepth
+        self._Table = TranspositionTable(TableSize, ReplacementPolicy)
+        self._Tablebase = Tablebase
+        self._Deadline = 0
+        self._Nodes = 0
+        self._TablebaseHits = 0
+        self._DepthReached = 0
+
+    def ChooseMove(self, Game):
+        """
+        It searches to greater and greater depths until the time limit is reached, then returns the best move from the
+        deepest completed search
+
+        :param Game: The Dastan game, which is put back as it was before this returns
+        :return: The chosen action.
+        """
+        self._Deadline = time.perf_counter() + self._TimeLimit
+        self._Nodes = 0
+        self._TablebaseHits = 0
+        self._DepthReached = 0
+        Moves = self.__OrderMoves(Game, Game.GenerateLegalMoves(), None)
+        if not Moves:
+            return PASS_ACTION
+        BestMove = Moves[0]
+        for Depth in range(1, self._MaxDepth + 1):
+            try:
+                BestMove = self.__SearchRoot(Game, Depth, Moves)
+            except SearchTimeout:
+                break
+            self._DepthReached = Depth
+            Moves.remove(BestMove)
+            Moves.insert(0, BestMove)
+        return BestMove
+
+    def GetLastSearchInfo(self):
+        """
+        It returns how much work the last call to ChooseMove did
+        :return: A dictionary with the number of nodes searched, the deepest completed depth, the table counters and the
+        number of positions where the tablebase gave the first move to search.
+        """
+        return {"nodes": self._Nodes, "depth": self._DepthReached, "table": self._Table.GetStats(),
+                "tablebase_hits": self._TablebaseHits}
+
+    def __SearchRoot(self, Game, Depth, Moves):
+        """
+        It searches every root move to the given depth
+
+        :param Game: The Dastan game
+        :param Depth: The depth to search to
+        :param Moves: The root moves, best first
+        :return: The best move.
+        """
+        Alpha = -float("inf")
+        BestMove = Moves[0]
+        for Action in Moves:
+            Value = self.__SearchAction(Game, Action, Depth, Alpha, float("inf"))
+            if Value > Alpha:
+                Alpha = Value
+                BestMove = Action
+        return BestMove
+
+    def __SearchAction(self, Game, Action, Depth, Alpha, Beta):
+        """
+        It makes a move, searches the position that follows and takes the move back. If the move takes the offer, every
+        possible next offer is searched and the values are averaged, unless the position that follows is only going to be
+        evaluated, as the evaluation does not depend on the offer
+
+        :param Game: The Dastan game
+        :param Action: The move to search
+        :param Depth: The depth left, including this move
+        :param Alpha: The lower bound of the search window
+        :param Beta: The upper bound of the search window
+        :return: The value of the move for the player making it.
+        """
+        if Action[0] == 0 or Depth == 1:
+            Game.MakeMove(Action)
+            try:
+                return -self.__Negamax(Game, Depth - 1, -Beta, -Alpha)
+            finally:
+                Game.UnmakeMove()
+        Total = 0
+        for NextOfferPosition in range(5):
+            Game.MakeMove(Action, NextOfferPosition)
+            try:
+                Total -= self.__Negamax(Game, Depth - 1, -float("inf"), float("inf"))
+            finally:
+                Game.UnmakeMove()
+        return Total / 5
+
+    def __Negamax(self, Game, Depth, Alpha, Beta):
+        """
+        It returns the value of the position for the player whose turn it is, searched to the given depth. If the
+        transposition table has no move for the position, the tablebase's winning move, if it has one, is searched
+        first. The tablebase only orders the moves and never gives a value, as it does not know that the losing player
+        can take the offer to escape
+
+        :param Game: The Dastan game
+        :param Depth: The depth left
+        :param Alpha: The lower bound of the search window
+        :param Beta: The upper bound of the search window
+        :return: The value of the position.
+        """
+        self._Nodes += 1
+        if time.perf_counter() > self._Deadline:
+            raise SearchTimeout()
+        if Depth == 0 or Game.IsGameOver():
+            return self.Evaluate(Game)
+        Key = self.__GetKey(Game)
+        Entry = self._Table.Probe(Key)
+        TableMove = None
+        if Entry is not None:
+            TableMove = Entry[4]
+            if Entry[1] >= Depth:
+                if Entry[3] == TranspositionTable.EXACT:
+                    return Entry[2]
+                elif Entry[3] == TranspositionTable.LOWER_BOUND:
+                    Alpha = max(Alpha, Entry[2])
+                else:
+                    Beta = min(Beta, Entry[2])
+                if Alpha >= Beta:
+                    return Entry[2]
+        if TableMove is None and self._Tablebase is not None:
+            TableMove = self._Tablebase.ChooseMove(Game)
+            if TableMove is not None:
+                self._TablebaseHits += 1
+        OriginalAlpha = Alpha
+        Moves = self.__OrderMoves(Game, Game.GenerateLegalMoves(), TableMove)
+        if not Moves:
+            Moves = [PASS_ACTION]
+        BestValue = -float("inf")
+        BestMove = None
+        for Action in Moves:
+            Value = self.__SearchAction(Game, Action, Depth, Alpha, Beta)
+            if Value > BestValue:
+                BestValue = Value
+                BestMove = Action
+            if Value > Alpha:
+                Alpha = Value
+            if Alpha >= Beta:
+                break
+        if BestValue <= OriginalAlpha:
+            Flag = TranspositionTable.UPPER_BOUND
+        elif BestValue >= Beta:
+            Flag = TranspositionTable.LOWER_BOUND
+        else:
+            Flag = TranspositionTable.EXACT
+        self._Table.Store(Key, Depth, BestValue, Flag, BestMove)
+        return BestValue
+
+    def __GetKey(self, Game):
+        """
+        The hash of a position does not include the scores, but the value of a position does depend on how far one
+        player is ahead, so the difference in scores is mixed into the key
+
+        :param Game: The Dastan game
+        :return: A 64-bit key.
+        """
+        Players = Game.GetPlayers()
+        ScoreDifference = Players[0].GetScore() - Players[1].GetScore()
+        return Game.GetHash() ^ ((ScoreDifference * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+
+    def Evaluate(self, Game):
+        """
+        It values a position for the player whose turn it is. A finished game is worth WIN_VALUE to the winner. Otherwise
+        the value is the difference in scores, which already includes capture points and what has been paid for move
+        options, plus the difference in the points each player would get for the kotlas they occupy
+
+        :param Game: The Dastan game
+        :return: The value of the position.
+        """
+        Me = Game.GetCurrentPlayer()
+        Players = Game.GetPlayers()
+        if Me.SameAs(Players[0]):
+            Opponent = Players[1]
+        else:
+            Opponent = Players[0]
+        ScoreDifference = Me.GetScore() - Opponent.GetScore()
+        if Game.IsGameOver():
+            if ScoreDifference > 0:
+                return AlphaBetaPlayer.WIN_VALUE + ScoreDifference
+            elif ScoreDifference < 0:
+                return -AlphaBetaPlayer.WIN_VALUE + ScoreDifference
+            return 0
+        return ScoreDifference + Game.GetPointsForOccupancy(Me) - Game.GetPointsForOccupancy(Opponent)
+
+    def __OrderMoves(self, Game, Moves, TableMove):
+        """
+        It puts the moves most likely to be best first: the transposition table's move, then captures of the mirza, then
+        moves into a kotla, then other captures, with cheaper moves first within each group
+
+        :param Game: The Dastan game
+        :param Moves: The moves to order
+        :param TableMove: The best move stored in the transposition table, or None
+        :return: The ordered list of moves.
+        """
+        Keyed = []
+        for Action in Moves:
+            ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+            FinishSquare = Game.GetSquare(FinishSquareReference)
+            PieceInSquare = FinishSquare.GetPieceInSquare()
+            if Action == TableMove:
+                Group = 0
+            elif PieceInSquare is not None and PieceInSquare.GetTypeOfPiece() == "mirza":
+                Group = 1
+            elif FinishSquare.ContainsKotla():
+                Group = 2
+            elif PieceInSquare is not None:
+                Group = 3
+            else:
+                Group = 4
+            Cost = Choice + (2 * (Choice - 1))
+            if ReplaceChoice != 0:
+                Cost += 10 - (ReplaceChoice * 2)
+            Keyed.append((Group, Cost, Action))
+        Keyed.sort()
+        return [Action for Group, Cost, Action in Keyed]
+
+
+# A node in a Monte Carlo search tree. It stands for the action that led to it, and keeps how often it has been visited
+# and the total value of those visits for the player who made the action
+class MCTSNode:
+    __slots__ = ("Action", "Parent", "MoverIndex", "Children", "Visits", "TotalValue")
+
+    def __init__(self, Action, Parent, MoverIndex):
+        """
+        :param Action: The action that leads to this node, or None for the root
+        :param Parent: The parent node, or None for the root
+        :param MoverIndex: 0 if Player One made the action, 1 if Player Two did
+        """
+        self.Action = Action
+        self.Parent = Parent
+        self.MoverIndex = MoverIndex
+        self.Children = {}
+        self.Visits = 0
+        self.TotalValue = 0.0
+
+
+def RunMCTSWorker(Game, Iterations, Seed, ExplorationConstant, RolloutDepth, Tablebase=None):
+    """
+    It grows a Monte Carlo search tree with UCT from the current position of Game. The tree is open-loop: each iteration
+    replays its actions from the root with fresh random offers, and a node only chooses among children whose actions are
+    legal in the position reached this time, so the random offer refresh is sampled rather than modelled. The offers
+    are drawn from this worker's own generator, as UnmakeMove puts the game's generator back and every iteration would
+    otherwise see the same ones. In the rollouts a player plays the tablebase's winning move when it has one; the
+    tablebase never replaces a rollout, as it does not know that the losing player can take the offer to escape. It is
+    a module-level function so that a process pool can run it
+
+    :param Game: The Dastan game, which is put back as it was before this returns, or its position packed by ToBytes
+    :param Iterations: The number of iterations to run
+    :param Seed: The seed for this worker's random numbers
+    :param ExplorationConstant: The UCT exploration constant
+    :param RolloutDepth: The most turns played at random at the end of each iteration
+    :param Tablebase: An EndgameTablebase, or the name of its file, to guide the rollouts, or None
+    :return: A tuple (Statistics, Nodes), where Statistics maps each root action to (visits, total value) and Nodes is the
+    number of positions visited.
+    """
+    if isinstance(Game, bytes):
+        Game = Dastan.FromBytes(Game, Seed)
+    if isinstance(Tablebase, str):
+        Tablebase = GetEndgameTablebase(Tablebase)
+    Generator = random.Random(Seed)
+    Game.GetRandom().seed(Seed)
+    Players = Game.GetPlayers()
+    Root = MCTSNode(None, None, None)
+    Nodes = 0
+    for Iteration in range(Iterations):
+        Node = Root
+        Depth = 0
+        # selection and expansion
+        while not Game.IsGameOver():
+            MoverIndex = 0 if Game.GetCurrentPlayer().SameAs(Players[0]) else 1
+            LegalMoves = Game.GenerateLegalMoves()
+            if not LegalMoves:
+                LegalMoves = [PASS_ACTION]
+            Untried = [Action for Action in LegalMoves if Action not in Node.Children]
+            if Untried:
+                Action = Generator.choice(Untried)
+                Child = MCTSNode(Action, Node, MoverIndex)
+                Node.Children[Action] = Child
+                Game.MakeMove(Action, Generator.randrange(5))
+                Depth += 1
+                Nodes += 1
+                Node = Child
+                break
+            LogVisits = math.log(Node.Visits + 1)
+            BestScore = -1.0
+            BestChild = None
+            for Action in LegalMoves:
+                Child = Node.Children[Action]
+                Score = Child.TotalValue / Child.Visits + ExplorationConstant * math.sqrt(LogVisits / Child.Visits)
+                if Score > BestScore:
+                    BestScore = Score
+                    BestChild = Child
+            Node = BestChild
+            Game.MakeMove(Node.Action, Generator.randrange(5))
+            Depth += 1
+            Nodes += 1
+        # rollout
+        Rollout = 0
+        while not Game.IsGameOver() and Rollout < RolloutDepth:
+            Action = None
+            if Tablebase is not None:
+                Action = Tablebase.ChooseMove(Game)
+            if Action is None:
+                LegalMoves = Game.GenerateLegalMoves()
+                Action = Generator.choice(LegalMoves) if LegalMoves else PASS_ACTION
+            Game.MakeMove(Action, Generator.randrange(5))
+            Rollout += 1
+            Nodes += 1
+        # the leader on score when the rollout stops is treated as the winner
+        ScoreDifference = Players[0].GetScore() - Players[1].GetScore()
+        if ScoreDifference > 0:
+            ValueForPlayerOne = 1.0
+        elif ScoreDifference < 0:
+            ValueForPlayerOne = 0.0
+        else:
+            ValueForPlayerOne = 0.5
+        for Count in range(Depth + Rollout):
+            Game.UnmakeMove()
+        # backpropagation
+        while Node is not None:
+            Node.Visits += 1
+            if Node.MoverIndex == 0:
+                Node.TotalValue += ValueForPlayerOne
+            elif Node.MoverIndex == 1:
+                Node.TotalValue += 1.0 - ValueForPlayerOne
+            Node = Node.Parent
+    Statistics = {}
+    for Action in Root.Children:
+        Statistics[Action] = (Root.Children[Action].Visits, Root.Children[Action].TotalValue)
+    return Statistics, Nodes
+
+
+# A computer player that uses Monte Carlo Tree Search (UCT). It uses root parallelism: each worker process grows its own
+# tree from the current position with its own seed, and the visit counts of the root actions are added together. The
+# worker processes are started by the first search and kept until Close, which a with block calls at its end
+class MCTSPlayer:
+    def __init__(self, Iterations=2000, Workers=None, Seed=None, ExplorationConstant=1.4, RolloutDepth=40,
+                 Tablebase=None):
+        """
+        :param Iterations: The total number of iterations per move, shared between the workers
+        :param Workers: The number of worker processes, or None for one per processor. With 1 the search runs in this
+        process
+        :param Seed: The seed for the workers' random numbers, or None for a different search every time
+        :param ExplorationConstant: The UCT exploration constant
+        :param RolloutDepth: The most turns played at random at the end of each iteration
+        :param Tablebase: An EndgameTablebase to guide the rollouts, or None. Worker processes map the same file
+        """
+        if Workers is None:
+            Workers = os.cpu_count() or 1
+        self._Iterations = Iterations
+        self._Workers = Workers
+        self._Generator = random.Random(Seed)
+        self._ExplorationConstant = ExplorationConstant
+        self._RolloutDepth = RolloutDepth
+        self._Tablebase = Tablebase
+        self._Executor = None
+        self._Nodes = 0
+        self._Time = 0.0
+
+    def ChooseMove(self, Game):
+        """
+        It runs the search in the workers and returns the root action that was visited most
+
+        :param Game: The Dastan game, which is not changed
+        :return: The chosen action.
+        """
+        StartTime = time.perf_counter()
+        Seeds = [self._Generator.getrandbits(32) for Count in range(self._Workers)]
+        Shares = [self._Iterations // self._Workers + (1 if Count < self._Iterations % self._Workers else 0)
+                  for Count in range(self._Workers)]
+        if self._Workers == 1:
+            RandomState = Game.GetRandom().getstate()
+            Results = [RunMCTSWorker(Game, Shares[0], Seeds[0], self._ExplorationConstant, self._RolloutDepth,
+                                     self._Tablebase)]
+            Game.GetRandom().setstate(RandomState)
+        else:
+            if self._Executor is None:
+                self._Executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._Workers)
+            # the workers reseed the game's random number generator anyway, so the packed position is all they need
+            State = Game.ToBytes()
+            TablebaseFile = None if self._Tablebase is None else self._Tablebase.GetFileName()
+            Futures = [self._Executor.submit(RunMCTSWorker, State, Shares[Count], Seeds[Count], self._ExplorationConstant,
+                                             self._RolloutDepth, TablebaseFile)
+                       for Count in range(self._Workers) if Shares[Count] > 0]
+            Results = [Future.result() for Future in Futures]
+        Visits = {}
+        self._Nodes = 0
+        for Statistics, Nodes in Results:
+            self._Nodes += Nodes
+            for Action in Statistics:
+                Visits[Action] = Visits.get(Action, 0) + Statistics[Action][0]
+        self._Time = time.perf_counter() - StartTime
+        if not Visits:
+            return PASS_ACTION
+        return max(Visits, key=Visits.get)
+
+    def GetLastSearchInfo(self):
+        """
+        It returns how much work the last call to ChooseMove did
+        :return: A dictionary with the number of nodes visited, the time taken and the nodes per second.
+        """
+        if self._Time > 0:
+            NodesPerSecond = self._Nodes / self._Time
+        else:
+            NodesPerSecond = 0.0
+        return {"nodes": self._Nodes, "seconds": self._Time, "nodes_per_second": NodesPerSecond}
+
+    def Close(self):
+        """
+        It shuts down the worker processes
+        """
+        if self._Executor is not None:
+            self._Executor.shutdown()
+            self._Executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExceptionType, ExceptionValue, Traceback):
+        self.Close()
+
+
+# An OfferRecorder stands in for a game in RunMCTSWorker, passing everything on to the game and noting the offer
+# position after each move from the root that takes the offer
+class OfferRecorder:
+    def __init__(self, Game):
+        self._Game = Game
+        self._OfferPositions = set()
+
+    def __getattr__(self, Name):
+        return getattr(self._Game, Name)
+
+    def MakeMove(self, Action, NextOfferPosition=None):
+        """
+        It makes the move on the game, noting the new offer position if it was made from the root and took the offer
+
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :param NextOfferPosition: If the offer is taken, the offer position to use next instead of a random one
+        :return: True if the move was legal and has been made, otherwise False.
+        """
+        FromRoot = self._Game.GetNoOfMovesToUnmake() == 0
+        MoveLegal = self._Game.MakeMove(Action, NextOfferPosition)
+        if FromRoot and MoveLegal and Action[0] != 0:
+            self._OfferPositions.add(self._Game.GetMoveOptionOfferPosition())
+        return MoveLegal
+
+    def GetOfferPositions(self):
+        return self._OfferPositions
+
+
+def CheckMCTSOfferSampling(R=6, C=6, NoOfPieces=4, Iterations=200, Seed=0):
+    """
+    It runs one MCTS worker on a new game and checks that its iterations see more than one offer position after the
+    root moves that take the offer, so that the search samples the offer refresh instead of replaying the same one
+
+    :param R: The number of rows
+    :param C: The number of columns
+    :param NoOfPieces: The number of pieces each player starts with
+    :param Iterations: The number of iterations to run
+    :param Seed: The seed for the game and the worker
+    :return: None if different iterations saw different offers, otherwise a sorted tuple of the offer positions that
+    were seen, which is empty if no iteration took the offer.
+    """
+    Recorder = OfferRecorder(Dastan(R, C, NoOfPieces, Seed))
+    RunMCTSWorker(Recorder, Iterations, Seed, 1.4, 0)
+    if len(Recorder.GetOfferPositions()) > 1:
+        return None
+    return tuple(sorted(Recorder.GetOfferPositions()))
+
+
+# The methods a game engine gives the computer players, the search and the comparisons. Dastan and BitboardDastan both
+# have all of them, so either can be played by the same policies
+ENGINE_INTERFACE = ("GenerateLegalMoves", "ApplyMove", "MakeMove", "UnmakeMove", "GetNoOfMovesToUnmake", "IsGameOver",
+                    "Result", "GetCurrentPlayer", "GetPlayers", "GetSquare", "GetSquareReference", "GetNoOfRows",
+                    "GetNoOfColumns", "GetReferenceBase", "GetNoOfPieces", "GetMoveOptionOffer",
+                    "GetMoveOptionOfferPosition", "GetPointsForOccupancy", "GetPieceCounts", "GetHash", "GetRandom", "GetProfiler",
+                    "Clone", "ToBytes")
+
+
+# A BitboardDastan plays the same game as Dastan, but keeps the board as integer bitmasks (one per player, one for the
+# mirzas and one for the kotlas) so that occupancy checks, captures and move generation are mask operations. Bit
+# (Row - 1) * NoOfColumns + (Column - 1) stands for the square in that row and column. The players and pieces that
+# ENGINE_INTERFACE hands out are views: the players are brought up to date from the scores and queues the first time
+# they are asked for after a move, and every GetSquare makes a new square holding the piece the masks have there
+class BitboardDastan:
+    def __init__(self, R, C, NoOfPieces, Seed=None):
+        """
+        It sets up the same starting position as Dastan(R, C, NoOfPieces, Seed), read from a Dastan object so that the two
+        boards always agree
+
+        :param R: Number of rows
+        :param C: The number of columns in the board
+        :param NoOfPieces: The number of pieces each player has
+        :param Seed: The seed for this game's random number generator, or None for a different game every time
+        """
+        self.__LoadFromDastan(Dastan(R, C, NoOfPieces, Seed))
+
+    def __LoadFromDastan(self, Game):
+        """
+        It copies the position of a Dastan game into bitmasks, and builds the shift tables for every move option that can
+        be in a queue or on offer
+
+        :param Game: The Dastan game to copy
+        """
+        self._NoOfRows = Game.GetNoOfRows()
+        self._NoOfColumns = Game.GetNoOfColumns()
+        self._NoOfPieces = Game.GetNoOfPieces()
+        self._ReferenceBase = Game.GetReferenceBase()
+        self._FullMask = (1 << (self._NoOfRows * self._NoOfColumns)) - 1
+        self._PlayerMasks = [0, 0]
+        self._MirzaMask = 0
+        self._KotlaMask = 0
+        self._KotlaMasksOwnedBy = [0, 0]
+        self._KotlaSymbols = {}
+        self._PieceDetails = {}
+        Players = Game.GetPlayers()
+        for Row in range(1, self._NoOfRows + 1):
+            for Column in range(1, self._NoOfColumns + 1):
+                Bit = 1 << ((Row - 1) * self._NoOfColumns + (Column - 1))
+                S = Game.GetSquare(Game.GetSquareReference(Row, Column))
+                if S.ContainsKotla():
+                    self._KotlaMask |= Bit
+                    Owner = 0 if Players[0].SameAs(S.GetBelongsTo()) else 1
+                    self._KotlaMasksOwnedBy[Owner] |= Bit
+                    self._KotlaSymbols[Bit.bit_length() - 1] = (Owner, S.GetSymbol())
+                PieceInSquare = S.GetPieceInSquare()
+                if PieceInSquare is not None:
+                    PlayerIndex = 0 if Players[0].SameAs(PieceInSquare.GetBelongsTo()) else 1
+                    self._PlayerMasks[PlayerIndex] |= Bit
+                    if PieceInSquare.GetTypeOfPiece() == "mirza":
+                        self._MirzaMask |= Bit
+                    self._PieceDetails[(PlayerIndex, PieceInSquare.GetTypeOfPiece() == "mirza")] = (
+                        PieceInSquare.GetTypeOfPiece(), PieceInSquare.GetPointsIfCaptured(), PieceInSquare.GetSymbol())
+        self._PlayerNames = [Players[0].GetName(), Players[1].GetName()]
+        self._Directions = [Players[0].GetDirection(), Players[1].GetDirection()]
+        self._Scores = [Players[0].GetScore(), Players[1].GetScore()]
+        self._Queues = []
+        self._MoveOptions = {}
+        for P in Players:
+            Queue = []
+            for Pos in range(1, 6):
+                AMoveOption = P.GetMoveOptionInPosition(Pos)
+                Queue.append(AMoveOption.GetName())
+                self._MoveOptions[(AMoveOption.GetName(), P.GetDirection())] = self.__CreateShiftTable(AMoveOption)
+            self._Queues.append(Queue)
+        self._MoveOptionOffer = list(Game.GetMoveOptionOffer())
+        for Name in self._MoveOptionOffer:
+            for Direction in self._Directions:
+                if (Name, Direction) not in self._MoveOptions:
+                    self._MoveOptions[(Name, Direction)] = self.__CreateShiftTable(MOVE_OPTION_CATALOG[(Name, Direction)])
+        self._MoveOptionOfferPosition = Game.GetMoveOptionOfferPosition()
+        self._Random = random.Random()
+        self._Random.setstate(Game.GetRandom().getstate())
+        self._CurrentPlayerIndex = 0 if Players[0].SameAs(Game.GetCurrentPlayer()) else 1
+        self._GameOver = Game.IsGameOver()
+        self._UndoStack = []
+        self.__CreateViews()
+
+    def __CreateViews(self):
+        """
+        It makes the players and pieces that the accessors hand out. Only the players' scores and queues change, and
+        those are filled in when they are asked for
+        """
+        self._Players = [Player(self._PlayerNames[PlayerIndex], self._Directions[PlayerIndex])
+                         for PlayerIndex in range(2)]
+        self._Pieces = {}
+        for (PlayerIndex, IsMirza), (T, P, Symbol) in self._PieceDetails.items():
+            self._Pieces[(PlayerIndex, IsMirza)] = Piece(T, self._Players[PlayerIndex], P, Symbol)
+        self._PlayersOutOfDate = True
+
+    def __UpdatePlayers(self):
+        """
+        It copies the scores and queues into the player views, if a move has been made or taken back since they were
+        last copied
+        """
+        if not self._PlayersOutOfDate:
+            return
+        self._PlayersOutOfDate = False
+        for PlayerIndex in range(2):
+            P = self._Players[PlayerIndex]
+            P.ChangeScore(self._Scores[PlayerIndex] - P.GetScore())
+            P.SetMoveOptionQueueContents([MOVE_OPTION_CATALOG[(Name, self._Directions[PlayerIndex])]
+                                          for Name in self._Queues[PlayerIndex]])
+
+    def __CreateShiftTable(self, AMoveOption):
+        """
+        For each move in a move option it works out how far the bits move and which bits can make the move without
+        leaving the board through the side of a row. Leaving through the top or bottom is dealt with by the full mask
+
+        :param AMoveOption: The move option to build the table for
+        :return: A list of (Shift, SourceMask) tuples.
+        """
+        ShiftTable = []
+        for M in AMoveOption.GetPossibleMoves():
+            SourceMask = 0
+            for Row in range(self._NoOfRows):
+                for Column in range(self._NoOfColumns):
+                    if 0 <= Column + M.GetColumnChange() < self._NoOfColumns:
+                        SourceMask |= 1 << (Row * self._NoOfColumns + Column)
+            ShiftTable.append((M.GetRowChange() * self._NoOfColumns + M.GetColumnChange(), SourceMask))
+        return ShiftTable
+
+    def __GetSquareReferenceOfBit(self, BitIndex):
+        """
+        It converts a bit index into a square reference
+
+        :param BitIndex: The index of the bit
+        :return: The square reference, row number followed by column number.
+        """
+        return (BitIndex // self._NoOfColumns + 1) * self._ReferenceBase + BitIndex % self._NoOfColumns + 1
+
+    def __GetBitOfSquare(self, SquareReference):
+        """
+        It converts a square reference into a single-bit mask, or 0 if the square is not on the board
+
+        :param SquareReference: The square reference, row number followed by column number
+        :return: The mask for the square.
+        """
+        Row = SquareReference // self._ReferenceBase
+        Column = SquareReference % self._ReferenceBase
+        if Row < 1 or Row > self._NoOfRows or Column < 1 or Column > self._NoOfColumns:
+            return 0
+        return 1 << ((Row - 1) * self._NoOfColumns + (Column - 1))
+
+    def __GetMovesForMoveOption(self, Name):
+        """
+        It lists every (start, finish) pair that the current player can make with a move option, shifting all of the
+        player's pieces at once for each move
+
+        :param Name: The name of the move option
+        :return: A list of (StartSquareReference, FinishSquareReference) tuples.
+        """
+        OwnMask = self._PlayerMasks[self._CurrentPlayerIndex]
+        TargetMask = self._FullMask & ~OwnMask
+        Moves = []
+        for Shift, SourceMask in self._MoveOptions[(Name, self._Directions[self._CurrentPlayerIndex])]:
+            if Shift >= 0:
+                Destinations = ((OwnMask & SourceMask) << Shift) & TargetMask
+            else:
+                Destinations = ((OwnMask & SourceMask) >> -Shift) & TargetMask
+            while Destinations:
+                LowestBit = Destinations & -Destinations
+                FinishBitIndex = LowestBit.bit_length() - 1
+                Moves.append((self.__GetSquareReferenceOfBit(FinishBitIndex - Shift),
+                              self.__GetSquareReferenceOfBit(FinishBitIndex)))
+                Destinations ^= LowestBit
+        return Moves
+
+    def GenerateLegalMoves(self):
+        """
+        It lists every legal action for the current player, in the same form as Dastan.GenerateLegalMoves
+        :return: A list of (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference) tuples.
+        """
+        Queue = self._Queues[self._CurrentPlayerIndex]
+        MovesForChoice = [None]
+        for Choice in range(1, 4):
+            MovesForChoice.append(self.__GetMovesForMoveOption(Queue[Choice - 1]))
+        MovesForOffer = self.__GetMovesForMoveOption(self._MoveOptionOffer[self._MoveOptionOfferPosition])
+        LegalMoves = []
+        for ReplaceChoice in range(0, 6):
+            for Choice in range(1, 4):
+                if ReplaceChoice == Choice:
+                    Moves = MovesForOffer
+                else:
+                    Moves = MovesForChoice[Choice]
+                for StartSquareReference, FinishSquareReference in Moves:
+                    LegalMoves.append((ReplaceChoice, Choice, StartSquareReference, FinishSquareReference))
+        return LegalMoves
+
+    def __CheckMove(self, Choice, StartBit, FinishBit):
+        """
+        It checks that the move option in position Choice of the current player's queue moves a piece of theirs from
+        StartBit to FinishBit, and that FinishBit does not hold one of their own pieces
+
+        :param Choice: The position in the queue (1 to 3) of the move option being used
+        :param StartBit: The mask of the start square
+        :param FinishBit: The mask of the finish square
+        :return: A boolean value.
+        """
+        OwnMask = self._PlayerMasks[self._CurrentPlayerIndex]
+        if Choice < 1 or Choice > 3 or not StartBit & OwnMask or not FinishBit or FinishBit & OwnMask:
+            return False
+        Name = self._Queues[self._CurrentPlayerIndex][Choice - 1]
+        for Shift, SourceMask in self._MoveOptions[(Name, self._Directions[self._CurrentPlayerIndex])]:
+            if StartBit & SourceMask and FinishBit.bit_length() - StartBit.bit_length() == Shift:
+                return True
+        return False
+
+    def __GetPointsForOccupancy(self, PlayerIndex):
+        """
+        It returns the points the player gets for occupying kotlas: 5 for their own kotla and 1 for the other player's
+
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :return: The points for occupancy.
+        """
+        OwnMask = self._PlayerMasks[PlayerIndex]
+        Points = 0
+        if OwnMask & self._KotlaMasksOwnedBy[PlayerIndex]:
+            Points += 5
+        if OwnMask & self._KotlaMasksOwnedBy[1 - PlayerIndex]:
+            Points += 1
+        return Points
+
+    def ApplyMove(self, Action, NextOfferPosition=None):
+        """
+        It plays a whole turn for the current player, with the same rules as Dastan.ApplyMove
+
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :param NextOfferPosition: If the offer is taken, the offer position to use next instead of a random one
+        :return: True if the move was legal and has been made, otherwise False.
+        """
+        CheckAction(Action)
+        ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+        Index = self._CurrentPlayerIndex
+        if ReplaceChoice != 0:
+            self._Queues[Index][ReplaceChoice - 1] = self._MoveOptionOffer[self._MoveOptionOfferPosition]
+            self._Scores[Index] -= 10 - (ReplaceChoice * 2)
+            if NextOfferPosition is None:
+                NextOfferPosition = self._Random.randint(0, 4)
+            self._MoveOptionOfferPosition = NextOfferPosition
+        StartBit = self.__GetBitOfSquare(StartSquareReference)
+        FinishBit = self.__GetBitOfSquare(FinishSquareReference)
+        MoveLegal = self.__CheckMove(Choice, StartBit, FinishBit)
+        if MoveLegal:
+            PointsForPieceCapture = 0
+            OpponentMask = self._PlayerMasks[1 - Index]
+            if FinishBit & OpponentMask:
+                PointsForPieceCapture = 5 if FinishBit & self._MirzaMask else 1
+                self._PlayerMasks[1 - Index] = OpponentMask & ~FinishBit
+                self._MirzaMask &= ~FinishBit
+            self._Scores[Index] -= Choice + (2 * (Choice - 1))
+            self._Queues[Index].append(self._Queues[Index].pop(Choice - 1))
+            self._PlayerMasks[Index] = (self._PlayerMasks[Index] & ~StartBit) | FinishBit
+            if self._MirzaMask & StartBit:
+                self._MirzaMask = (self._MirzaMask & ~StartBit) | FinishBit
+            self._Scores[Index] += self.__GetPointsForOccupancy(Index) + PointsForPieceCapture
+        self._CurrentPlayerIndex = 1 - Index
+        self._GameOver = self.__CheckIfGameOver()
+        self._PlayersOutOfDate = True
+        return MoveLegal
+
+    def __CheckIfGameOver(self):
+        """
+        The game is over if either mirza has been captured or a mirza is in the other player's kotla
+        :return: a boolean value.
+        """
+        Mirza1 = self._MirzaMask & self._PlayerMasks[0]
+        Mirza2 = self._MirzaMask & self._PlayerMasks[1]
+        if not Mirza1 or not Mirza2:
+            return True
+        return bool(Mirza1 & self._KotlaMasksOwnedBy[1] or Mirza2 & self._KotlaMasksOwnedBy[0])
+
+    def MakeMove(self, Action, NextOfferPosition=None):
+        """
+        It plays a turn in the same way as ApplyMove, but first pushes a record onto the undo stack holding everything
+        UnmakeMove needs to put the game back. The masks and scores are just integers, so the record is a copy of them
+        along with the mover's queue, the offer position, the random number generator state if the offer is taken and
+        whose turn it was
+
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :param NextOfferPosition: If the offer is taken, the offer position to use next instead of a random one
+        :return: True if the move was legal and has been made, otherwise False.
+        """
+        CheckAction(Action)
+        RandomState = None
+        if Action[0] != 0:
+            RandomState = self._Random.getstate()
+        Index = self._CurrentPlayerIndex
+        self._UndoStack.append((tuple(self._PlayerMasks), self._MirzaMask, tuple(self._Scores),
+                                list(self._Queues[Index]), self._MoveOptionOfferPosition, RandomState, Index,
+                                self._GameOver))
+        return self.ApplyMove(Action, NextOfferPosition)
+
+    def UnmakeMove(self):
+        """
+        It takes back the last turn played with MakeMove, restoring the position exactly
+        """
+        (PlayerMasks, self._MirzaMask, Scores, Queue, self._MoveOptionOfferPosition, RandomState,
+         self._CurrentPlayerIndex, self._GameOver) = self._UndoStack.pop()
+        self._PlayerMasks = list(PlayerMasks)
+        self._Scores = list(Scores)
+        self._Queues[self._CurrentPlayerIndex] = Queue
+        if RandomState is not None:
+            self._Random.setstate(RandomState)
+        self._PlayersOutOfDate = True
+
+    def GetNoOfMovesToUnmake(self):
+        """
+        It returns how many turns played with MakeMove can be taken back
+        :return: The size of the undo stack.
+        """
+        return len(self._UndoStack)
+
+    def IsGameOver(self):
+        """
+        It returns whether the game has finished
+        :return: a boolean value.
+        """
+        return self._GameOver
+
+    def Result(self):
+        """
+        It returns the result of a finished game: 0 for a draw, 1 if Player One has won or 2 if Player Two has won
+        :return: The result of the game, or None if the game is not over.
+        """
+        if not self._GameOver:
+            return None
+        elif self._Scores[0] == self._Scores[1]:
+            return 0
+        elif self._Scores[0] > self._Scores[1]:
+            return 1
+        else:
+            return 2
+
+    def GetRandom(self):
+        """
+        It returns the random number generator this game uses to pick the move option offer
+        :return: A random.Random object.
+        """
+        return self._Random
+
+    def GetScores(self):
+        """
+        It returns the scores of both players, Player One first
+        :return: A list of two scores.
+        """
+        return self._Scores
+
+    def GetCurrentPlayer(self):
+        """
+        It returns the player whose turn it is
+        :return: The current player.
+        """
+        self.__UpdatePlayers()
+        return self._Players[self._CurrentPlayerIndex]
+
+    def GetPlayers(self):
+        """
+        It returns both players, Player One first
+        :return: The list of players.
+        """
+        self.__UpdatePlayers()
+        return self._Players
+
+    def GetSquare(self, SquareReference):
+        """
+        It makes a new square (or kotla) for the given square reference, holding the piece the masks have there. Changing
+        it does not change the game, and later moves do not change it
+
+        :param SquareReference: The reference of the square, row number followed by column number
+        :return: The Square object.
+        """
+        Bit = self.__GetBitOfSquare(SquareReference)
+        if not Bit:
+            raise IndexError("square " + str(SquareReference) + " is not on the board")
+        Index = Bit.bit_length() - 1
+        if Index in self._KotlaSymbols:
+            Owner, Symbol = self._KotlaSymbols[Index]
+            S = Kotla(self._Players[Owner], Symbol)
+        else:
+            S = Square()
+        if Bit & self._PlayerMasks[0]:
+            S.SetPiece(self._Pieces[(0, bool(Bit & self._MirzaMask))])
+        elif Bit & self._PlayerMasks[1]:
+            S.SetPiece(self._Pieces[(1, bool(Bit & self._MirzaMask))])
+        return S
+
+    def GetSquareReference(self, Row, Column):
+        """
+        It returns the reference of the square in the given row and column
+
+        :param Row: The row number, starting from 1
+        :param Column: The column number, starting from 1
+        :return: The square reference.
+        """
+        return Row * self._ReferenceBase + Column
+
+    def GetNoOfRows(self):
+        """
+        It returns the number of rows on the board
+        :return: The number of rows.
+        """
+        return self._NoOfRows
+
+    def GetNoOfColumns(self):
+        """
+        It returns the number of columns on the board
+        :return: The number of columns.
+        """
+        return self._NoOfColumns
+
+    def GetReferenceBase(self):
+        """
+        It returns the number the row number is multiplied by in a square reference
+        :return: A power of 10.
+        """
+        return self._ReferenceBase
+
+    def GetNoOfPieces(self):
+        """
+        It returns the number of pieces each player started with
+        :return: The number of pieces.
+        """
+        return self._NoOfPieces
+
+    def GetMoveOptionOffer(self):
+        """
+        It returns the names of the move options that can be offered, in the order they are picked from
+        :return: The list of move option names.
+        """
+        return self._MoveOptionOffer
+
+    def GetMoveOptionOfferPosition(self):
+        """
+        It returns the position in the offer list of the move option on offer
+        :return: The offer position.
+        """
+        return self._MoveOptionOfferPosition
+
+    def GetPointsForOccupancy(self, APlayer):
+        """
+        It returns the points APlayer would get for the kotlas they occupy at the moment
+
+        :param APlayer: The player
+        :return: The points for occupancy.
+        """
+        return self.__GetPointsForOccupancy(0 if self._Players[0].SameAs(APlayer) else 1)
+
+    def GetPieceCounts(self):
+        """
+        It counts each player's pieces on the board from the masks
+        :return: A tuple of the number of pieces, mirza included, that Player One and Player Two have.
+        """
+        return bin(self._PlayerMasks[0]).count("1"), bin(self._PlayerMasks[1]).count("1")
+
+    def GetHash(self):
+        """
+        It works out the Zobrist hash of the position from the masks, with the same keys as Dastan, so that both engines
+        give a position the same hash
+        :return: A 64-bit hash.
+        """
+        Keys = GetZobristKeys(self._NoOfRows * self._NoOfColumns)
+        PositionHash = 0
+        for PlayerIndex in range(2):
+            Mask = self._PlayerMasks[PlayerIndex]
+            while Mask:
+                LowestBit = Mask & -Mask
+                Kind = 2 * PlayerIndex + (1 if LowestBit & self._MirzaMask else 0)
+                PositionHash ^= Keys.GetPieceKey(LowestBit.bit_length() - 1, Kind)
+                Mask ^= LowestBit
+            for Slot in range(len(self._Queues[PlayerIndex])):
+                PositionHash ^= Keys.GetQueueKey(PlayerIndex, Slot, self._Queues[PlayerIndex][Slot])
+        PositionHash ^= Keys.GetOfferKey(self._MoveOptionOfferPosition)
+        if self._CurrentPlayerIndex == 1:
+            PositionHash ^= Keys.GetSideToMoveKey()
+        return PositionHash
+
+    def GetProfiler(self):
+        """
+        A bitboard game is never profiled
+        :return: None.
+        """
+        return None
+
+    def Clone(self):
+        """
+        It makes a copy of the game. The copy starts with an empty undo stack
+        :return: The copy of the game.
+        """
+        Copy = BitboardDastan.__new__(BitboardDastan)
+        Copy.__dict__.update(self.__dict__)
+        Copy._PlayerMasks = list(self._PlayerMasks)
+        Copy._Scores = list(self._Scores)
+        Copy._Queues = [list(Queue) for Queue in self._Queues]
+        Copy._UndoStack = []
+        Copy._Random = random.Random()
+        Copy._Random.setstate(self._Random.getstate())
+        Copy.__CreateViews()
+        return Copy
+
+    def ToBytes(self):
+        """
+        It packs the position in the same layout as Dastan.ToBytes, so that Dastan.FromBytes can make an object board in
+        the same position
+        :return: The packed position.
+        """
+        Flags = self._CurrentPlayerIndex
+        if self._GameOver:
+            Flags |= 2
+        Parts = [PACKED_STATE_HEADER.pack(self._NoOfRows, self._NoOfColumns, self._NoOfPieces,
+                                          self._MoveOptionOfferPosition, Flags, self._Scores[0], self._Scores[1])]
+        for Queue in self._Queues:
+            Parts.append(bytes(MOVE_OPTION_NAMES.index(Name) for Name in Queue))
+        Board = bytearray(self._NoOfRows * self._NoOfColumns)
+        for PlayerIndex in range(2):
+            Mask = self._PlayerMasks[PlayerIndex]
+            while Mask:
+                LowestBit = Mask & -Mask
+                Board[LowestBit.bit_length() - 1] = 2 * PlayerIndex + (2 if LowestBit & self._MirzaMask else 1)
+                Mask ^= LowestBit
+        Parts.append(bytes(Board))
+        return b"".join(Parts)
+
+
+def GetSymbolOfPieceIn(S):
+    """
+    :param S: A square
+    :return: The symbol of the piece in the square, or a space if it is empty.
+    """
+    PieceInSquare = S.GetPieceInSquare()
+    if PieceInSquare is None:
+        return " "
+    return PieceInSquare.GetSymbol()
+
+
+def CompareBitboardWithObjectBoard(R, C, NoOfPieces, NoOfGames, Seed=0, MaxTurns=200):
+    """
+    It plays random games on a Dastan and a BitboardDastan side by side, checking that both have every method in
+    ENGINE_INTERFACE and, after every turn, that both give the same legal moves, squares, scores, hash, packed position
+    and result, and that the greedy policy picks a legal move on the bitboard. The alpha-beta player, which orders the
+    moves it tries, is also asked for the first move of each game on both and must choose the same one. The bitboard's
+    random number generator is given the same state as the object board's before each turn so that both draw the same
+    new offer
+
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param NoOfGames: The number of games to play
+    :param Seed: The seed used to choose the moves
+    :param MaxTurns: The number of turns after which an unfinished game is abandoned
+    :return: None if the two boards agreed throughout, otherwise a tuple (GameNumber, Turn, Reason) for the first
+    difference, where GameNumber and Turn start from 0 and are None if the difference is not in a game.
+    """
+    for Engine in (Dastan, BitboardDastan):
+        Missing = [Name for Name in ENGINE_INTERFACE if not hasattr(Engine, Name)]
+        if Missing:
+            return None, None, Engine.__name__ + " is missing " + ", ".join(Missing)
+    Chooser = random.Random(Seed)
+    for GameNumber in range(NoOfGames):
+        ObjectGame = Dastan(R, C, NoOfPieces)
+        BitboardGame = BitboardDastan(R, C, NoOfPieces)
+        BitboardGame.GetRandom().setstate(ObjectGame.GetRandom().getstate())
+        if (AlphaBetaPlayer(60.0, 1).ChooseMove(ObjectGame.Clone()) !=
+                AlphaBetaPlayer(60.0, 1).ChooseMove(BitboardGame.Clone())):
+            return GameNumber, 0, "the alpha-beta player chooses different first moves"
+        Turn = 0
+        while not ObjectGame.IsGameOver() and Turn < MaxTurns:
+            LegalMoves = ObjectGame.GenerateLegalMoves()
+            if sorted(LegalMoves) != sorted(BitboardGame.GenerateLegalMoves()):
+                return GameNumber, Turn, "legal moves differ"
+            for Row in range(1, R + 1):
+                for Column in range(1, C + 1):
+                    ObjectSquare = ObjectGame.GetSquare(ObjectGame.GetSquareReference(Row, Column))
+                    BitboardSquare = BitboardGame.GetSquare(BitboardGame.GetSquareReference(Row, Column))
+                    if (ObjectSquare.GetSymbol() + GetSymbolOfPieceIn(ObjectSquare) !=
+                            BitboardSquare.GetSymbol() + GetSymbolOfPieceIn(BitboardSquare)):
+                        return GameNumber, Turn, "square " + str(Row) + ", " + str(Column) + " differs"
+            if GreedyCapturePolicy(Turn).ChooseMove(BitboardGame) not in LegalMoves + [PASS_ACTION]:
+                return GameNumber, Turn, "the greedy policy chooses an illegal move"
+            if LegalMoves:
+                Action = Chooser.choice(LegalMoves)
+            else:
+                Action = PASS_ACTION
+            BitboardGame.GetRandom().setstate(ObjectGame.GetRandom().getstate())
+            ObjectGame.ApplyMove(Action)
+            BitboardGame.ApplyMove(Action)
+            Scores = [P.GetScore() for P in ObjectGame.GetPlayers()]
+            if (Scores != BitboardGame.GetScores() or ObjectGame.IsGameOver() != BitboardGame.IsGameOver() or
+                    ObjectGame.GetHash() != BitboardGame.GetHash() or ObjectGame.ToBytes() != BitboardGame.ToBytes()):
+                return GameNumber, Turn, str(Action) + " gives different states"
+            Turn += 1
+        if ObjectGame.Result() != BitboardGame.Result():
+            return GameNumber, Turn, "results differ"
+    return None
+
+
+def DescribeEngineDifference(Difference):
+    """
+    It puts a difference found by comparing engines into words
+
+    :param Difference: A tuple (GameNumber, Turn, Reason) as returned by CompareBitboardWithObjectBoard
+    :return: A string such as "game 3, turn 12: legal moves differ".
+    """
+    GameNumber, Turn, Reason = Difference
+    if GameNumber is None:
+        return Reason
+    return "game " + str(GameNumber) + ", turn " + str(Turn) + ": " + Reason
+
+
+# A BatchedDastan holds many games at once as NumPy arrays and plays one turn in every game with each call, so that the
+# cost of Python is paid per batch rather than per game. Each square holds 0 if it is empty, 1 or 2 for Player One's
+# piece or mirza and -1 or -2 for Player Two's. Queues hold indexes into MOVE_OPTION_NAMES. An action is a single number
+# standing for (ReplaceChoice, Choice, start square index, move number within the move option)
+class BatchedDastan:
+    def __init__(self, NoOfGames, R, C, NoOfPieces, Seed=None):
+        """
+        It sets up every game in the starting position of Dastan(R, C, NoOfPieces)
+
+        :param NoOfGames: The number of games to hold
+        :param R: Number of rows
+        :param C: The number of columns in the board
+        :param NoOfPieces: The number of pieces each player has
+        :param Seed: The seed for the random offers
+        """
+        if np is None:
+            raise ImportError("BatchedDastan needs NumPy")
+        self._NoOfGames = NoOfGames
+        self._NoOfRows = R
+        self._NoOfColumns = C
+        self._NoOfSquares = R * C
+        self._Generator = np.random.default_rng(Seed)
+        self.__CreateTables(Dastan(R, C, NoOfPieces))
+        self._Boards = np.zeros((NoOfGames, R, C), dtype=np.int8)
+        self._Scores = np.zeros((NoOfGames, 2), dtype=np.int64)
+        self._Queues = np.zeros((NoOfGames, 2, 5), dtype=np.int8)
+        self._OfferPositions = np.zeros(NoOfGames, dtype=np.int8)
+        self._CurrentPlayers = np.zeros(NoOfGames, dtype=np.int8)
+        self._Turns = np.zeros(NoOfGames, dtype=np.int64)
+        self._Finished = np.zeros(NoOfGames, dtype=bool)
+        self.__ResetGames(np.arange(NoOfGames))
+
+    def __CreateTables(self, Game):
+        """
+        It reads the starting position from a Dastan game, so that both always agree, and builds the tables of move
+        changes for every move option and direction
+
+        :param Game: A new Dastan game of the same size
+        """
+        Players = Game.GetPlayers()
+        self._StartBoard = np.zeros((self._NoOfRows, self._NoOfColumns), dtype=np.int8)
+        self._KotlaSquares = [None, None]
+        for Row in range(1, self._NoOfRows + 1):
+            for Column in range(1, self._NoOfColumns + 1):
+                S = Game.GetSquare(Game.GetSquareReference(Row, Column))
+                if S.ContainsKotla():
+                    self._KotlaSquares[0 if Players[0].SameAs(S.GetBelongsTo()) else 1] = (Row - 1) * self._NoOfColumns + (
+                            Column - 1)
+                PieceInSquare = S.GetPieceInSquare()
+                if PieceInSquare is not None:
+                    Value = 2 if PieceInSquare.GetTypeOfPiece() == "mirza" else 1
+                    if not Players[0].SameAs(PieceInSquare.GetBelongsTo()):
+                        Value = -Value
+                    self._StartBoard[Row - 1, Column - 1] = Value
+        self._StartScores = np.array([P.GetScore() for P in Players], dtype=np.int64)
+        self._StartQueues = np.array([[MOVE_OPTION_NAMES.index(AMoveOption.GetName())
+                                       for AMoveOption in P.GetMoveOptionQueueContents()] for P in Players], dtype=np.int8)
+        self._StartOfferPosition = Game.GetMoveOptionOfferPosition()
+        self._OfferOptions = np.array([MOVE_OPTION_NAMES.index(Name) for Name in Game.GetMoveOptionOffer()], dtype=np.int8)
+        self._MaxMoves = max(len(Changes) for Changes in MOVE_OPTION_CHANGES.values())
+        self._RowChanges = np.zeros((len(MOVE_OPTION_NAMES), 2, self._MaxMoves), dtype=np.int64)
+        self._ColumnChanges = np.zeros((len(MOVE_OPTION_NAMES), 2, self._MaxMoves), dtype=np.int64)
+        self._MoveExists = np.zeros((len(MOVE_OPTION_NAMES), 2, self._MaxMoves), dtype=bool)
+        for OptionIndex in range(len(MOVE_OPTION_NAMES)):
+            for PlayerIndex in range(2):
+                AMoveOption = MOVE_OPTION_CATALOG[(MOVE_OPTION_NAMES[OptionIndex], Players[PlayerIndex].GetDirection())]
+                MoveNumber = 0
+                for M in AMoveOption.GetPossibleMoves():
+                    self._RowChanges[OptionIndex, PlayerIndex, MoveNumber] = M.GetRowChange()
+                    self._ColumnChanges[OptionIndex, PlayerIndex, MoveNumber] = M.GetColumnChange()
+                    self._MoveExists[OptionIndex, PlayerIndex, MoveNumber] = True
+                    MoveNumber += 1
+        self._Changes = sorted(set(zip(self._RowChanges[self._MoveExists].tolist(),
+                                       self._ColumnChanges[self._MoveExists].tolist())))
+        self._Padding = max(max(abs(RowChange), abs(ColumnChange)) for RowChange, ColumnChange in self._Changes)
+        self._ChangeIndexes = np.full((len(MOVE_OPTION_NAMES), 2, self._MaxMoves), len(self._Changes), dtype=np.int64)
+        for OptionIndex in range(len(MOVE_OPTION_NAMES)):
+            for PlayerIndex in range(2):
+                for MoveNumber in range(self._MaxMoves):
+                    if self._MoveExists[OptionIndex, PlayerIndex, MoveNumber]:
+                        self._ChangeIndexes[OptionIndex, PlayerIndex, MoveNumber] = self._Changes.index(
+                            (int(self._RowChanges[OptionIndex, PlayerIndex, MoveNumber]),
+                             int(self._ColumnChanges[OptionIndex, PlayerIndex, MoveNumber])))
+        self._RowOfSquare = np.arange(self._NoOfSquares) // self._NoOfColumns
+        self._ColumnOfSquare = np.arange(self._NoOfSquares) % self._NoOfColumns
+        # the order the queue is left in after the move option in each of the first three positions is used
+        self._QueueOrders = np.array([[0, 1, 2, 3, 4][:Pos] + [0, 1, 2, 3, 4][Pos + 1:] + [Pos] for Pos in range(3)])
+        self._NoOfActions = 6 * 3 * self._NoOfSquares * self._MaxMoves
+        # for each (ReplaceChoice, Choice) pair in action order, which of the first three queue positions or the offer
+        # supplies the move option
+        self._OptionSlotOfCombination = np.array([3 if ReplaceChoice == Choice else Choice - 1
+                                                  for ReplaceChoice in range(6) for Choice in range(1, 4)])
+
+    def __ResetGames(self, GameIndexes):
+        """
+        It puts the given games back to the starting position
+
+        :param GameIndexes: An array of game indexes
+        """
+        self._Boards[GameIndexes] = self._StartBoard
+        self._Scores[GameIndexes] = self._StartScores
+        self._Queues[GameIndexes] = self._StartQueues
+        self._OfferPositions[GameIndexes] = self._StartOfferPosition
+        self._CurrentPlayers[GameIndexes] = 0
+        self._Turns[GameIndexes] = 0
+        self._Finished[GameIndexes] = False
+
+    def GetNoOfActions(self):
+        """
+        It returns the number of different actions, which is the width of the legal move masks
+        :return: The number of actions.
+        """
+        return self._NoOfActions
+
+    def EncodeAction(self, ReplaceChoice, Choice, StartIndex, MoveNumber):
+        """
+        It turns the parts of an action into its number
+
+        :param ReplaceChoice: 0, or the position in the queue (1 to 5) that the offer replaces
+        :param Choice: The position in the queue (1 to 3) of the move option used
+        :param StartIndex: The index of the start square, (Row - 1) * NoOfColumns + (Column - 1)
+        :param MoveNumber: The position of the move in the move option's list of possible moves
+        :return: The action number.
+        """
+        return ((ReplaceChoice * 3 + Choice - 1) * self._NoOfSquares + StartIndex) * self._MaxMoves + MoveNumber
+
+    def DecodeAction(self, Action):
+        """
+        It splits an action number, or an array of them, into its parts
+
+        :param Action: The action number
+        :return: A tuple (ReplaceChoice, Choice, StartIndex, MoveNumber).
+        """
+        MoveNumber = Action % self._MaxMoves
+        Rest = Action // self._MaxMoves
+        StartIndex = Rest % self._NoOfSquares
+        Rest = Rest // self._NoOfSquares
+        return Rest // 3, Rest % 3 + 1, StartIndex, MoveNumber
+
+    def GetFinishIndexes(self, Actions):
+        """
+        It works out the finish square of each game's action from the move options in the queues now. The offer is
+        assumed to be taken first if the action asks for it
+
+        :param Actions: An array with one action number per game
+        :return: An array of finish square indexes, which are only meaningful for legal actions.
+        """
+        GameIndexes = np.arange(self._NoOfGames)
+        ReplaceChoice, Choice, StartIndex, MoveNumber = self.DecodeAction(Actions)
+        Options = self._Queues[GameIndexes, self._CurrentPlayers, Choice - 1]
+        Options = np.where(ReplaceChoice == Choice, self._OfferOptions[self._OfferPositions], Options)
+        FinishRow = self._RowOfSquare[StartIndex] + self._RowChanges[Options, self._CurrentPlayers, MoveNumber]
+        FinishColumn = self._ColumnOfSquare[StartIndex] + self._ColumnChanges[Options, self._CurrentPlayers, MoveNumber]
+        return FinishRow * self._NoOfColumns + FinishColumn
+
+    def GenerateLegalMoveMasks(self):
+        """
+        It works out which actions are legal in every game. Finished games have no legal actions
+        :return: A boolean array of shape (games, actions).
+        """
+        Signs = np.where(self._CurrentPlayers == 0, 1, -1).astype(np.int8)
+        Own = (self._Boards * Signs[:, None, None]) > 0
+        Own &= ~self._Finished[:, None, None]
+        # squares off the edge of the board count as blocked, like squares holding the player's own pieces
+        Pad = self._Padding
+        Blocked = np.ones((self._NoOfGames, self._NoOfRows + 2 * Pad, self._NoOfColumns + 2 * Pad), dtype=bool)
+        Blocked[:, Pad:Pad + self._NoOfRows, Pad:Pad + self._NoOfColumns] = Own
+        # the pieces that can make each distinct change, worked out once for every game with plain slicing; the last
+        # plane stays empty and stands for move numbers a move option does not have
+        CanMove = np.zeros((self._NoOfGames, len(self._Changes) + 1, self._NoOfRows, self._NoOfColumns), dtype=bool)
+        for ChangeIndex in range(len(self._Changes)):
+            RowChange, ColumnChange = self._Changes[ChangeIndex]
+            CanMove[:, ChangeIndex] = Own & ~Blocked[:, Pad + RowChange:Pad + RowChange + self._NoOfRows,
+                                                     Pad + ColumnChange:Pad + ColumnChange + self._NoOfColumns]
+        CanMove = CanMove.reshape(self._NoOfGames, len(self._Changes) + 1, self._NoOfSquares)
+        GameIndexes = np.arange(self._NoOfGames)
+        Options = np.empty((self._NoOfGames, 4), dtype=np.int64)
+        Options[:, :3] = self._Queues[GameIndexes, self._CurrentPlayers, :3]
+        Options[:, 3] = self._OfferOptions[self._OfferPositions]
+        ChangeIndexes = self._ChangeIndexes[Options, self._CurrentPlayers[:, None]]
+        Base = CanMove[GameIndexes[:, None, None], ChangeIndexes].transpose(0, 1, 3, 2)
+        return Base[:, self._OptionSlotOfCombination].reshape(self._NoOfGames, self._NoOfActions)
+
+    def SampleRandomActions(self, Masks):
+        """
+        It picks a legal action at random in each game
+
+        :param Masks: The legal move masks from GenerateLegalMoveMasks
+        :return: An array of action numbers, with -1 where a game has no legal action.
+        """
+        # a (ReplaceChoice, Choice) pair is picked in proportion to its number of legal actions, then one of those
+        # actions is picked, which is the same as picking uniformly from all legal actions
+        ByCombination = Masks.reshape(self._NoOfGames, 18, self._NoOfSquares * self._MaxMoves)
+        Counts = ByCombination.sum(axis=2)
+        Totals = Counts.sum(axis=1)
+        Picks = (self._Generator.random(self._NoOfGames) * Totals).astype(np.int64)
+        RunningCounts = np.cumsum(Counts, axis=1)
+        Combinations = np.minimum((RunningCounts <= Picks[:, None]).sum(axis=1), 17)
+        GameIndexes = np.arange(self._NoOfGames)
+        Picks -= RunningCounts[GameIndexes, Combinations] - Counts[GameIndexes, Combinations]
+        Within = np.cumsum(ByCombination[GameIndexes, Combinations], axis=1)
+        Positions = (Within <= Picks[:, None]).sum(axis=1)
+        Actions = Combinations * self._NoOfSquares * self._MaxMoves + Positions
+        return np.where(Totals > 0, Actions, -1)
+
+    def ApplyMoves(self, Actions):
+        """
+        It plays one turn in every unfinished game. As in Dastan.ApplyMove the offer is taken first if asked for and an
+        illegal action, such as -1, loses the turn
+
+        :param Actions: An array with one action number per game
+        """
+        GameIndexes = np.arange(self._NoOfGames)
+        Playing = ~self._Finished
+        Passing = Playing & (np.asarray(Actions) < 0)
+        Actions = np.where(Passing, 0, Actions)
+        ReplaceChoice, Choice, StartIndex, MoveNumber = self.DecodeAction(Actions)
+        Players = self._CurrentPlayers
+
+        # taking the offer
+        Taking = np.nonzero(Playing & ~Passing & (ReplaceChoice > 0))[0]
+        if len(Taking):
+            self._Queues[Taking, Players[Taking], ReplaceChoice[Taking] - 1] = self._OfferOptions[
+                self._OfferPositions[Taking]]
+            self._Scores[Taking, Players[Taking]] -= 10 - 2 * ReplaceChoice[Taking]
+            self._OfferPositions[Taking] = self._Generator.integers(0, 5, size=len(Taking))
+
+        # checking the move against the queue as it is now
+        Flat = self._Boards.reshape(self._NoOfGames, self._NoOfSquares)
+        Options = self._Queues[GameIndexes, Players, Choice - 1]
+        FinishRow = self._RowOfSquare[StartIndex] + self._RowChanges[Options, Players, MoveNumber]
+        FinishColumn = self._ColumnOfSquare[StartIndex] + self._ColumnChanges[Options, Players, MoveNumber]
+        InBounds = (FinishRow >= 0) & (FinishRow < self._NoOfRows) & (FinishColumn >= 0) & (
+                FinishColumn < self._NoOfColumns)
+        FinishIndex = np.clip(FinishRow * self._NoOfColumns + FinishColumn, 0, self._NoOfSquares - 1)
+        Signs = np.where(Players == 0, 1, -1).astype(np.int8)
+        StartOwn = Flat[GameIndexes, StartIndex] * Signs > 0
+        FinishOwn = Flat[GameIndexes, FinishIndex] * Signs > 0
+        Legal = Playing & ~Passing & InBounds & StartOwn & ~FinishOwn & self._MoveExists[Options, Players, MoveNumber]
+
+        # making the legal moves
+        Moving = np.nonzero(Legal)[0]
+        if len(Moving):
+            MoverPlayers = Players[Moving]
+            Captured = np.abs(Flat[Moving, FinishIndex[Moving]])
+            PointsForPieceCapture = np.where(Captured == 2, 5, np.where(Captured == 1, 1, 0))
+            MoveChoice = Choice[Moving]
+            self._Scores[Moving, MoverPlayers] -= MoveChoice + 2 * (MoveChoice - 1)
+            self._Queues[Moving, MoverPlayers] = np.take_along_axis(self._Queues[Moving, MoverPlayers],
+                                                                    self._QueueOrders[MoveChoice - 1], axis=1)
+            Flat[Moving, FinishIndex[Moving]] = Flat[Moving, StartIndex[Moving]]
+            Flat[Moving, StartIndex[Moving]] = 0
+            MoverSigns = Signs[Moving]
+            OnOwnKotla = np.where(MoverPlayers == 0, Flat[Moving, self._KotlaSquares[0]],
+                                  Flat[Moving, self._KotlaSquares[1]]) * MoverSigns > 0
+            OnOtherKotla = np.where(MoverPlayers == 0, Flat[Moving, self._KotlaSquares[1]],
+                                    Flat[Moving, self._KotlaSquares[0]]) * MoverSigns > 0
+            self._Scores[Moving, MoverPlayers] += 5 * OnOwnKotla + OnOtherKotla + PointsForPieceCapture
+
+        # swapping the currently active player and checking for the end of the game
+        self._CurrentPlayers = np.where(Playing, 1 - Players, Players).astype(np.int8)
+        self._Turns += Playing
+        HasMirza1 = (Flat == 2).any(axis=1)
+        HasMirza2 = (Flat == -2).any(axis=1)
+        MirzaInOtherKotla = (Flat[:, self._KotlaSquares[1]] == 2) | (Flat[:, self._KotlaSquares[0]] == -2)
+        self._Finished |= Playing & (~HasMirza1 | ~HasMirza2 | MirzaInOtherKotla)
+
+    def GetResults(self):
+        """
+        It returns the result of each game as Dastan.Result does: 0 for a draw, 1 if Player One has won or 2 if Player
+        Two has won. Unfinished games give -1
+        :return: An array of results.
+        """
+        Results = np.where(self._Scores[:, 0] > self._Scores[:, 1], 1,
+                           np.where(self._Scores[:, 0] < self._Scores[:, 1], 2, 0))
+        return np.where(self._Finished, Results, -1)
+
+    def ResetFinished(self, MaxTurns=None):
+        """
+        It puts every finished game, and every game that has reached MaxTurns, back to the starting position
+
+        :param MaxTurns: The number of turns after which a game is stopped, or None for no limit
+        :return: The indexes of the games that were reset.
+        """
+        Ended = self._Finished.copy()
+        if MaxTurns is not None:
+            Ended |= self._Turns >= MaxTurns
+        GameIndexes = np.nonzero(Ended)[0]
+        if len(GameIndexes):
+            self.__ResetGames(GameIndexes)
+        return GameIndexes
+
+    def GetBoards(self):
+        """
+        :return: The (games, rows, columns) array of squares.
+        """
+        return self._Boards
+
+    def GetScores(self):
+        """
+        :return: The (games, 2) array of scores.
+        """
+        return self._Scores
+
+    def GetQueues(self):
+        """
+        :return: The (games, 2, 5) array of move option indexes.
+        """
+        return self._Queues
+
+    def GetOfferPositions(self):
+        """
+        :return: The array of offer positions.
+        """
+        return self._OfferPositions
+
+    def GetCurrentPlayers(self):
+        """
+        :return: The array of current players, 0 for Player One and 1 for Player Two.
+        """
+        return self._CurrentPlayers
+
+    def GetFinished(self):
+        """
+        :return: The boolean array of finished games.
+        """
+        return self._Finished
+
+
+def CompareBatchedWithObjectBoard(R, C, NoOfPieces, NoOfGames, NoOfTurns, Seed=0):
+    """
+    It plays random games on a BatchedDastan and on one Dastan per game side by side, checking after every turn that the
+    legal moves, scores, queues and finished games agree. Each Dastan is told the offer the batch drew so that both
+    carry on with the same offer
+
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param NoOfGames: The number of games in the batch
+    :param NoOfTurns: The number of turns to play
+    :param Seed: The seed for the random moves and offers
+    :return: None if they agreed throughout, otherwise a tuple (GameIndex, Turn, Reason) for the first difference, in
+    the form DescribeEngineDifference takes.
+    """
+    Batch = BatchedDastan(NoOfGames, R, C, NoOfPieces, Seed)
+    Games = [Dastan(R, C, NoOfPieces) for Count in range(NoOfGames)]
+    for Turn in range(NoOfTurns):
+        Masks = Batch.GenerateLegalMoveMasks()
+        Actions = Batch.SampleRandomActions(Masks)
+        FinishIndexes = Batch.GetFinishIndexes(Actions)
+        for GameIndex in range(NoOfGames):
+            Game = Games[GameIndex]
+            Expected = []
+            if not Game.IsGameOver():
+                Expected = sorted(Game.GenerateLegalMoves())
+            Decoded = []
+            for Action in np.nonzero(Masks[GameIndex])[0]:
+                ReplaceChoice, Choice, StartIndex, MoveNumber = Batch.DecodeAction(int(Action))
+                Finish = Batch.GetFinishIndexes(np.full(NoOfGames, Action))[GameIndex]
+                Decoded.append((int(ReplaceChoice), int(Choice),
+                                Game.GetSquareReference(StartIndex // C + 1, StartIndex % C + 1),
+                                Game.GetSquareReference(int(Finish // C) + 1, int(Finish % C) + 1)))
+            if Expected != sorted(Decoded):
+                return GameIndex, Turn, "legal moves differ"
+        Batch.ApplyMoves(Actions)
+        for GameIndex in range(NoOfGames):
+            Game = Games[GameIndex]
+            if Game.IsGameOver():
+                continue
+            if Actions[GameIndex] < 0:
+                Game.ApplyMove(PASS_ACTION)
+            else:
+                ReplaceChoice, Choice, StartIndex, MoveNumber = Batch.DecodeAction(int(Actions[GameIndex]))
+                Finish = int(FinishIndexes[GameIndex])
+                Game.ApplyMove((int(ReplaceChoice), int(Choice),
+                                Game.GetSquareReference(StartIndex // C + 1, StartIndex % C + 1),
+                                Game.GetSquareReference(Finish // C + 1, Finish % C + 1)),
+                               int(Batch.GetOfferPositions()[GameIndex]))
+            Scores = [P.GetScore() for P in Game.GetPlayers()]
+            Queues = [[MOVE_OPTION_NAMES.index(M.GetName()) for M in P.GetMoveOptionQueueContents()]
+                      for P in Game.GetPlayers()]
+            if (Scores != list(Batch.GetScores()[GameIndex]) or Queues != Batch.GetQueues()[GameIndex].tolist()
+                    or Game.IsGameOver() != bool(Batch.GetFinished()[GameIndex])):
+                return GameIndex, Turn, "states differ"
+    return None
+
+
+# A game record file starts with a header giving the board size, the number of pieces and the move option names, followed
+# by the games one after another. Each game is a fixed-size record of its seed, number of moves, final scores and result,
+# followed by its moves. A move is the replace choice, the move option and the start and finish squares, with a square
+# stored as its index on the board plus 1, or 0 for a square that is not on the board
+GAME_RECORD_MAGIC = b"DSTN"
+GAME_RECORD_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHHHHH")
+MOVE_OPTION_NAME = struct.Struct("<16s")
+GAME_HEADER = struct.Struct("<qIiiB3x")
+MOVE_RECORD = struct.Struct("<BBHH")
+# The result stored for a game that was stopped before it finished
+UNFINISHED_RESULT = 255
+
+
+class GameRecordWriter:
+    def __init__(self, FileName, R, C, NoOfPieces, FlushBytes=1 << 20):
+        """
+        It opens a game record file to add games to the end of it, writing the file header first if the file is new. The
+        games are kept in a buffer and written out when the buffer is full or the writer is closed
+
+        :param FileName: The name of the file
+        :param R: Number of rows
+        :param C: The number of columns in the board
+        :param NoOfPieces: The number of pieces each player has
+        :param FlushBytes: How many bytes of games to buffer before writing them to the file
+        """
+        if R * C >= 1 << 16:
+            raise ValueError("boards of 65536 squares or more cannot be recorded")
+        self._NoOfRows = R
+        self._NoOfColumns = C
+        self._NoOfPieces = NoOfPieces
+        self._ReferenceBase = 10 ** len(str(C))
+        self._FlushBytes = FlushBytes
+        self._Buffer = bytearray()
+        self._File = open(FileName, "ab")
+        if self._File.tell() == 0:
+            self._File.write(CreateGameRecordFileHeader(R, C, NoOfPieces))
+        else:
+            Reader = GameRecordReader(FileName)
+            try:
+                if (Reader.GetNoOfRows(), Reader.GetNoOfColumns(), Reader.GetNoOfPieces()) != (R, C, NoOfPieces):
+                    raise ValueError(FileName + " holds games of a different size")
+            finally:
+                Reader.Close()
+
+    def __EncodeSquare(self, SquareReference):
+        """
+        :param SquareReference: The square reference
+        :return: The index of the square plus 1, or 0 if it is not on the board.
+        """
+        Row = SquareReference // self._ReferenceBase
+        Column = SquareReference % self._ReferenceBase
+        if 1 <= Row <= self._NoOfRows and 1 <= Column <= self._NoOfColumns:
+            return (Row - 1) * self._NoOfColumns + Column
+        return 0
+
+    def WriteGame(self, Game):
+        """
+        It adds a game to the buffer: its seed, its move log and its final scores and result
+
+        :param Game: The Dastan game, finished or not
+        """
+        if (Game.GetNoOfRows(), Game.GetNoOfColumns(), Game.GetNoOfPieces()) != (
+                self._NoOfRows, self._NoOfColumns, self._NoOfPieces):
+            raise ValueError("the game is a different size from the games in the file")
+        MoveLog = Game.GetMoveLog()
+        Scores = [P.GetScore() for P in Game.GetPlayers()]
+        Result = Game.Result()
+        self._Buffer += GAME_HEADER.pack(Game.GetSeed(), len(MoveLog), Scores[0], Scores[1],
+                                         UNFINISHED_RESULT if Result is None else Result)
+        for ReplaceChoice, Choice, StartSquareReference, FinishSquareReference in MoveLog:
+            self._Buffer += MOVE_RECORD.pack(ReplaceChoice, Choice, self.__EncodeSquare(StartSquareReference),
+                                             self.__EncodeSquare(FinishSquareReference))
+        if len(self._Buffer) >= self._FlushBytes:
+            self.Flush()
+
+    def WriteGameBytes(self, Data):
+        """
+        It adds games that are already in the stored form, such as those from GameRecordReader.GetGameBytes, to the buffer
+
+        :param Data: The bytes of the games
+        """
+        self._Buffer += Data
+        if len(self._Buffer) >= self._FlushBytes:
+            self.Flush()
+
+    def Flush(self):
+        """
+        It writes the buffered games to the file
+        """
+        self._File.write(self._Buffer)
+        self._File.flush()
+        self._Buffer = bytearray()
+
+    def Close(self):
+        """
+        It writes any buffered games and closes the file
+        """
+        self.Flush()
+        self._File.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExceptionType, ExceptionValue, Traceback):
+        self.Close()
+
+
+def CreateGameRecordFileHeader(R, C, NoOfPieces):
+    """
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :return: The bytes of the header of a game record file.
+    """
+    Header = FILE_HEADER.pack(GAME_RECORD_MAGIC, GAME_RECORD_VERSION, R, C, NoOfPieces, len(MOVE_OPTION_NAMES))
+    for Name in MOVE_OPTION_NAMES:
+        Header += MOVE_OPTION_NAME.pack(Name.encode("ascii"))
+    return Header
+
+
+# One game read from a game record file. Its moves are left in the file until they are asked for
+class GameRecord:
+    __slots__ = ("_Seed", "_Scores", "_Result", "_NoOfMoves", "_Map", "_Offset", "_NoOfColumns", "_ReferenceBase")
+
+    def __init__(self, Seed, Scores, Result, NoOfMoves, Map, Offset, C):
+        """
+        :param Seed: The seed of the game's random number generator
+        :param Scores: The final scores, Player One first
+        :param Result: The result as returned by Dastan.Result
+        :param NoOfMoves: The number of moves
+        :param Map: The memory map of the file
+        :param Offset: Where the game's moves start in the file
+        :param C: The number of columns in the board
+        """
+        self._Seed = Seed
+        self._Scores = Scores
+        self._Result = Result
+        self._NoOfMoves = NoOfMoves
+        self._Map = Map
+        self._Offset = Offset
+        self._NoOfColumns = C
+        self._ReferenceBase = 10 ** len(str(C))
+
+    def GetSeed(self):
+        """
+        It returns the seed of the game's random number generator
+        :return: The seed.
+        """
+        return self._Seed
+
+    def GetScores(self):
+        """
+        It returns the final scores
+        :return: A tuple of the scores, Player One first.
+        """
+        return self._Scores
+
+    def GetResult(self):
+        """
+        It returns the result in the form used by Dastan.Result
+        :return: None if the game was stopped before it finished, 0 for a draw, or 1 or 2 for the winner.
+        """
+        return self._Result
+
+    def GetNoOfMoves(self):
+        """
+        It returns how many moves the game has
+        :return: The number of moves.
+        """
+        return self._NoOfMoves
+
+    def GetPlyEnds(self):
+        """
+        It finds where each ply ends in the moves. A human player's offer choice is a move of its own in the record but
+        is part of the ply it comes before
+        :return: A list of the number of moves up to the end of each ply, in order.
+        """
+        return [MoveNumber + 1 for MoveNumber, Choice in enumerate(self.GetMoveBytes()[1::MOVE_RECORD.size]) if Choice]
+
+    def GetMoveBytes(self):
+        """
+        It returns the game's moves as they are stored, for scanning them without decoding each one
+        :return: A bytes object of GetNoOfMoves() records in the MOVE_RECORD format.
+        """
+        return self._Map[self._Offset:self._Offset + self._NoOfMoves * MOVE_RECORD.size]
+
+    def __DecodeSquare(self, Square):
+        """
+        :param Square: The index of the square plus 1, or 0
+        :return: The square reference, or 0 for a square that is not on the board.
+        """
+        if Square == 0:
+            return 0
+        return ((Square - 1) // self._NoOfColumns + 1) * self._ReferenceBase + (Square - 1) % self._NoOfColumns + 1
+
+    def IterMoves(self, Start=0, Stop=None):
+        """
+        It yields the game's moves one at a time in the form used by Dastan.GetMoveLog
+
+        :param Start: The number of the first move to yield, starting from 0
+        :param Stop: The number of the move to stop before, or None to go to the end of the game
+        """
+        if Stop is None or Stop > self._NoOfMoves:
+            Stop = self._NoOfMoves
+        Moves = self._Map[self._Offset + Start * MOVE_RECORD.size:self._Offset + Stop * MOVE_RECORD.size]
+        for ReplaceChoice, Choice, StartSquare, FinishSquare in MOVE_RECORD.iter_unpack(Moves):
+            yield ReplaceChoice, Choice, self.__DecodeSquare(StartSquare), self.__DecodeSquare(FinishSquare)
+
+
+class GameRecordReader:
+    def __init__(self, FileName):
+        """
+        It memory-maps a game record file and reads its header. Games are only read when IterGames gets to them
+
+        :param FileName: The name of the file
+        """
+        self._File = open(FileName, "rb")
+        try:
+            self._Map = mmap.mmap(self._File.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._File.close()
+            raise ValueError(FileName + " is not a game record file")
+        if len(self._Map) < FILE_HEADER.size:
+            self.Close()
+            raise ValueError(FileName + " is not a game record file")
+        Magic, Version, self._NoOfRows, self._NoOfColumns, self._NoOfPieces, NoOfNames = FILE_HEADER.unpack_from(
+            self._Map, 0)
+        if Magic != GAME_RECORD_MAGIC or Version != GAME_RECORD_VERSION:
+            self.Close()
+            raise ValueError(FileName + " is not a game record file of version " + str(GAME_RECORD_VERSION))
+        self._MoveOptionNames = []
+        for Count in range(NoOfNames):
+            Name = MOVE_OPTION_NAME.unpack_from(self._Map, FILE_HEADER.size + Count * MOVE_OPTION_NAME.size)[0]
+            self._MoveOptionNames.append(Name.rstrip(b"\0").decode("ascii"))
+        self._FirstGameOffset = FILE_HEADER.size + NoOfNames * MOVE_OPTION_NAME.size
+        self._GameOffsets = None
+
+    def GetNoOfRows(self):
+        """
+        It returns the number of rows of the boards in the file
+        :return: The number of rows.
+        """
+        return self._NoOfRows
+
+    def GetNoOfColumns(self):
+        """
+        It returns the number of columns of the boards in the file
+        :return: The number of columns.
+        """
+        return self._NoOfColumns
+
+    def GetNoOfPieces(self):
+        """
+        It returns the number of pieces each player started with in the games in the file
+        :return: The number of pieces.
+        """
+        return self._NoOfPieces
+
+    def GetMoveOptionNames(self):
+        """
+        It returns the names of the move options the games were played with
+        :return: A list of names.
+        """
+        return self._MoveOptionNames
+
+    def IterGames(self):
+        """
+        It yields the games in the file one at a time as GameRecord objects, reading only each game's header. A game that
+        was cut short by the file ending is left out
+        """
+        Offset = self._FirstGameOffset
+        End = len(self._Map)
+        while Offset + GAME_HEADER.size <= End:
+            Game = self.__ReadGame(Offset)
+            Offset += GAME_HEADER.size + Game.GetNoOfMoves() * MOVE_RECORD.size
+            if Offset > End:
+                return
+            yield Game
+
+    def __ReadGame(self, Offset):
+        """
+        :param Offset: Where the game's header starts in the file
+        :return: A GameRecord object.
+        """
+        Seed, NoOfMoves, Score1, Score2, Result = GAME_HEADER.unpack_from(self._Map, Offset)
+        return GameRecord(Seed, (Score1, Score2), None if Result == UNFINISHED_RESULT else Result, NoOfMoves, self._Map,
+                          Offset + GAME_HEADER.size, self._NoOfColumns)
+
+    def __IndexGames(self):
+        """
+        The first time a game is asked for by number, it reads every game header once to find where each game starts
+        """
+        self._GameOffsets = array.array("Q")
+        Offset = self._FirstGameOffset
+        End = len(self._Map)
+        while Offset + GAME_HEADER.size <= End:
+            NoOfMoves = GAME_HEADER.unpack_from(self._Map, Offset)[1]
+            if Offset + GAME_HEADER.size + NoOfMoves * MOVE_RECORD.size > End:
+                break
+            self._GameOffsets.append(Offset)
+            Offset += GAME_HEADER.size + NoOfMoves * MOVE_RECORD.size
+
+    def GetNoOfGames(self):
+        """
+        It returns the number of complete games in the file
+        :return: The number of games.
+        """
+        if self._GameOffsets is None:
+            self.__IndexGames()
+        return len(self._GameOffsets)
+
+    def GetGame(self, GameNumber):
+        """
+        It returns a game by its number in the file, starting from 0
+
+        :param GameNumber: The number of the game
+        :return: A GameRecord object.
+        """
+        if self._GameOffsets is None:
+            self.__IndexGames()
+        return self.__ReadGame(self._GameOffsets[GameNumber])
+
+    def GetGameBytes(self):
+        """
+        It returns every game in the file as it is stored, without the file header
+        :return: A bytes object.
+        """
+        return self._Map[self._FirstGameOffset:]
+
+    def CountMoves(self):
+        """
+        It counts the games and moves in the file from the game headers alone
+        :return: A tuple (NoOfGames, NoOfMoves).
+        """
+        NoOfGames = 0
+        NoOfMoves = 0
+        for Game in self.IterGames():
+            NoOfGames += 1
+            NoOfMoves += Game.GetNoOfMoves()
+        return NoOfGames, NoOfMoves
+
+    def Close(self):
+        """
+        It closes the memory map and the file
+        """
+        self._Map.close()
+        self._File.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExceptionType, ExceptionValue, Traceback):
+        self.Close()
+
+
+def AppendGameRecords(FileName, OtherFileName):
+    """
+    It adds the games in one game record file to the end of another with the same header
+
+    :param FileName: The file to add the games to
+    :param OtherFileName: The file to copy the games from
+    """
+    with GameRecordReader(OtherFileName) as Reader:
+        with GameRecordWriter(FileName, Reader.GetNoOfRows(), Reader.GetNoOfColumns(), Reader.GetNoOfPieces()) as Writer:
+            Writer.WriteGameBytes(Reader.GetGameBytes())
+
+
+def ReplayGameRecord(Record, R, C, NoOfPieces, NoOfMoves=None):
+    """
+    It plays a recorded game again from the start without any input or output
+
+    :param Record: The GameRecord object
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param NoOfMoves: The number of moves to play, or None for the whole game
+    :return: The Dastan game after the moves.
+    """
+    Game = Dastan(R, C, NoOfPieces, Record.GetSeed())
+    for Move in Record.IterMoves(0, NoOfMoves):
+        Game.ReplayMove(Move)
+    return Game
+
+
+def ValidateGameRecord(Record, R, C, NoOfPieces):
+    """
+    It plays a recorded game again, checking that each move names a position in the move option queue and comes before
+    the end of the game, and that the final scores and result are those of the record. A move that the move option does
+    not allow is not a difference, as under the rules it just loses the player their turn
+
+    :param Record: The GameRecord object
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :return: None if the game matches, otherwise a tuple (MoveNumber, Reason) for the first difference, where MoveNumber
+    starts from 0 and is the number of moves in the game if it is the end of the game that does not match.
+    """
+    Game = Dastan(R, C, NoOfPieces, Record.GetSeed())
+    for MoveNumber, Move in enumerate(Record.IterMoves()):
+        ReplaceChoice, Choice = Move[0], Move[1]
+        if Game.IsGameOver():
+            return MoveNumber, "there is a move after the game was over"
+        if not (0 <= ReplaceChoice <= 5) or (Choice == 0 and ReplaceChoice == 0) or Choice > 3:
+            return MoveNumber, "there is no such position in the move option queue"
+        Game.ReplayMove(Move)
+    Scores = tuple(P.GetScore() for P in Game.GetPlayers())
+    if Scores != Record.GetScores():
+        return Record.GetNoOfMoves(), "the final scores are " + str(Scores) + ", not " + str(Record.GetScores())
+    if Game.Result() != Record.GetResult():
+        return Record.GetNoOfMoves(), "the result is " + str(Game.Result()) + ", not " + str(Record.GetResult())
+    return None
+
+
+def ValidateGameRecords(FileName):
+    """
+    It plays every game in a game record file again and stops at the first one that does not match its record
+
+    :param FileName: The name of the file
+    :return: None if every game matches, otherwise a tuple (GameNumber, MoveNumber, Reason).
+    """
+    with GameRecordReader(FileName) as Reader:
+        for GameNumber, Record in enumerate(Reader.IterGames()):
+            Difference = ValidateGameRecord(Record, Reader.GetNoOfRows(), Reader.GetNoOfColumns(),
+                                            Reader.GetNoOfPieces())
+            if Difference is not None:
+                return (GameNumber,) + Difference
+    return None
+
+
+# The 624 words and the position of the Mersenne Twister behind random.Random, which GameReplayer packs to keep the state
+# of a game's random number generator small
+RANDOM_STATE_WORDS = struct.Struct("<625I")
+
+
+# It rebuilds positions from the games in a game record file, such as game 1234567 after ply 40. While a game is
+# replayed a snapshot is kept every SnapshotInterval plies, so a later position is rebuilt from the nearest snapshot
+# before it rather than from the start. The snapshots of recently used games and recently rebuilt positions are kept in
+# least recently used caches. A snapshot or position is kept as the packed position from ToBytes and the packed state of
+# the random number generator, about 2.5 KB rather than the 14 KB of a pickled game, and every call rebuilds its own copy
+# of the game from it with FromBytes, taking the move log from the record
+class GameReplayer:
+    def __init__(self, Reader, SnapshotInterval=32, CacheSize=256):
+        """
+        :param Reader: The GameRecordReader for the file
+        :param SnapshotInterval: How many plies apart the snapshots are
+        :param CacheSize: How many games' snapshots, and how many rebuilt positions, to keep
+        """
+        self._Reader = Reader
+        self._SnapshotInterval = SnapshotInterval
+        self._CacheSize = CacheSize
+        self._Snapshots = collections.OrderedDict()
+        self._Positions = collections.OrderedDict()
+        self._Stats = {"position_hits": 0, "snapshot_hits": 0, "moves_replayed": 0}
+
+    def __Remember(self, Cache, Key, Value):
+        """
+        It puts a value in a cache as the most recently used, dropping the least recently used value if the cache is full
+
+        :param Cache: The OrderedDict used as the cache
+        :param Key: The key
+        :param Value: The value
+        """
+        Cache[Key] = Value
+        Cache.move_to_end(Key)
+        if len(Cache) > self._CacheSize:
+            Cache.popitem(last=False)
+
+    @staticmethod
+    def __Snapshot(Game):
+        """
+        :param Game: The Dastan game
+        :return: A tuple (Packed, RandomState), where Packed is the position from ToBytes and RandomState is the state of
+        the random number generator with its words packed by RANDOM_STATE_WORDS.
+        """
+        Version, Words, GaussNext = Game.GetRandom().getstate()
+        return Game.ToBytes(), (Version, RANDOM_STATE_WORDS.pack(*Words), GaussNext)
+
+    def __Rebuild(self, Record, Snapshot, NoOfMoves):
+        """
+        It makes a game from a snapshot, with the move log of the record up to the snapshot
+
+        :param Record: The GameRecord of the game
+        :param Snapshot: A tuple made by __Snapshot
+        :param NoOfMoves: The number of moves played at the snapshot
+        :return: The Dastan game.
+        """
+        Packed, (Version, Words, GaussNext) = Snapshot
+        Game = Dastan.FromBytes(Packed, Record.GetSeed())
+        Game.GetRandom().setstate((Version, RANDOM_STATE_WORDS.unpack(Words), GaussNext))
+        Game.GetMoveLog().extend(Record.IterMoves(0, NoOfMoves))
+        return Game
+
+    def GetPosition(self, GameNumber, NoOfPlies=None):
+        """
+        It returns a game as it was after a number of its plies
+
+        :param GameNumber: The number of the game in the file, starting from 0
+        :param NoOfPlies: The number of plies played, or None for the end of the game
+        :return: A Dastan object of the position, which the caller is free to change.
+        """
+        Record = self._Reader.GetGame(GameNumber)
+        Snapshots = self._Snapshots.get(GameNumber)
+        if Snapshots is None:
+            Game = Dastan(self._Reader.GetNoOfRows(), self._Reader.GetNoOfColumns(), self._Reader.GetNoOfPieces(),
+                          Record.GetSeed())
+            Snapshots = (Record.GetPlyEnds(), [self.__Snapshot(Game)])
+        else:
+            self._Stats["snapshot_hits"] += 1
+        self.__Remember(self._Snapshots, GameNumber, Snapshots)
+        PlyEnds, Snapshots = Snapshots
+        if NoOfPlies is None:
+            NoOfPlies, NoOfMoves = len(PlyEnds), Record.GetNoOfMoves()
+        elif not 0 <= NoOfPlies <= len(PlyEnds):
+            raise IndexError("game " + str(GameNumber) + " has " + str(len(PlyEnds)) + " plies")
+        else:
+            NoOfMoves = PlyEnds[NoOfPlies - 1] if NoOfPlies else 0
+        Key = (GameNumber, NoOfMoves)
+        if Key in self._Positions:
+            self._Positions.move_to_end(Key)
+            self._Stats["position_hits"] += 1
+            return self.__Rebuild(Record, self._Positions[Key], NoOfMoves)
+        SnapshotNumber = min(NoOfPlies // self._SnapshotInterval, len(Snapshots) - 1)
+        Ply = SnapshotNumber * self._SnapshotInterval
+        FirstMoveNumber = PlyEnds[Ply - 1] if Ply else 0
+        Game = self.__Rebuild(Record, Snapshots[SnapshotNumber], FirstMoveNumber)
+        for Move in Record.IterMoves(FirstMoveNumber, NoOfMoves):
+            Game.ReplayMove(Move)
+            if Move[1] != 0:
+                Ply += 1
+                if Ply == len(Snapshots) * self._SnapshotInterval:
+                    Snapshots.append(self.__Snapshot(Game))
+        self._Stats["moves_replayed"] += NoOfMoves - FirstMoveNumber
+        self.__Remember(self._Positions, Key, self.__Snapshot(Game))
+        return Game
+
+    def GetStats(self):
+        """
+        It returns how often the caches were used and how many moves have been replayed
+        :return: A dictionary of counts.
+        """
+        return dict(self._Stats)
+
+
+ENDGAME_TABLEBASE_MAGIC = b"DSTB"
+ENDGAME_TABLEBASE_VERSION = 1
+# The magic, the version, the number of rows and columns, the most pieces each player can have besides their mirza, and
+# each player's option set as five indexes into MOVE_OPTION_NAMES, smallest first
+ENDGAME_TABLEBASE_HEADER = struct.Struct("<4sHBBBB5s5s")
+# Each position is one byte: 0 if neither player can force the end of the game, an odd number of turns if the player
+# whose turn it is can force it to end with their own move in that many turns, an even number if the other player can,
+# and 255 for an entry that is not a position. Longer distances are stored as the longest of the right kind
+ENDGAME_DRAW = 0
+ENDGAME_NOT_A_POSITION = 255
+ENDGAME_LONGEST_WIN = 253
+ENDGAME_LONGEST_LOSS = 254
+# The tablebase leaves the scores out, so its result is only the real one if the player who ends the game is far enough
+# ahead. No turn moves the difference in scores by more than this against the player who is going to end it: the dearest
+# move option costs them 7 on their own turn, and on the other player's turn a capture is worth at most 5 and the
+# kotlas at most 6
+ENDGAME_MOST_POINTS_PER_TURN = 11
+
+
+# Where each position of an endgame is kept in a tablebase. An endgame has both mirzas and up to a few pieces for each
+# player, and each player's queue holds their option set in some order. The offer is never taken and the scores are left
+# out, so a player wins by being the one who ends the game, capturing the other mirza or taking their own mirza into the
+# other player's kotla. The positions with A pieces for Player One and B for Player Two make one section, with the
+# sections in order of A and then B. In a section, the index is worked out from the player whose turn it is, the rank of
+# each queue among the orders of its option set, and the squares of the mirzas and pieces as the digits of a number in
+# base NoOfSquares, each player's pieces in order of square. Squares are numbered as the indexes of the Dastan board
+class EndgameIndex:
+    def __init__(self, R, C, MaxPieces, OptionSets):
+        """
+        :param R: Number of rows
+        :param C: The number of columns in the board
+        :param MaxPieces: The most pieces, not counting the mirza, that Player One and Player Two can have
+        :param OptionSets: The names of the five move options in Player One's queue and in Player Two's
+        """
+        self._NoOfRows = R
+        self._NoOfColumns = C
+        self._NoOfSquares = R * C
+        self._MaxPieces = tuple(MaxPieces)
+        self._OptionSets = tuple(tuple(sorted(MOVE_OPTION_NAMES.index(Name) for Name in Names)) for Names in OptionSets)
+        if any(len(OptionSet) != 5 for OptionSet in self._OptionSets):
+            raise ValueError("an option set must have five move options")
+        # Player One's kotla is in the top row and Player Two's in the bottom row, as Dastan makes them
+        self._KotlaIndexes = (C // 2 - 1, (R - 1) * C + C // 2)
+        self._Arrangements = []
+        self._Ranks = []
+        self._NextRanks = []
+        self._PreviousRanks = []
+        self._Destinations = []
+        self._Origins = []
+        for PlayerIndex, Direction in ((0, 1), (1, -1)):
+            Arrangements = sorted(set(itertools.permutations(self._OptionSets[PlayerIndex])))
+            Ranks = {Arrangement: Rank for Rank, Arrangement in enumerate(Arrangements)}
+            # after the option in position Choice is used it goes to the back of the queue, so before a move the option
+            # now at the back was in one of the first three positions
+            self._NextRanks.append([[Ranks[Arrangement[:Choice] + Arrangement[Choice + 1:] + (Arrangement[Choice],)]
+                                     for Choice in range(3)] for Arrangement in Arrangements])
+            self._PreviousRanks.append([[Ranks[Arrangement[:Choice] + (Arrangement[4],) + Arrangement[Choice:4]]
+                                         for Choice in range(3)] for Arrangement in Arrangements])
+            self._Arrangements.append(Arrangements)
+            self._Ranks.append(Ranks)
+            Destinations = {}
+            Origins = {}
+            for OptionNumber in set(self._OptionSets[PlayerIndex]):
+                Option = MOVE_OPTION_CATALOG[(MOVE_OPTION_NAMES[OptionNumber], Direction)]
+                Destinations[OptionNumber] = Option.GetDestinationTable(R, C)
+                Origins[OptionNumber] = [[] for Index in range(self._NoOfSquares)]
+                for StartIndex in range(self._NoOfSquares):
+                    for FinishIndex in Destinations[OptionNumber][StartIndex]:
+                        Origins[OptionNumber][FinishIndex].append(StartIndex)
+            self._Destinations.append(Destinations)
+            self._Origins.append(Origins)
+        self._SectionOffsets = {}
+        self._Size = 0
+        for A in range(self._MaxPieces[0] + 1):
+            for B in range(self._MaxPieces[1] + 1):
+                self._SectionOffsets[(A, B)] = self._Size
+                self._Size += self.GetSectionSize(A, B)
+
+    def GetSize(self):
+        """
+        It returns the number of entries in the tablebase
+        :return: The size in bytes.
+        """
+        return self._Size
+
+    def GetNoOfSquares(self):
+        """
+        :return: The number of squares on the board.
+        """
+        return self._NoOfSquares
+
+    def GetMaxPieces(self):
+        """
+        :return: The most pieces, not counting the mirza, that Player One and Player Two can have.
+        """
+        return self._MaxPieces
+
+    def GetOptionSet(self, PlayerIndex):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :return: The indexes into MOVE_OPTION_NAMES of the options in the player's queue, smallest first.
+        """
+        return self._OptionSets[PlayerIndex]
+
+    def GetKotlaIndex(self, PlayerIndex):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :return: The square of the player's kotla.
+        """
+        return self._KotlaIndexes[PlayerIndex]
+
+    def GetNoOfQueues(self, PlayerIndex):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :return: The number of different orders of the player's option set.
+        """
+        return len(self._Arrangements[PlayerIndex])
+
+    def GetQueue(self, PlayerIndex, Rank):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Rank: The rank of the queue
+        :return: The indexes into MOVE_OPTION_NAMES of the options in the queue, front first.
+        """
+        return self._Arrangements[PlayerIndex][Rank]
+
+    def GetNextRank(self, PlayerIndex, Rank, Choice):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Rank: The rank of the queue
+        :param Choice: The position in the queue of the option used, from 0
+        :return: The rank of the queue after the option is used.
+        """
+        return self._NextRanks[PlayerIndex][Rank][Choice]
+
+    def GetPreviousRank(self, PlayerIndex, Rank, Choice):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Rank: The rank of the queue
+        :param Choice: The position in the queue, from 0, that the option now at the back was used from
+        :return: The rank of the queue before the option was used.
+        """
+        return self._PreviousRanks[PlayerIndex][Rank][Choice]
+
+    def GetDestinationTable(self, PlayerIndex, OptionNumber):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param OptionNumber: The index into MOVE_OPTION_NAMES of a move option in the player's option set
+        :return: For each square, the squares the player's move option can reach from it.
+        """
+        return self._Destinations[PlayerIndex][OptionNumber]
+
+    def GetOriginTable(self, PlayerIndex, OptionNumber):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param OptionNumber: The index into MOVE_OPTION_NAMES of a move option in the player's option set
+        :return: For each square, the squares from which the player's move option can reach it.
+        """
+        return self._Origins[PlayerIndex][OptionNumber]
+
+    def GetSectionSize(self, A, B):
+        """
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        :return: The number of entries in the section.
+        """
+        return 2 * len(self._Arrangements[0]) * len(self._Arrangements[1]) * self._NoOfSquares ** (2 + A + B)
+
+    def GetSectionOffset(self, A, B):
+        """
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        :return: The index of the first entry of the section.
+        """
+        return self._SectionOffsets[(A, B)]
+
+    def GetQueueRank(self, PlayerIndex, OptionNumbers):
+        """
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param OptionNumbers: The indexes into MOVE_OPTION_NAMES of the options in the queue, front first
+        :return: The rank of the queue, or None if it is not an order of the player's option set.
+        """
+        return self._Ranks[PlayerIndex].get(tuple(OptionNumbers))
+
+    def GetPlacement(self, Squares):
+        """
+        :param Squares: The squares of the mirzas, then Player One's pieces in order, then Player Two's in order
+        :return: The number the squares make as digits.
+        """
+        Placement = 0
+        for Index in reversed(Squares):
+            Placement = Placement * self._NoOfSquares + Index
+        return Placement
+
+    def GetIndex(self, Side, Ranks, Squares, A, B):
+        """
+        It works out where a position is kept
+
+        :param Side: 0 if it is Player One's turn, 1 if it is Player Two's
+        :param Ranks: The ranks of Player One's and Player Two's queues
+        :param Squares: The squares of the mirzas, then Player One's pieces in order, then Player Two's in order
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        :return: The index of the position's entry.
+        """
+        return self._SectionOffsets[(A, B)] + ((Side * len(self._Arrangements[0]) + Ranks[0]) * len(
+            self._Arrangements[1]) + Ranks[1]) * self._NoOfSquares ** (2 + A + B) + self.GetPlacement(Squares)
+
+    def GetPlacements(self, A, B):
+        """
+        It lists every way of putting the mirzas and pieces on different squares, with each player's pieces in order
+        of square
+
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        :return: A list of tuples of squares.
+        """
+        Placements = []
+        AllSquares = range(self._NoOfSquares)
+        for Mirzas in itertools.permutations(AllSquares, 2):
+            for PiecesOne in itertools.combinations([Index for Index in AllSquares if Index not in Mirzas], A):
+                Taken = set(Mirzas + PiecesOne)
+                for PiecesTwo in itertools.combinations([Index for Index in AllSquares if Index not in Taken], B):
+                    Placements.append(Mirzas + PiecesOne + PiecesTwo)
+        return Placements
+
+    def IsGameOver(self, Squares):
+        """
+        :param Squares: The squares of the mirzas first
+        :return: True if a mirza is in the other player's kotla.
+        """
+        return Squares[0] == self._KotlaIndexes[1] or Squares[1] == self._KotlaIndexes[0]
+
+
+# It solves the endgames of an EndgameIndex by retrograde analysis. The sections are solved in order, so a capture always
+# leads to a section that has already been solved. In each section every position is first looked at once to find the
+# ones where the player whose turn it is can end the game straight away and to count each position's other moves. Then,
+# starting from the positions that are decided soonest, each decided position is followed back to the positions it can
+# be reached from by taking back a move: a position that can move to a lost one is won, and a position whose moves all
+# lead to won ones is lost
+class EndgameSolver:
+    def __init__(self, Index):
+        """
+        :param Index: The EndgameIndex of the tablebase
+        """
+        self._Index = Index
+        self._Values = bytearray([ENDGAME_NOT_A_POSITION]) * Index.GetSize()
+
+    def GetValues(self):
+        """
+        It returns the entries worked out so far
+        :return: A bytearray with one entry per index.
+        """
+        return self._Values
+
+    def Solve(self, A, B):
+        """
+        It solves the section of positions with A pieces for Player One and B for Player Two. The sections with fewer
+        pieces must have been solved first
+
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        """
+        Index = self._Index
+        Span = Index.GetNoOfSquares() ** (2 + A + B)
+        QueueCounts = (Index.GetNoOfQueues(0), Index.GetNoOfQueues(1))
+        Offset = Index.GetSectionOffset(A, B)
+        Size = Index.GetSectionSize(A, B)
+        Values = self._Values
+        Counts = bytearray(Size)
+        LongestCapture = bytearray(Size)
+        PassOnly = bytearray(Size)
+        Decided = bytearray(Size)
+        Buckets = [[] for Distance in range(ENDGAME_LONGEST_LOSS + 1)]
+        Placements = {}
+        for Squares in Index.GetPlacements(A, B):
+            if Index.IsGameOver(Squares):
+                continue
+            Placement = Index.GetPlacement(Squares)
+            Placements[Placement] = Squares
+            for Side in range(2):
+                for Rank in range(QueueCounts[Side]):
+                    Wins, QuietMoves, Captures = self.__GetMoves(Squares, Side, Rank, A, B)
+                    for OtherRank in range(QueueCounts[1 - Side]):
+                        Ranks = (Rank, OtherRank) if Side == 0 else (OtherRank, Rank)
+                        Position = ((Side * QueueCounts[0] + Ranks[0]) * QueueCounts[1] + Ranks[1]) * Span + Placement
+                        self.__StartPosition(Position, Offset, Side, Ranks, Wins, QuietMoves, Captures, Counts,
+                                             LongestCapture, PassOnly, Buckets)
+        Distance = 1
+        while Distance <= ENDGAME_LONGEST_LOSS:
+            Bucket = Buckets[Distance]
+            Buckets[Distance] = []
+            for Position in Bucket:
+                if Decided[Position] or Values[Offset + Position] != Distance:
+                    continue
+                Decided[Position] = 1
+                for Previous in self.__GetPreviousPositions(Position, Span, QueueCounts, Placements, A, B, PassOnly):
+                    if Decided[Previous]:
+                        continue
+                    Value = Values[Offset + Previous]
+                    if Distance % 2 == 0:
+                        Won = min(Distance + 1, ENDGAME_LONGEST_WIN)
+                        if Value == ENDGAME_DRAW or (Value % 2 == 1 and Value > Won):
+                            Values[Offset + Previous] = Won
+                            Buckets[Won].append(Previous)
+                    elif Value == ENDGAME_DRAW:
+                        # a position that is already won does not need its moves counted
+                        Counts[Previous] -= 1
+                        if Counts[Previous] == 0:
+                            Lost = min(max(Distance, LongestCapture[Previous]) + 1, ENDGAME_LONGEST_LOSS)
+                            Values[Offset + Previous] = Lost
+                            Buckets[Lost].append(Previous)
+            if Distance == ENDGAME_LONGEST_LOSS and Buckets[ENDGAME_LONGEST_WIN]:
+                # the longest loss decides more positions as the longest win, which must be followed back in turn, so the
+                # two capped distances are gone through again until neither decides anything new
+                Distance = ENDGAME_LONGEST_WIN
             else:
-                return 0
+                Distance += 1
+
+    def __GetMoves(self, Squares, Side, Rank, A, B):
+        """
+        It lists the moves of the player whose turn it is
+
+        :param Squares: The squares of the mirzas and pieces
+        :param Side: 0 if it is Player One's turn, 1 if it is Player Two's
+        :param Rank: The rank of the queue of the player whose turn it is
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        :return: A tuple (Wins, QuietMoves, Captures). Wins is True if a move ends the game, QuietMoves is a list of
+        (Choice, Placement) for the moves that capture nothing and Captures is a list of (Choice, A, B, Placement).
+        """
+        Index = self._Index
+        Queue = Index.GetQueue(Side, Rank)
+        if Side == 0:
+            OwnPositions = [0] + list(range(2, 2 + A))
+            OtherPieces = Squares[2 + A:]
         else:
-            if CurrentPlayer.SameAs(self._PieceInSquare.GetBelongsTo()) and (
-                    self._PieceInSquare.GetTypeOfPiece() == "piece" or self._PieceInSquare.GetTypeOfPiece() == "mirza"):
-                return 1
+            OwnPositions = [1] + list(range(2 + A, 2 + A + B))
+            OtherPieces = Squares[2:2 + A]
+        Own = set(Squares[Position] for Position in OwnPositions)
+        OtherMirza = Squares[1 - Side]
+        OtherKotla = Index.GetKotlaIndex(1 - Side)
+        QuietMoves = []
+        Captures = []
+        for Choice in range(3):
+            Destinations = Index.GetDestinationTable(Side, Queue[Choice])
+            for Position in OwnPositions:
+                StartIndex = Squares[Position]
+                for FinishIndex in Destinations[StartIndex]:
+                    if FinishIndex in Own:
+                        continue
+                    if FinishIndex == OtherMirza or (Position == Side and FinishIndex == OtherKotla):
+                        return True, None, None
+                    After = list(Squares)
+                    After[Position] = FinishIndex
+                    if FinishIndex in OtherPieces:
+                        del After[Squares.index(FinishIndex)]
+                        NewA, NewB = (A, B - 1) if Side == 0 else (A - 1, B)
+                        Captures.append((Choice, NewA, NewB, self.__Sort(After, NewA, NewB)))
+                    else:
+                        QuietMoves.append((Choice, self.__Sort(After, A, B)))
+        return False, QuietMoves, Captures
+
+    def __Sort(self, Squares, A, B):
+        """
+        :param Squares: The squares of the mirzas and pieces, with each player's pieces in any order
+        :param A: The number of Player One's pieces
+        :param B: The number of Player Two's pieces
+        :return: The placement number, with each player's pieces put in order of square.
+        """
+        return self._Index.GetPlacement(Squares[:2] + sorted(Squares[2:2 + A]) + sorted(Squares[2 + A:2 + A + B]))
+
+    def __StartPosition(self, Position, Offset, Side, Ranks, Wins, QuietMoves, Captures, Counts, LongestCapture,
+                        PassOnly, Buckets):
+        """
+        It sets up a position before the moves are followed back: won in 1 if it can end the game, won or lost if its
+        captures decide it, otherwise undecided with a count of the moves still to be decided. A won position's moves
+        are not counted, as they do not matter
+        """
+        Index = self._Index
+        Values = self._Values
+        if Wins:
+            Values[Offset + Position] = 1
+            Buckets[1].append(Position)
+            return
+        Values[Offset + Position] = ENDGAME_DRAW
+        NextSide = 1 - Side
+        QueueCounts = (Index.GetNoOfQueues(0), Index.GetNoOfQueues(1))
+        Won = None
+        Count = len(QuietMoves)
+        for Choice, NewA, NewB, Placement in Captures:
+            NextRanks = list(Ranks)
+            NextRanks[Side] = Index.GetNextRank(Side, Ranks[Side], Choice)
+            Value = Values[Index.GetSectionOffset(NewA, NewB) + ((NextSide * QueueCounts[0] + NextRanks[0]) * QueueCounts[
+                1] + NextRanks[1]) * Index.GetNoOfSquares() ** (2 + NewA + NewB) + Placement]
+            if Value == ENDGAME_DRAW:
+                # a way out of the position that is never decided, so it can never be lost
+                Count += 1
+            elif Value % 2 == 0:
+                if Won is None or Value + 1 < Won:
+                    Won = min(Value + 1, ENDGAME_LONGEST_WIN)
             else:
-                return 0
+                LongestCapture[Position] = max(LongestCapture[Position], Value)
+        if not QuietMoves and not Captures:
+            # a player with no moves loses the turn
+            PassOnly[Position] = 1
+            Count = 1
+        Counts[Position] = Count
+        if Won is not None:
+            Values[Offset + Position] = Won
+            Buckets[Won].append(Position)
+        elif Count == 0:
+            Lost = min(LongestCapture[Position] + 1, ENDGAME_LONGEST_LOSS)
+            Values[Offset + Position] = Lost
+            Buckets[Lost].append(Position)
+
+    def __GetPreviousPositions(self, Position, Span, QueueCounts, Placements, A, B, PassOnly):
+        """
+        It lists the positions in the same section that can move to Position without capturing anything, one for each
+        such move, so a position is listed more than once if it has more than one move to Position. A player with no
+        moves who loses the turn counts as moving to the same squares with the other player's turn
+
+        :return: A list of positions in the section.
+        """
+        Index = self._Index
+        Placement = Position % Span
+        Rest = Position // Span
+        Ranks = [(Rest // QueueCounts[1]) % QueueCounts[0], Rest % QueueCounts[1]]
+        Side = Rest // (QueueCounts[0] * QueueCounts[1])
+        Mover = 1 - Side
+        Squares = Placements[Placement]
+        Previous = []
+        PassPosition = ((Mover * QueueCounts[0] + Ranks[0]) * QueueCounts[1] + Ranks[1]) * Span + Placement
+        if PassOnly[PassPosition]:
+            Previous.append(PassPosition)
+        if Mover == 0:
+            MoverPositions = [0] + list(range(2, 2 + A))
+        else:
+            MoverPositions = [1] + list(range(2 + A, 2 + A + B))
+        Taken = set(Squares)
+        Origins = Index.GetOriginTable(Mover, Index.GetQueue(Mover, Ranks[Mover])[4])
+        for Choice in range(3):
+            PreviousRanks = list(Ranks)
+            PreviousRanks[Mover] = Index.GetPreviousRank(Mover, Ranks[Mover], Choice)
+            Start = ((Mover * QueueCounts[0] + PreviousRanks[0]) * QueueCounts[1] + PreviousRanks[1]) * Span
+            for MoverPosition in MoverPositions:
+                for StartIndex in Origins[Squares[MoverPosition]]:
+                    if StartIndex in Taken:
+                        continue
+                    Before = list(Squares)
+                    Before[MoverPosition] = StartIndex
+                    PreviousPosition = Start + self.__Sort(Before, A, B)
+                    # a position where a mirza is already in the other kotla is not one
+                    if self._Values[Index.GetSectionOffset(A, B) + PreviousPosition] != ENDGAME_NOT_A_POSITION:
+                        Previous.append(PreviousPosition)
+        return Previous
+
+
+def GenerateEndgameTablebase(FileName, R, C, MaxPieces=(1, 1), OptionSets=None):
+    """
+    It solves every endgame with the given board and option sets and writes the tablebase to a file
+
+    :param FileName: The name of the file
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param MaxPieces: The most pieces, not counting the mirza, that Player One and Player Two can have
+    :param OptionSets: The names of the five move options in each player's queue, or None for the five every game starts
+    with
+    :return: A dictionary of the number of won, lost and drawn positions and the time taken.
+    """
+    StartTime = time.perf_counter()
+    if OptionSets is None:
+        OptionSets = (MOVE_OPTION_NAMES, MOVE_OPTION_NAMES)
+    Index = EndgameIndex(R, C, MaxPieces, OptionSets)
+    Solver = EndgameSolver(Index)
+    for A in range(MaxPieces[0] + 1):
+        for B in range(MaxPieces[1] + 1):
+            Solver.Solve(A, B)
+    Values = Solver.GetValues()
+    with open(FileName, "wb") as File:
+        File.write(ENDGAME_TABLEBASE_HEADER.pack(ENDGAME_TABLEBASE_MAGIC, ENDGAME_TABLEBASE_VERSION, R, C, MaxPieces[0],
+                                                 MaxPieces[1], bytes(Index.GetOptionSet(0)), bytes(Index.GetOptionSet(1))))
+        File.write(Values)
+    return {"positions": len(Values) - Values.count(ENDGAME_NOT_A_POSITION),
+            "wins": sum(Values.count(Value) for Value in range(1, ENDGAME_LONGEST_WIN + 1, 2)),
+            "losses": sum(Values.count(Value) for Value in range(2, ENDGAME_LONGEST_LOSS + 1, 2)),
+            "draws": Values.count(ENDGAME_DRAW), "seconds": time.perf_counter() - StartTime}
+
+
+# An endgame tablebase file, memory-mapped so that a position is looked up by reading one byte at the index given by
+# its EndgameIndex, and so that every process using the same file shares one copy of it
+class EndgameTablebase:
+    def __init__(self, FileName):
+        """
+        :param FileName: The name of a file written by GenerateEndgameTablebase
+        """
+        self._FileName = FileName
+        self._File = open(FileName, "rb")
+        try:
+            self._Map = mmap.mmap(self._File.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._File.close()
+            raise ValueError(FileName + " is not an endgame tablebase")
+        if len(self._Map) < ENDGAME_TABLEBASE_HEADER.size:
+            self.Close()
+            raise ValueError(FileName + " is not an endgame tablebase")
+        (Magic, Version, R, C, MaxPiecesOne, MaxPiecesTwo, OptionSetOne,
+         OptionSetTwo) = ENDGAME_TABLEBASE_HEADER.unpack_from(self._Map)
+        if Magic != ENDGAME_TABLEBASE_MAGIC or Version != ENDGAME_TABLEBASE_VERSION:
+            self.Close()
+            raise ValueError(FileName + " is not an endgame tablebase of version " + str(ENDGAME_TABLEBASE_VERSION))
+        self._NoOfRows = R
+        self._NoOfColumns = C
+        self._Index = EndgameIndex(R, C, (MaxPiecesOne, MaxPiecesTwo),
+                                   ([MOVE_OPTION_NAMES[Number] for Number in OptionSetOne],
+                                    [MOVE_OPTION_NAMES[Number] for Number in OptionSetTwo]))
+        if len(self._Map) != ENDGAME_TABLEBASE_HEADER.size + self._Index.GetSize():
+            self.Close()
+            raise ValueError(FileName + " is the wrong size for its endgames")
+
+    def GetIndex(self):
+        """
+        It returns the layout of the tablebase
+        :return: The EndgameIndex.
+        """
+        return self._Index
+
+    def GetFileName(self):
+        """
+        It returns the name of the file, so that a worker process can map the same one
+        :return: The file name.
+        """
+        return self._FileName
+
+    def __GetEntry(self, Game):
+        """
+        It looks up the current position of a game
+
+        :param Game: The Dastan game
+        :return: The position's entry, or None if the position is not in the tablebase.
+        """
+        if Game.GetNoOfRows() != self._NoOfRows or Game.GetNoOfColumns() != self._NoOfColumns or Game.IsGameOver():
+            return None
+        # most positions searched have too many pieces, and counting them is much quicker than looking at every square
+        Counts = Game.GetPieceCounts()
+        MaxPieces = self._Index.GetMaxPieces()
+        if Counts[0] - 1 > MaxPieces[0] or Counts[1] - 1 > MaxPieces[1]:
+            return None
+        Players = Game.GetPlayers()
+        Mirzas = [None, None]
+        Pieces = [[], []]
+        for Index in range(self._NoOfRows * self._NoOfColumns):
+            PieceInSquare = Game.GetSquare(Game.GetSquareReference(Index // self._NoOfColumns + 1,
+                                                                   Index % self._NoOfColumns + 1)).GetPieceInSquare()
+            if PieceInSquare is not None:
+                PlayerIndex = 0 if Players[0].SameAs(PieceInSquare.GetBelongsTo()) else 1
+                if PieceInSquare.GetTypeOfPiece() == "mirza":
+                    Mirzas[PlayerIndex] = Index
+                else:
+                    Pieces[PlayerIndex].append(Index)
+        A = len(Pieces[0])
+        B = len(Pieces[1])
+        if A > self._Index.GetMaxPieces()[0] or B > self._Index.GetMaxPieces()[1]:
+            return None
+        Ranks = []
+        for PlayerIndex in range(2):
+            Rank = self._Index.GetQueueRank(PlayerIndex, [MOVE_OPTION_NAMES.index(AMoveOption.GetName()) for AMoveOption
+                                                          in Players[PlayerIndex].GetMoveOptionQueueContents()])
+            if Rank is None:
+                return None
+            Ranks.append(Rank)
+        Side = 0 if Game.GetCurrentPlayer().SameAs(Players[0]) else 1
+        Entry = self._Map[ENDGAME_TABLEBASE_HEADER.size + self._Index.GetIndex(Side, Ranks, Mirzas + Pieces[0] + Pieces[1],
+                                                                                A, B)]
+        if Entry == ENDGAME_NOT_A_POSITION:
+            return None
+        return Entry
+
+    def Probe(self, Game):
+        """
+        It looks up the current position of a game. The tablebase ignores the scores and the offer, so "win" means the
+        player whose turn it is can make sure that they are the one who ends the game
+
+        :param Game: The Dastan game
+        :return: None if the position is not in the tablebase, otherwise a tuple (Result, Turns), where Result is "win",
+        "loss" or "draw" for the player whose turn it is and Turns is the number of turns until the game ends, or 0 for a
+        draw.
+        """
+        Entry = self.__GetEntry(Game)
+        if Entry is None:
+            return None
+        if Entry == ENDGAME_DRAW:
+            return "draw", 0
+        elif Entry % 2 == 1:
+            return "win", Entry
+        return "loss", Entry
+
+    def ProbeResult(self, Game):
+        """
+        It looks up the current position of a game, as Probe does, but only answers if the result is the real one once
+        the scores are counted: the player who can make sure they end the game must be ahead by more than
+        ENDGAME_MOST_POINTS_PER_TURN for every turn until it ends. Like the tablebase, it assumes the offer is not taken
+
+        :param Game: The Dastan game
+        :return: None if the position is not in the tablebase or its result depends on the scores, otherwise a tuple
+        (Result, Turns), where Result is "win" or "loss" for the player whose turn it is and Turns is the number of
+        turns until the game ends.
+        """
+        Entry = self.__GetEntry(Game)
+        if Entry is None or Entry == ENDGAME_DRAW or Entry >= ENDGAME_LONGEST_WIN:
+            return None
+        Me = Game.GetCurrentPlayer()
+        Players = Game.GetPlayers()
+        Opponent = Players[1] if Me.SameAs(Players[0]) else Players[0]
+        Margin = Me.GetScore() - Opponent.GetScore()
+        if Entry % 2 == 1 and Margin > ENDGAME_MOST_POINTS_PER_TURN * Entry:
+            return "win", Entry
+        elif Entry % 2 == 0 and -Margin > ENDGAME_MOST_POINTS_PER_TURN * Entry:
+            return "loss", Entry
+        return None
+
+    def ChooseMove(self, Game):
+        """
+        It chooses a move from the tablebase without searching: the quickest move that wins once the scores are counted,
+        either by ending the game while ahead or by reaching a position that ProbeResult says is lost for the other
+        player. The offer is never taken
+
+        :param Game: The Dastan game, which is put back as it was before this returns
+        :return: The chosen action, or None if no move is sure to win.
+        """
+        if self.__GetEntry(Game) is None:
+            return None
+        Players = Game.GetPlayers()
+        MoverIndex = 0 if Game.GetCurrentPlayer().SameAs(Players[0]) else 1
+        BestAction = None
+        BestTurns = None
+        for Action in Game.GenerateLegalMoves():
+            if Action[0] != 0:
+                continue
+            Game.MakeMove(Action)
+            Turns = None
+            if Game.IsGameOver():
+                if Game.Result() == MoverIndex + 1:
+                    Turns = 0
+            else:
+                Known = self.ProbeResult(Game)
+                if Known is not None and Known[0] == "loss":
+                    Turns = Known[1]
+            Game.UnmakeMove()
+            if Turns is not None and (BestTurns is None or Turns < BestTurns):
+                BestAction = Action
+                BestTurns = Turns
+        return BestAction
+
+    def Close(self):
+        """
+        It unmaps and closes the file
+        """
+        if self._Map is not None:
+            self._Map.close()
+            self._Map = None
+        if self._File is not None:
+            self._File.close()
+            self._File = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExceptionType, ExceptionValue, Traceback):
+        self.Close()
+
+
+ENDGAME_TABLEBASES = {}
+
+
+def GetEndgameTablebase(FileName):
+    """
+    It returns this process's mapping of an endgame tablebase file, mapping it the first time, so that a worker process
+    that is sent the file name opens it only once
+
+    :param FileName: The name of a file written by GenerateEndgameTablebase
+    :return: The EndgameTablebase.
+    """
+    if FileName not in ENDGAME_TABLEBASES:
+        ENDGAME_TABLEBASES[FileName] = EndgameTablebase(FileName)
+    return ENDGAME_TABLEBASES[FileName]
+
+
+# A computer player that picks one of its legal moves at random
+class RandomPolicy:
+    def __init__(self, Seed=None):
+        """
+        :param Seed: The seed for the policy's random choices
+        """
+        self._Generator = random.Random(Seed)
+
+    def ChooseMove(self, Game):
+        """
+        It returns a random legal move
+
+        :param Game: The Dastan game
+        :return: The chosen action.
+        """
+        LegalMoves = Game.GenerateLegalMoves()
+        if not LegalMoves:
+            return PASS_ACTION
+        return self._Generator.choice(LegalMoves)
+
+
+# A computer player that captures the piece worth the most points if it can, otherwise moves into a kotla if it can,
+# otherwise makes a random move. It never takes the offer
+class GreedyCapturePolicy:
+    def __init__(self, Seed=None):
+        """
+        :param Seed: The seed for the policy's random choices
+        """
+        self._Generator = random.Random(Seed)
+
+    def ChooseMove(self, Game):
+        """
+        It returns the legal move that scores best straight away, choosing at random between equally good moves
+
+        :param Game: The Dastan game
+        :return: The chosen action.
+        """
+        BestMoves = []
+        BestValue = -1
+        for Action in Game.GenerateLegalMoves():
+            if Action[0] != 0:
+                continue
+            FinishSquare = Game.GetSquare(Action[3])
+            PieceInSquare = FinishSquare.GetPieceInSquare()
+            if PieceInSquare is not None:
+                Value = 10 * PieceInSquare.GetPointsIfCaptured()
+            elif FinishSquare.ContainsKotla():
+                Value = 5
+            else:
+                Value = 0
+            if Value > BestValue:
+                BestValue = Value
+                BestMoves = [Action]
+            elif Value == BestValue:
+                BestMoves.append(Action)
+        if not BestMoves:
+            return PASS_ACTION
+        return self._Generator.choice(BestMoves)
+
+
+# A computer player that plays from an endgame tablebase, without searching, when it has a move that is sure to win on the
+# scores, and leaves every other position to another computer player
+class TablebasePlayer:
+    def __init__(self, Tablebase, Fallback):
+        """
+        :param Tablebase: The EndgameTablebase
+        :param Fallback: The computer player for the positions that are not in the tablebase
+        """
+        self._Tablebase = Tablebase
+        self._Fallback = Fallback
+        self._Hits = 0
+
+    def ChooseMove(self, Game):
+        """
+        It plays the tablebase's winning move if it has one and otherwise asks the other computer player
+
+        :param Game: The Dastan game
+        :return: The chosen action.
+        """
+        Action = self._Tablebase.ChooseMove(Game)
+        if Action is None:
+            return self._Fallback.ChooseMove(Game)
+        self._Hits += 1
+        return Action
+
+    def GetNoOfHits(self):
+        """
+        It returns how many moves have been chosen from the tablebase
+        :return: The number of moves.
+        """
+        return self._Hits
+
+
+POLICY_NAMES = ("random", "greedy", "alphabeta", "mcts")
+
+
+def CreatePolicy(Name, Seed=None, TimeLimit=0.1, Iterations=200, Tablebase=None, Workers=1):
+    """
+    It creates a computer player from its name
+
+    :param Name: One of POLICY_NAMES
+    :param Seed: The seed for the player's random choices
+    :param TimeLimit: The time limit per move for the alpha-beta player
+    :param Iterations: The iterations per move for the Monte Carlo player
+    :param Tablebase: An EndgameTablebase for the alpha-beta player to order its moves by and the Monte Carlo player to
+    play its rollouts by, or None
+    :param Workers: The number of worker processes for the Monte Carlo player; with 1 it searches in this process. The
+    caller must Close a Monte Carlo player with more than one
+    :return: The computer player.
+    """
+    if Name == "random":
+        return RandomPolicy(Seed)
+    elif Name == "greedy":
+        return GreedyCapturePolicy(Seed)
+    elif Name == "alphabeta":
+        return AlphaBetaPlayer(TimeLimit=TimeLimit, Tablebase=Tablebase)
+    elif Name == "mcts":
+        return MCTSPlayer(Iterations=Iterations, Workers=Workers, Seed=Seed, Tablebase=Tablebase)
+    raise ValueError("unknown policy: " + str(Name))
+
+
+def PlayHeadlessGame(Game, Controllers, MaxTurns):
+    """
+    It plays a game between two computer players without any output
+
+    :param Game: The Dastan game
+    :param Controllers: The computer players for Player One and Player Two
+    :param MaxTurns: The number of turns after which the game is stopped if it has not finished
+    :return: The number of turns played.
+    """
+    Players = Game.GetPlayers()
+    Turns = 0
+    while not Game.IsGameOver() and Turns < MaxTurns:
+        if Game.GetCurrentPlayer().SameAs(Players[0]):
+            Game.ApplyMove(ChooseMoveWithProfiler(Game, Controllers[0]))
+        else:
+            Game.ApplyMove(ChooseMoveWithProfiler(Game, Controllers[1]))
+        Turns += 1
+    return Turns
+
+
+def RunSimulationGames(R, C, NoOfPieces, PolicyNames, FirstGame, NoOfGames, Seed, MaxTurns, RecordFile=None,
+                       ProfileFile=None, TablebaseFile=None, MCTSWorkers=1):
+    """
+    It plays a run of games and adds up the results. Game number N uses Seed + N for its own random number generator and
+    for the players' random choices, so every game can be played again on its own
+
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param PolicyNames: The names of the policies for Player One and Player Two
+    :param FirstGame: The number of the first game in the run
+    :param NoOfGames: The number of games in the run
+    :param Seed: The seed for the whole simulation
+    :param MaxTurns: The number of turns after which a game is stopped if it has not finished
+    :param RecordFile: The name of a game record file to add the games to, or None
+    :param ProfileFile: The name of a JSON lines file to add each game's profile to, or None
+    :param TablebaseFile: The name of an endgame tablebase for both players to play from when they can, and for the
+    searching players to look positions up in, or None
+    :param MCTSWorkers: The number of worker processes for each Monte Carlo player's search
+    :return: A dictionary of totals.
+    """
+    Totals = {"games": 0, "player_one_wins": 0, "player_two_wins": 0, "draws": 0, "unfinished": 0, "turns": 0,
+              "player_one_score": 0, "player_two_score": 0}
+    Writer = None
+    if RecordFile is not None:
+        Writer = GameRecordWriter(RecordFile, R, C, NoOfPieces)
+    ProfileLines = []
+    Tablebase = None
+    if TablebaseFile is not None:
+        Tablebase = EndgameTablebase(TablebaseFile)
+    for GameNumber in range(FirstGame, FirstGame + NoOfGames):
+        GameSeed = Seed + GameNumber
+        Game = Dastan(R, C, NoOfPieces, GameSeed)
+        if ProfileFile is not None:
+            Game.SetProfiler(GameProfiler())
+        Policies = [CreatePolicy(PolicyNames[0], GameSeed * 2, Tablebase=Tablebase, Workers=MCTSWorkers),
+                    CreatePolicy(PolicyNames[1], GameSeed * 2 + 1, Tablebase=Tablebase, Workers=MCTSWorkers)]
+        Controllers = Policies
+        if Tablebase is not None:
+            Controllers = [TablebasePlayer(Tablebase, Policy) for Policy in Policies]
+        Totals["turns"] += PlayHeadlessGame(Game, Controllers, MaxTurns)
+        for Policy in Policies:
+            if isinstance(Policy, MCTSPlayer):
+                Policy.Close()
+        if Writer is not None:
+            Writer.WriteGame(Game)
+        if ProfileFile is not None:
+            ProfileLines.append(Game.GetProfiler().GetJSONLine(game=GameNumber, seed=GameSeed))
+        Scores = [P.GetScore() for P in Game.GetPlayers()]
+        Totals["games"] += 1
+        Totals["player_one_score"] += Scores[0]
+        Totals["player_two_score"] += Scores[1]
+        if not Game.IsGameOver():
+            Totals["unfinished"] += 1
+        elif Scores[0] == Scores[1]:
+            Totals["draws"] += 1
+        elif Scores[0] > Scores[1]:
+            Totals["player_one_wins"] += 1
+        else:
+            Totals["player_two_wins"] += 1
+    if Writer is not None:
+        Writer.Close()
+    if Tablebase is not None:
+        Tablebase.Close()
+    if ProfileFile is not None:
+        with open(ProfileFile, "a") as File:
+            File.write("".join(ProfileLines))
+    return Totals
+
+
+def RunSimulation(NoOfGames, PolicyNames, R=6, C=6, NoOfPieces=4, Workers=1, Seed=0, MaxTurns=500, RecordFile=None,
+                  ProfileFile=None, TablebaseFile=None, MCTSWorkers=1):
+    """
+    It plays many complete games between two computer players with nothing displayed, splitting the games between
+    worker processes, and adds up the results
+
+    :param NoOfGames: The number of games to play
+    :param PolicyNames: The names of the policies for Player One and Player Two
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param Workers: The number of worker processes; with 1 the games are played in this process
+    :param Seed: The seed for the whole simulation
+    :param MaxTurns: The number of turns after which a game is stopped if it has not finished
+    :param RecordFile: The name of a game record file to add the games to, or None. Each worker process writes its own
+    part file, and the parts are added to the record file in order once they have all finished
+    :param ProfileFile: The name of a JSON lines file to add each game's profile to, or None. Each worker process adds
+    its lines in one write when it has finished its games
+    :param TablebaseFile: The name of an endgame tablebase for both players to play from when they can, or None. Each
+    worker process maps the same file, so they share one copy of it
+    :param MCTSWorkers: The number of worker processes for each Monte Carlo player's search, on top of the workers
+    playing the games
+    :return: A dictionary of totals, including the time taken and games per second.
+    """
+    StartTime = time.perf_counter()
+    if Workers == 1:
+        Totals = RunSimulationGames(R, C, NoOfPieces, PolicyNames, 0, NoOfGames, Seed, MaxTurns, RecordFile,
+                                    ProfileFile, TablebaseFile, MCTSWorkers)
+    else:
+        Totals = None
+        with concurrent.futures.ProcessPoolExecutor(max_workers=Workers) as Executor:
+            Futures = []
+            PartFiles = []
+            FirstGame = 0
+            for Count in range(Workers):
+                Share = NoOfGames // Workers + (1 if Count < NoOfGames % Workers else 0)
+                if Share > 0:
+                    PartFile = None
+                    if RecordFile is not None:
+                        PartFile = RecordFile + ".part" + str(Count)
+                        PartFiles.append(PartFile)
+                    Futures.append(Executor.submit(RunSimulationGames, R, C, NoOfPieces, PolicyNames, FirstGame, Share,
+                                                   Seed, MaxTurns, PartFile, ProfileFile, TablebaseFile, MCTSWorkers))
+                FirstGame += Share
+            for Future in Futures:
+                Part = Future.result()
+                if Totals is None:
+                    Totals = Part
+                else:
+                    for Key in Part:
+                        Totals[Key] += Part[Key]
+        for PartFile in PartFiles:
+            AppendGameRecords(RecordFile, PartFile)
+            os.remove(PartFile)
+    Totals["seconds"] = time.perf_counter() - StartTime
+    if Totals["seconds"] > 0:
+        Totals["games_per_second"] = Totals["games"] / Totals["seconds"]
+    else:
+        Totals["games_per_second"] = 0.0
+    return Totals
+
+
+# The header of a GameStateArena gives the number of rows, columns and slots, so that another process can attach to the
+# arena by its name alone. Each slot's result is a value and the number of things, such as rollouts, that it adds up
+ARENA_HEADER = struct.Struct("<HHI")
+ARENA_RESULT = struct.Struct("<dq")
+
+GAME_STATE_ARENAS = {}
+
+
+# A pool of game positions in shared memory, in the layout packed by Dastan.ToBytes, with a result for each slot. The
+# process that creates the arena hands out the slots and writes positions into them; worker processes attach by name and
+# read positions and write results in place by slot number, so nothing but slot numbers goes through the pipes to them
+class GameStateArena:
+    def __init__(self, R, C, NoOfSlots, Name=None):
+        """
+        :param R: Number of rows
+        :param C: The number of columns in the board
+        :param NoOfSlots: The number of positions the arena can hold
+        :param Name: The name of an arena made by another process to attach to, or None to make a new one
+        """
+        self._StateSize = PACKED_STATE_HEADER.size + 10 + R * C
+        self._ResultsOffset = ARENA_HEADER.size + NoOfSlots * self._StateSize
+        if Name is None:
+            self._Memory = multiprocessing.shared_memory.SharedMemory(
+                create=True, size=self._ResultsOffset + NoOfSlots * ARENA_RESULT.size)
+            ARENA_HEADER.pack_into(self._Memory.buf, 0, R, C, NoOfSlots)
+        else:
+            self._Memory = multiprocessing.shared_memory.SharedMemory(Name)
+        self._Owner = Name is None
+        self._NoOfRows = R
+        self._NoOfColumns = C
+        self._NoOfSlots = NoOfSlots
+        # slots are handed out from the end of the list, lowest first
+        self._FreeSlots = list(range(NoOfSlots - 1, -1, -1))
+
+    def __reduce__(self):
+        """
+        An arena is pickled by its name, so a worker process attaches to the same shared memory
+        :return: The function that attaches to the arena and its name.
+        """
+        return AttachGameStateArena, (self._Memory.name,)
+
+    def GetName(self):
+        """
+        It returns the name of the shared memory holding the arena
+        :return: The name.
+        """
+        return self._Memory.name
+
+    def GetNoOfSlots(self):
+        """
+        It returns how many positions the arena can hold
+        :return: The number of slots.
+        """
+        return self._NoOfSlots
+
+    def GetNoOfFreeSlots(self):
+        """
+        It returns how many slots have not been handed out
+        :return: The number of free slots.
+        """
+        return len(self._FreeSlots)
+
+    def Allocate(self):
+        """
+        It hands out a free slot, with its result set to nothing. Only the process that made the arena hands out slots
+        :return: The slot number.
+        """
+        if not self._FreeSlots:
+            raise IndexError("the arena has no free slots")
+        Slot = self._FreeSlots.pop()
+        self.SetResult(Slot, 0.0, 0)
+        return Slot
+
+    def Free(self, Slot):
+        """
+        It gives a slot back so that it can be handed out again
+
+        :param Slot: The slot number
+        """
+        self._FreeSlots.append(Slot)
+
+    def WriteGame(self, Slot, Game):
+        """
+        It packs a game's position into a slot
+
+        :param Slot: The slot number
+        :param Game: The Dastan game, which must be the arena's size
+        """
+        Start = ARENA_HEADER.size + Slot * self._StateSize
+        self._Memory.buf[Start:Start + self._StateSize] = Game.ToBytes()
+
+    def ReadGame(self, Slot, Seed=None):
+        """
+        It makes a game in the position held in a slot
+
+        :param Slot: The slot number
+        :param Seed: The seed for the game's random number generator
+        :return: The Dastan game.
+        """
+        Start = ARENA_HEADER.size + Slot * self._StateSize
+        return Dastan.FromBytes(bytes(self._Memory.buf[Start:Start + self._StateSize]), Seed)
+
+    def SetResult(self, Slot, Value, Count):
+        """
+        It sets the result for a slot
+
+        :param Slot: The slot number
+        :param Value: The value, such as the total of the rollouts' outcomes
+        :param Count: The number of things the value adds up
+        """
+        ARENA_RESULT.pack_into(self._Memory.buf, self._ResultsOffset + Slot * ARENA_RESULT.size, Value, Count)
+
+    def GetResult(self, Slot):
+        """
+        It returns the result for a slot
+
+        :param Slot: The slot number
+        :return: A tuple (Value, Count).
+        """
+        return ARENA_RESULT.unpack_from(self._Memory.buf, self._ResultsOffset + Slot * ARENA_RESULT.size)
+
+    def Close(self):
+        """
+        It detaches from the shared memory, and frees it if this is the process that made the arena
+        """
+        if self._Memory is not None:
+            self._Memory.close()
+            if self._Owner:
+                self._Memory.unlink()
+            self._Memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExceptionType, ExceptionValue, Traceback):
+        self.Close()
+
+
+def AttachGameStateArena(Name):
+    """
+    It attaches to an arena made by another process. A worker process stays attached to the arena it used last, so that
+    every batch of work it is sent does not have to attach again
+
+    :param Name: The name of the arena's shared memory
+    :return: A GameStateArena.
+    """
+    if Name not in GAME_STATE_ARENAS:
+        for Arena in GAME_STATE_ARENAS.values():
+            Arena.Close()
+        GAME_STATE_ARENAS.clear()
+        Memory = multiprocessing.shared_memory.SharedMemory(Name)
+        R, C, NoOfSlots = ARENA_HEADER.unpack_from(Memory.buf)
+        Memory.close()
+        GAME_STATE_ARENAS[Name] = GameStateArena(R, C, NoOfSlots, Name)
+    return GAME_STATE_ARENAS[Name]
+
+
+def RunArenaRollouts(Arena, Slots, NoOfRollouts, Seed, MaxTurns=200):
+    """
+    It plays random games to the end from the position in each slot and adds their outcomes to the slot's result: 1 for
+    a win for the player whose turn it is in the position, -1 for a loss and 0 for a draw or a game stopped after
+    MaxTurns. It is a module-level function so that a process pool can run it
+
+    :param Arena: The GameStateArena
+    :param Slots: The slot numbers of the positions
+    :param NoOfRollouts: The number of random games to play from each position
+    :param Seed: The seed for the random games
+    :param MaxTurns: The number of turns after which a random game is stopped
+    """
+    Policy = RandomPolicy(Seed)
+    for Slot in Slots:
+        Start = Arena.ReadGame(Slot, Seed)
+        MoverIndex = 0 if Start.GetCurrentPlayer().SameAs(Start.GetPlayers()[0]) else 1
+        Value, Count = Arena.GetResult(Slot)
+        for Rollout in range(NoOfRollouts):
+            Game = Start.Clone()
+            Turns = 0
+            while not Game.IsGameOver() and Turns < MaxTurns:
+                Game.ApplyMove(Policy.ChooseMove(Game))
+                Turns += 1
+            if Game.IsGameOver():
+                Scores = [P.GetScore() for P in Game.GetPlayers()]
+                if Scores[MoverIndex] > Scores[1 - MoverIndex]:
+                    Value += 1
+                elif Scores[MoverIndex] < Scores[1 - MoverIndex]:
+                    Value -= 1
+            Count += 1
+        Arena.SetResult(Slot, Value, Count)
+
+
+def EvaluatePositionsByRollouts(Games, NoOfRollouts=16, Workers=None, Seed=0, MaxTurns=200, BatchSize=64):
+    """
+    It estimates how good each position is for the player whose turn it is by playing random games from it. The
+    positions are put in a GameStateArena and the worker processes are only sent batches of slot numbers
+
+    :param Games: The Dastan games, all the same size
+    :param NoOfRollouts: The number of random games to play from each position
+    :param Workers: The number of worker processes, or None for one per processor. With 1 the games are played in this
+    process
+    :param Seed: The seed for the random games
+    :param MaxTurns: The number of turns after which a random game is stopped
+    :param BatchSize: The number of slots in each batch sent to a worker
+    :return: A list with the average outcome, from -1 to 1, for each position.
+    """
+    if not Games:
+        return []
+    if Workers is None:
+        Workers = os.cpu_count() or 1
+    with GameStateArena(Games[0].GetNoOfRows(), Games[0].GetNoOfColumns(), len(Games)) as Arena:
+        Slots = []
+        for Game in Games:
+            Slot = Arena.Allocate()
+            Arena.WriteGame(Slot, Game)
+            Slots.append(Slot)
+        Batches = [Slots[Start:Start + BatchSize] for Start in range(0, len(Slots), BatchSize)]
+        if Workers == 1:
+            for BatchNumber in range(len(Batches)):
+                RunArenaRollouts(Arena, Batches[BatchNumber], NoOfRollouts, Seed + BatchNumber, MaxTurns)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=Workers) as Executor:
+                Futures = [Executor.submit(RunArenaRollouts, Arena, Batches[BatchNumber], NoOfRollouts,
+                                           Seed + BatchNumber, MaxTurns) for BatchNumber in range(len(Batches))]
+                for Future in Futures:
+                    Future.result()
+        Values = []
+        for Slot in Slots:
+            Value, Count = Arena.GetResult(Slot)
+            Values.append(Value / Count if Count > 0 else 0.0)
+    return Values
+
+
+def DisplaySimulationResults(Totals):
+    """
+    It prints the totals from RunSimulation
 
+    :param Totals: The dictionary returned by RunSimulation
+    """
+    Games = max(Totals["games"], 1)
+    print("Games: " + str(Totals["games"]))
+    print("Player One wins: " + str(Totals["player_one_wins"]))
+    print("Player Two wins: " + str(Totals["player_two_wins"]))
+    print("Draws: " + str(Totals["draws"]))
+    print("Unfinished: " + str(Totals["unfinished"]))
+    print("Average score: " + str(round(Totals["player_one_score"] / Games, 2)) + " to " + str(
+        round(Totals["player_two_score"] / Games, 2)))
+    print("Average turns: " + str(round(Totals["turns"] / Games, 2)))
+    print("Games per second: " + str(round(Totals["games_per_second"], 2)))
 
-# The MoveOption class is a class that contains a list of possible moves that a piece can make
-class MoveOption:
-    def __init__(self, N):
+
+def MeasureMemoryPerGame(R=6, C=6, NoOfPieces=4, NoOfGames=1000):
+    """
+    It creates many games and measures how much memory they take between them
+
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param NoOfGames: The number of games to create
+    :return: The average number of bytes allocated per game.
+    """
+    tracemalloc.start()
+    try:
+        Before = tracemalloc.get_traced_memory()[0]
+        Games = [Dastan(R, C, NoOfPieces, Seed) for Seed in range(NoOfGames)]
+        After = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (After - Before) / len(Games)
+
+
+# An input source that gives the answers from a script, one line per answer, in the way the built-in input would read
+# them from a file. The lines can come from a list, an open file or any other iterator
+class ScriptedInput:
+    def __init__(self, Lines):
         """
-        The function __init__() is a constructor that initializes the object's name and possible moves
+        :param Lines: The answers, with or without newlines
+        """
+        self._Lines = iter(Lines)
+        self._NoOfLinesUsed = 0
 
-        :param N: The name of the player
+    def __call__(self, Prompt):
         """
-        self._Name = N
-        self._PossibleMoves = []
+        It returns the next answer in the script, whatever the prompt
 
-    def AddToPossibleMoves(self, M):
+        :param Prompt: The question being asked
+        :return: The answer, without a newline.
         """
-        It takes a move (M) and adds it to the list of possible moves
+        Line = next(self._Lines, None)
+        if Line is None:
+            raise EOFError("the script has no more answers")
+        self._NoOfLinesUsed += 1
+        return Line.rstrip("\r\n")
 
-        :param M: The move to be added to the list of possible moves
+    def GetNoOfLinesUsed(self):
         """
-        self._PossibleMoves.append(M)
+        It returns how many answers have been given so far
+        :return: The number of lines used.
+        """
+        return self._NoOfLinesUsed
 
-    def GetName(self):
+
+# An input source that answers for the players by asking computer players for their moves and typing them in, so a game
+# between computer players goes through the same prompts and checks as one between people
+class PolicyInput:
+    def __init__(self, Game, Policies, MaxTurns=None):
         """
-        The function GetName() returns the value of the private variable _Name
-        :return: The name of the person.
+        :param Game: The Dastan game being played
+        :param Policies: The computer players for Player One and Player Two
+        :param MaxTurns: The number of turns after which there are no more answers, or None for no limit
         """
-        return self._Name
+        self._Game = Game
+        self._Policies = Policies
+        self._MaxTurns = MaxTurns
+        self._NoOfTurns = 0
+        self._Pending = collections.deque()
 
-    def CheckIfThereIsAMoveToSquare(self, StartSquareReference, FinishSquareReference):
+    def __call__(self, Prompt):
         """
-        If the start square and the finish square are the same, then the piece can't move
+        It returns the next answer for the current player's move, choosing the move first if it has not been chosen yet
 
-        :param StartSquareReference: The reference of the square the piece is on
-        :param FinishSquareReference: The square that the piece is trying to move to
-        :return: A boolean value.
+        :param Prompt: The question being asked
+        :return: The answer.
         """
-        StartRow = StartSquareReference // 10
-        StartColumn = StartSquareReference % 10
-        FinishRow = FinishSquareReference // 10
-        FinishColumn = FinishSquareReference % 10
-        for M in self._PossibleMoves:
-            if StartRow + M.GetRowChange() == FinishRow and StartColumn + M.GetColumnChange() == FinishColumn:
-                return True
-        return False
+        if not self._Pending:
+            if self._MaxTurns is not None and self._NoOfTurns >= self._MaxTurns:
+                raise EOFError("the game has reached the maximum number of turns")
+            Players = self._Game.GetPlayers()
+            if self._Game.GetCurrentPlayer().SameAs(Players[0]):
+                Action = ChooseMoveWithProfiler(self._Game, self._Policies[0])
+            else:
+                Action = ChooseMoveWithProfiler(self._Game, self._Policies[1])
+            self._Pending.extend(self.__GetAnswersForMove(Action))
+            self._NoOfTurns += 1
+        return self._Pending.popleft()
 
+    def __GetAnswersForMove(self, Action):
+        """
+        It turns an action into the answers a person would type for it. A player cannot pass when asked for a move, so a
+        pass is typed as a move that is not legal, which loses the turn in the same way
 
-# The Move class is a class that represents a move in the game of chess.
-class Move:
-    def __init__(self, R, C):
-        self._RowChange = R
-        self._ColumnChange = C
+        :param Action: A tuple (ReplaceChoice, Choice, StartSquareReference, FinishSquareReference)
+        :return: A list of answers.
+        """
+        ReplaceChoice, Choice, StartSquareReference, FinishSquareReference = Action
+        if StartSquareReference == 0:
+            StartSquareReference, FinishSquareReference = self.__FindMoveThatIsNotLegal()
+        Answers = []
+        if ReplaceChoice != 0:
+            Answers.extend(("9", str(ReplaceChoice)))
+        Answers.extend((str(Choice), str(StartSquareReference), str(FinishSquareReference)))
+        return Answers
 
-    def GetRowChange(self):
-        return self._RowChange
+    def __FindMoveThatIsNotLegal(self):
+        """
+        It finds a square with one of the current player's pieces in it and a square without one. It is only used when the
+        current player has no legal moves, so moving from one to the other is not legal
+        :return: A tuple (StartSquareReference, FinishSquareReference).
+        """
+        StartSquareReference = None
+        FinishSquareReference = None
+        for Row in range(1, self._Game.GetNoOfRows() + 1):
+            for Column in range(1, self._Game.GetNoOfColumns() + 1):
+                SquareReference = self._Game.GetSquareReference(Row, Column)
+                PieceInSquare = self._Game.GetSquare(SquareReference).GetPieceInSquare()
+                if PieceInSquare is not None and PieceInSquare.GetBelongsTo().SameAs(self._Game.GetCurrentPlayer()):
+                    StartSquareReference = StartSquareReference or SquareReference
+                else:
+                    FinishSquareReference = FinishSquareReference or SquareReference
+        return StartSquareReference, FinishSquareReference
 
-    def GetColumnChange(self):
-        return self._ColumnChange
 
+def DiscardOutput(Text):
+    """
+    An output sink that throws away everything written to it
 
-# It's a queue of MoveOption objects
-class MoveOptionQueue:
-    def __init__(self):
+    :param Text: The text being written
+    """
+
+
+def RunScriptedGame(Game, Source):
+    """
+    It plays a game with the answers from an input source and captures everything it writes, all in this process
+
+    :param Game: The Dastan game, with its display policy already set
+    :param Source: The input source, such as a ScriptedInput or a PolicyInput
+    :return: A tuple (Output, Finished), where Finished is False if the source ran out of answers before the game ended.
+    """
+    Frames = []
+    Game.SetInputSource(Source)
+    Game.SetOutputSink(Frames.append)
+    try:
+        Game.PlayGame()
+        Finished = True
+    except EOFError:
+        Finished = False
+    finally:
+        Game.SetInputSource(None)
+        Game.SetOutputSink(None)
+    return "".join(Frames), Finished
+
+
+def RecordTranscript(Game, Source):
+    """
+    It plays a game from an input source and keeps every answer it gave and everything the game wrote, as a golden
+    transcript that CheckTranscript can play again later
+
+    :param Game: The Dastan game, with its display policy already set
+    :param Source: The input source
+    :return: The transcript, as a dictionary that can be saved as JSON.
+    """
+    Answers = []
+
+    def RecordAnswer(Prompt):
+        Answer = Source(Prompt)
+        Answers.append(Answer)
+        return Answer
+
+    Policy, Every = Game.GetDisplayPolicy()
+    Transcript = {"rows": Game.GetNoOfRows(), "columns": Game.GetNoOfColumns(), "pieces": Game.GetNoOfPieces(),
+                  "seed": Game.GetSeed(), "display": Policy, "display_every": Every}
+    Transcript["output"], Transcript["finished"] = RunScriptedGame(Game, RecordAnswer)
+    Transcript["input"] = Answers
+    return Transcript
+
+
+def CheckTranscript(Transcript):
+    """
+    It plays the answers in a transcript again, in a new game with the same seed, and compares what the game writes with
+    the transcript
+
+    :param Transcript: A transcript made by RecordTranscript
+    :return: None if the output matches, otherwise a tuple (LineNumber, Expected, Actual) for the first line that differs,
+    where a missing line is given as None.
+    """
+    Game = Dastan(Transcript["rows"], Transcript["columns"], Transcript["pieces"], Transcript["seed"])
+    Game.SetDisplayPolicy(Transcript["display"], Transcript["display_every"])
+    Output, Finished = RunScriptedGame(Game, ScriptedInput(Transcript["input"]))
+    if Output == Transcript["output"]:
+        return None
+    ExpectedLines = Transcript["output"].split("\n")
+    ActualLines = Output.split("\n")
+    for LineNumber in range(max(len(ExpectedLines), len(ActualLines))):
+        Expected = ExpectedLines[LineNumber] if LineNumber < len(ExpectedLines) else None
+        Actual = ActualLines[LineNumber] if LineNumber < len(ActualLines) else None
+        if Expected != Actual:
+            return LineNumber + 1, Expected, Actual
+
+
+def RecordTranscripts(FileName, NoOfGames, PolicyNames, R=6, C=6, NoOfPieces=4, Seed=0, MaxTurns=500,
+                      DisplayPolicy="always", Every=1):
+    """
+    It records transcripts of games between computer players, answering the prompts with a PolicyInput, and adds them to
+    a JSON lines file with one transcript per line. Game number N uses Seed + N, as in a simulation
+
+    :param FileName: The name of the file
+    :param NoOfGames: The number of games
+    :param PolicyNames: The names of the policies for Player One and Player Two
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param Seed: The seed for the first game
+    :param MaxTurns: The number of turns after which a game is stopped if it has not finished
+    :param DisplayPolicy: The display policy for the games
+    :param Every: N for the "every" display policy
+    """
+    Lines = []
+    for GameNumber in range(NoOfGames):
+        GameSeed = Seed + GameNumber
+        Game = Dastan(R, C, NoOfPieces, GameSeed)
+        Game.SetDisplayPolicy(DisplayPolicy, Every)
+        Policies = [CreatePolicy(PolicyNames[0], GameSeed * 2), CreatePolicy(PolicyNames[1], GameSeed * 2 + 1)]
+        Lines.append(json.dumps(RecordTranscript(Game, PolicyInput(Game, Policies, MaxTurns))) + "\n")
+    with open(FileName, "a") as File:
+        File.write("".join(Lines))
+
+
+def CheckTranscripts(FileName):
+    """
+    It checks every transcript in a JSON lines file
+
+    :param FileName: The name of the file
+    :return: A list of tuples (TranscriptNumber, LineNumber, Expected, Actual), one for each transcript that does not
+    match, numbered from 0.
+    """
+    Differences = []
+    with open(FileName) as File:
+        for TranscriptNumber, Line in enumerate(File):
+            Difference = CheckTranscript(json.loads(Line))
+            if Difference is not None:
+                Differences.append((TranscriptNumber,) + Difference)
+    return Differences
+
+
+def Perft(Game, Depth, EnumerateOffers=False, Reference=False):
+    """
+    It counts the positions reached by every sequence of Depth legal actions from the current position, taking the offer
+    included. When the offer is taken a new offer is picked at random: with EnumerateOffers each of the five offer
+    positions is followed as a separate position, otherwise the game's own random number generator picks it, so the
+    count depends on the game's seed. A game that is over has no moves. It works with a Dastan or a BitboardDastan
+
+    :param Game: The game, which is put back as it was before this returns
+    :param Depth: The number of actions
+    :param EnumerateOffers: Whether to follow all five offer positions after the offer is taken
+    :param Reference: Whether to list the moves with GenerateLegalMovesByChecking rather than GenerateLegalMoves, which
+    only a Dastan has
+    :return: The number of positions.
+    """
+    if Depth == 0:
+        return 1
+    if Game.IsGameOver():
+        return 0
+    if Reference:
+        LegalMoves = Game.GenerateLegalMovesByChecking()
+    else:
+        LegalMoves = Game.GenerateLegalMoves()
+    # the positions one action away are only counted, not reached
+    if Depth == 1:
+        if EnumerateOffers:
+            return sum(5 if Action[0] != 0 else 1 for Action in LegalMoves)
+        return len(LegalMoves)
+    Nodes = 0
+    for Action in LegalMoves:
+        if EnumerateOffers and Action[0] != 0:
+            for NextOfferPosition in range(5):
+                Game.MakeMove(Action, NextOfferPosition)
+                Nodes += Perft(Game, Depth - 1, EnumerateOffers, Reference)
+                Game.UnmakeMove()
+        else:
+            Game.MakeMove(Action)
+            Nodes += Perft(Game, Depth - 1, EnumerateOffers, Reference)
+            Game.UnmakeMove()
+    return Nodes
+
+
+def PerftDivide(Game, Depth, EnumerateOffers=False, Reference=False):
+    """
+    It splits the perft count by the first action, which narrows down where two move generators disagree
+
+    :param Game: The game, which is put back as it was before this returns
+    :param Depth: The number of actions, at least 1
+    :param EnumerateOffers: Whether to follow all five offer positions after the offer is taken
+    :param Reference: Whether to list the moves with GenerateLegalMovesByChecking
+    :return: A dictionary of the number of positions after each first action.
+    """
+    Counts = {}
+    if Game.IsGameOver():
+        return Counts
+    if Reference:
+        LegalMoves = Game.GenerateLegalMovesByChecking()
+    else:
+        LegalMoves = Game.GenerateLegalMoves()
+    for Action in LegalMoves:
+        if EnumerateOffers and Action[0] != 0:
+            NextOfferPositions = range(5)
+        else:
+            NextOfferPositions = (None,)
+        Counts[Action] = 0
+        for NextOfferPosition in NextOfferPositions:
+            Game.MakeMove(Action, NextOfferPosition)
+            Counts[Action] += Perft(Game, Depth - 1, EnumerateOffers, Reference)
+            Game.UnmakeMove()
+    return Counts
+
+
+PERFT_ENGINES = ("object", "bitboard", "reference")
+
+# The perft counts from the starting position for depths 1, 2 and so on, keyed by (rows, columns, pieces, seed), where
+# the seed is None for counts made with EnumerateOffers, which do not depend on it
+PERFT_GOLDEN = {
+    (4, 2, 1, 0): (56, 2306, 100900),
+    (4, 2, 1, None): (240, 41841, 7395681),
+    (5, 3, 2, 0): (132, 15120, 1688769),
+    (5, 3, 2, None): (576, 283233, 136288176),
+    (6, 6, 4, 0): (294, 87762, 23429764),
+    (6, 6, 4, None): (1290, 1708065, 2071308225),
+}
+
+
+def RunPerft(R, C, NoOfPieces, Depth, Seed=0, EnumerateOffers=False, Engine="object", Divide=False):
+    """
+    It runs perft from the starting position of a new game and times it
+
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param Depth: The number of actions
+    :param Seed: The seed for the game, which picks the offers unless EnumerateOffers is used
+    :param EnumerateOffers: Whether to follow all five offer positions after the offer is taken
+    :param Engine: One of PERFT_ENGINES: "object" uses Dastan.GenerateLegalMoves, "bitboard" uses a BitboardDastan
+    and "reference" uses Dastan.GenerateLegalMovesByChecking
+    :param Divide: Whether to split the count by the first action
+    :return: A dictionary of the number of positions, the time taken, the positions per second and, with Divide, the
+    count for each first action.
+    """
+    if Engine == "bitboard":
+        Game = BitboardDastan(R, C, NoOfPieces, Seed)
+    elif Engine in PERFT_ENGINES:
+        Game = Dastan(R, C, NoOfPieces, Seed)
+    else:
+        raise ValueError("unknown perft engine: " + str(Engine))
+    StartTime = time.perf_counter()
+    if Divide:
+        Counts = PerftDivide(Game, Depth, EnumerateOffers, Engine == "reference")
+        Nodes = sum(Counts.values())
+    else:
+        Counts = None
+        Nodes = Perft(Game, Depth, EnumerateOffers, Engine == "reference")
+    Seconds = time.perf_counter() - StartTime
+    Results = {"nodes": Nodes, "seconds": Seconds, "nodes_per_second": Nodes / Seconds if Seconds > 0 else 0.0}
+    if Counts is not None:
+        Results["divide"] = Counts
+    return Results
+
+
+def CheckPerftGolden(MaxDepth=2, Engine="object"):
+    """
+    It compares perft counts with the golden values in PERFT_GOLDEN
+
+    :param MaxDepth: The deepest count to check
+    :param Engine: One of PERFT_ENGINES
+    :return: A list of tuples (R, C, NoOfPieces, Seed, Depth, Expected, Actual), one for each count that is wrong.
+    """
+    Differences = []
+    for (R, C, NoOfPieces, Seed), Counts in PERFT_GOLDEN.items():
+        for Depth in range(1, min(MaxDepth, len(Counts)) + 1):
+            if Seed is None:
+                Nodes = RunPerft(R, C, NoOfPieces, Depth, 0, True, Engine)["nodes"]
+            else:
+                Nodes = RunPerft(R, C, NoOfPieces, Depth, Seed, False, Engine)["nodes"]
+            if Nodes != Counts[Depth - 1]:
+                Differences.append((R, C, NoOfPieces, Seed, Depth, Counts[Depth - 1], Nodes))
+    return Differences
+
+
+# The computer players that choose their moves quickly enough to be run on the game server's event loop. The others are
+# run in worker processes so that the server carries on with other games while they think
+INLINE_POLICY_NAMES = ("random", "greedy")
+
+
+def ChooseBotMove(PolicyName, Seed, Game):
+    """
+    It creates a computer player and asks it for its move. The game server calls it in a worker process, so it is given
+    everything it needs rather than keeping a player between moves
+
+    :param PolicyName: One of POLICY_NAMES
+    :param Seed: The seed for the player's random choices
+    :param Game: The Dastan game, or its position packed by ToBytes
+    :return: The action the computer player chose.
+    """
+    if isinstance(Game, bytes):
+        Game = Dastan.FromBytes(Game, Seed)
+    return CreatePolicy(PolicyName, Seed).ChooseMove(Game)
+
+
+# The most rows or columns a game on the game server can have, so that one join message cannot make the server build a
+# board big enough to stall every other game
+SERVER_MAX_BOARD_SIZE = 64
+# The most bytes the game server keeps waiting to be sent to a client. A client that stops reading is dropped once its
+# messages pass this, rather than letting them pile up in the server's memory
+SERVER_MAX_WRITE_BUFFER = 1 << 20
+
+
+def SendMessage(Connection, Message):
+    """
+    It sends a message to a client of the game server as one line of JSON. Nothing is sent if the client has gone, and
+    the client is disconnected if more than SERVER_MAX_WRITE_BUFFER bytes are waiting to be sent to them
+
+    :param Connection: The dictionary for the client's connection, or None
+    :param Message: The message
+    """
+    if Connection is not None and not Connection["writer"].is_closing():
+        Writer = Connection["writer"]
+        Writer.write((json.dumps(Message) + "\n").encode())
+        if Writer.transport.get_write_buffer_size() > SERVER_MAX_WRITE_BUFFER:
+            Writer.close()
+
+
+# A game being played on the game server. Each player is either a client, who may disconnect and come back with their
+# token, or a computer player. Moves from clients are put in a queue for each player, and Run takes them off the queue
+# when it is that player's turn
+class GameSession:
+    def __init__(self, Number, Game, Names, BotNames, Connections):
         """
-        The function __init__() initializes the queue
+        :param Number: The number of the game on the server
+        :param Game: The Dastan game
+        :param Names: The names of Player One and Player Two
+        :param BotNames: For each player the name of the computer player, or None for a client
+        :param Connections: For each player the client's connection, or None
         """
-        self.__Queue = []
+        self._Number = Number
+        self._Game = Game
+        self._Names = Names
+        self._BotNames = BotNames
+        self._Connections = list(Connections)
+        self._Tokens = [secrets.token_hex(16) if BotNames[Index] is None else None for Index in range(2)]
+        self._Moves = [asyncio.Queue(), asyncio.Queue()]
+        self._DisconnectedAt = [None, None]
+        self._Random = random.Random()
+        self._Turn = 0
 
-    def GetQueueAsString(self):
+    def GetTokens(self):
         """
-        It takes a queue of movies and returns a string of the movies in the queue
-        :return: The queue as a string.
+        It returns the tokens the clients use to come back to the game after disconnecting
+        :return: A list with a token for each player who is a client, and None for a computer player.
         """
-        QueueAsString = ""
-        Count = 1
-        for M in self.__Queue:
-            QueueAsString += str(Count) + ". " + M.GetName() + "   "
-            Count += 1
-        return QueueAsString
+        return self._Tokens
 
-    def Add(self, NewMoveOption):
+    def __GetCurrentIndex(self):
         """
-        It adds a new move option to the queue
+        :return: 0 if it is Player One's turn, otherwise 1.
+        """
+        return 0 if self._Game.GetCurrentPlayer().SameAs(self._Game.GetPlayers()[0]) else 1
 
-        :param NewMoveOption: The MoveOption object to add to the queue
+    def __GetState(self, PlayerIndex):
         """
-        self.__Queue.append(NewMoveOption)
+        It describes the game as the player sees it, with their legal moves if it is their turn
 
-    def Replace(self, Position, NewMoveOption):
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :return: A state message.
         """
-        Replace(self, Position, NewMoveOption) replaces the MoveOption at Position with NewMoveOption.
+        Game = self._Game
+        Players = Game.GetPlayers()
+        YourTurn = not Game.IsGameOver() and self.__GetCurrentIndex() == PlayerIndex
+        State = {"type": "state", "game": self._Number, "turn": self._Turn, "board": Game.GetBoardAsString(),
+                 "scores": [P.GetScore() for P in Players],
+                 "queues": [[M.GetName() for M in P.GetMoveOptionQueueContents()] for P in Players],
+                 "offer": Game.GetMoveOptionOffer()[Game.GetMoveOptionOfferPosition()],
+                 "current": self.__GetCurrentIndex() + 1, "your_turn": YourTurn}
+        if YourTurn:
+            State["legal_moves"] = [list(Action) for Action in Game.GenerateLegalMoves()]
+        return State
 
-        :param Position: The position in the queue to replace
-        :param NewMoveOption: The new move option to replace the old one
+    def __Broadcast(self, Message):
         """
-        self.__Queue[Position] = NewMoveOption
+        :param Message: The message to send to both players
+        """
+        for Connection in self._Connections:
+            SendMessage(Connection, Message)
 
-    def MoveItemToBack(self, Position):
+    def Attach(self, PlayerIndex, Connection):
         """
-        It takes the item at the position specified by the user and moves it to the back of the queue
+        It connects a client to their place in the game, when the game starts or when they come back after disconnecting,
+        and tells them the state of the game
 
-        :param Position: The position of the item you want to move to the back of the queue
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Connection: The dictionary for the client's connection
         """
-        Temp = self.__Queue[Position]
-        self.__Queue.pop(Position)
-        self.__Queue.append(Temp)
+        self._Connections[PlayerIndex] = Connection
+        self._DisconnectedAt[PlayerIndex] = None
+        Connection["session"] = self
+        Connection["player"] = PlayerIndex
+        SendMessage(Connection, {"type": "start", "game": self._Number, "player": PlayerIndex + 1,
+                                 "token": self._Tokens[PlayerIndex], "names": self._Names})
+        SendMessage(Connection, self.__GetState(PlayerIndex))
 
-    def GetMoveOptionInPosition(self, Pos):
+    def Detach(self, PlayerIndex, Connection):
         """
-        It returns the move option in the position of the queue
+        It notes that a client has disconnected. Their turns carry on timing out until they come back or the time allowed
+        for coming back runs out
 
-        :param Pos: The position of the move option in the queue
-        :return: The move option in the position specified.
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Connection: The connection that has closed
         """
-        return self.__Queue[Pos]
+        if self._Connections[PlayerIndex] is Connection:
+            self._Connections[PlayerIndex] = None
+            self._DisconnectedAt[PlayerIndex] = asyncio.get_running_loop().time()
 
+    def Release(self):
+        """
+        Once the game is over, it lets its clients' connections be used to join another game
+        """
+        for Connection in self._Connections:
+            if Connection is not None and Connection["session"] is self:
+                Connection["session"] = None
+                Connection["player"] = None
 
-# A player has a name, a direction, a score and a queue of move options
-class Player:
-    def __init__(self, N, D):
+    def SubmitMove(self, PlayerIndex, Turn, Action):
         """
-        The __init__ function initializes the class with the name, direction, and score of the player
+        It passes a client's move to the game
 
-        :param N: Name of the player
-        :param D: The direction the player is facing
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param Turn: The turn number from the state the move was chosen in
+        :param Action: The action, a list of four integers as in GenerateLegalMoves
+        :return: None if the move has been accepted, otherwise the reason it was not.
         """
-        self.__Score = 100
-        self.__Name = N
-        self.__Direction = D
-        self.__Queue = MoveOptionQueue()
+        if self._Game.IsGameOver() or self.__GetCurrentIndex() != PlayerIndex:
+            return "it is not your turn"
+        if Turn != self._Turn:
+            return "the move is for turn " + str(Turn) + " but this is turn " + str(self._Turn)
+        if not isinstance(Action, list) or len(Action) != 4 or not all(isinstance(Value, int) for Value in Action):
+            return "a move is a list of four integers"
+        try:
+            CheckAction(Action)
+        except ValueError as Error:
+            return str(Error)
+        self._Moves[PlayerIndex].put_nowait((Turn, tuple(Action)))
+        return None
 
-    def SameAs(self, APlayer):
+    async def __WaitForClientMove(self, PlayerIndex, MoveTimeout, ReconnectTimeout):
         """
-        If the player is not None and the player's name is the same as the name of the player who called the function,
-        return True, otherwise return False
+        It waits for the current player's move. Moves left in the queue from earlier turns are thrown away
 
-        :param APlayer: The player to compare to
-        :return: The name of the player.
+        :param PlayerIndex: 0 for Player One, 1 for Player Two
+        :param MoveTimeout: The seconds a player has to move
+        :param ReconnectTimeout: The seconds a disconnected player has to come back
+        :return: The action, or None if the player ran out of time.
         """
-        if APlayer is None:
-            return False
-        elif APlayer.GetName() == self.__Name:
-            return True
-        else:
-            return False
+        Loop = asyncio.get_running_loop()
+        Deadline = Loop.time() + MoveTimeout
+        if self._DisconnectedAt[PlayerIndex] is not None:
+            Deadline = min(Deadline, self._DisconnectedAt[PlayerIndex] + ReconnectTimeout)
+        while True:
+            try:
+                Turn, Action = await asyncio.wait_for(self._Moves[PlayerIndex].get(), max(0.0, Deadline - Loop.time()))
+            except asyncio.TimeoutError:
+                return None
+            if Turn == self._Turn:
+                return Action
 
-    def GetPlayerStateAsString(self):
+    async def Run(self, Executor, MoveTimeout, ReconnectTimeout):
         """
-        It returns a string that contains the player's name, score, and the contents of the player's move option queue.
-        :return: The player's name, score, and the queue of moves.
+        It plays the game to the end, telling both players about each move and the new state. If playing it fails, both
+        players are told that the game is over instead of being left waiting for a move that never comes
+
+        :param Executor: The pool of worker processes for the computer players, or None to run them here
+        :param MoveTimeout: The seconds a player has to move before their turn is lost
+        :param ReconnectTimeout: The seconds a disconnected player has to come back before the game is abandoned
         """
-        return self.__Name + "\n" + "Score: " + str(
-            self.__Score) + "\n" + "Move option queue: " + self.__Queue.GetQueueAsString() + "\n"
+        try:
+            await self.__Play(Executor, MoveTimeout, ReconnectTimeout)
+        except Exception as Error:
+            self.__Broadcast({"type": "over", "game": self._Number, "reason": "error", "message": str(Error),
+                              "scores": [P.GetScore() for P in self._Game.GetPlayers()]})
 
-    def AddToMoveOptionQueue(self, NewMoveOption):
+    async def __Play(self, Executor, MoveTimeout, ReconnectTimeout):
         """
-        It adds a new move option to the queue
+        :param Executor: The pool of worker processes for the computer players, or None to run them here
+        :param MoveTimeout: The seconds a player has to move before their turn is lost
+        :param ReconnectTimeout: The seconds a disconnected player has to come back before the game is abandoned
+        """
+        Loop = asyncio.get_running_loop()
+        while not self._Game.IsGameOver():
+            PlayerIndex = self.__GetCurrentIndex()
+            TimedOut = False
+            BotName = self._BotNames[PlayerIndex]
+            if BotName is None:
+                Action = await self.__WaitForClientMove(PlayerIndex, MoveTimeout, ReconnectTimeout)
+                if Action is None:
+                    DisconnectedAt = self._DisconnectedAt[PlayerIndex]
+                    if DisconnectedAt is not None and Loop.time() - DisconnectedAt >= ReconnectTimeout:
+                        self.__Broadcast({"type": "over", "game": self._Number, "reason": "abandoned",
+                                          "abandoned_by": PlayerIndex + 1,
+                                          "scores": [P.GetScore() for P in self._Game.GetPlayers()]})
+                        return
+                    Action = PASS_ACTION
+                    TimedOut = True
+            elif Executor is None or BotName in INLINE_POLICY_NAMES:
+                Action = ChooseBotMove(BotName, self._Random.getrandbits(32), self._Game)
+                await asyncio.sleep(0)
+            else:
+                Action = await Loop.run_in_executor(Executor, ChooseBotMove, BotName, self._Random.getrandbits(32),
+                                                    self._Game.ToBytes())
+            MoveLegal = self._Game.ApplyMove(Action)
+            self._Turn += 1
+            self.__Broadcast({"type": "moved", "game": self._Number, "player": PlayerIndex + 1, "action": list(Action),
+                              "legal": MoveLegal, "timed_out": TimedOut})
+            for Index in range(2):
+                SendMessage(self._Connections[Index], self.__GetState(Index))
+        self.__Broadcast({"type": "over", "game": self._Number, "reason": "finished", "result": self._Game.Result(),
+                          "scores": [P.GetScore() for P in self._Game.GetPlayers()]})
 
-        :param NewMoveOption: The MoveOption object to add to the queue
+
+# A game server for clients on other machines or in other programs. Each client talks to it in JSON, one message per
+# line. A client sends {"type": "join", "name": ..., "opponent": ...} to start a game, where the opponent is "human" to be
+# matched with the next client waiting for a game of the same size, or the name of a computer player. Optional "rows",
+# "columns" and "pieces" set the size of the game, with at most SERVER_MAX_BOARD_SIZE rows and columns. It then sends {"type": "move", "turn": ..., "action": [...]} on its
+# turns, and {"type": "resume", "token": ...} to come back to its game on a new connection after disconnecting. The
+# server sends "waiting", "start", "state", "moved", "over" and "error" messages
+class GameServer:
+    def __init__(self, Host="127.0.0.1", Port=8765, MoveTimeout=30.0, ReconnectTimeout=60.0, BotWorkers=None):
         """
-        self.__Queue.Add(NewMoveOption)
+        :param Host: The address to listen on
+        :param Port: The port to listen on, or 0 for any free port
+        :param MoveTimeout: The seconds a player has to move before their turn is lost
+        :param ReconnectTimeout: The seconds a disconnected player has to come back before the game is abandoned
+        :param BotWorkers: The number of worker processes for the computer players that are slow to move, None for one
+        per CPU, or 0 to run them in the server's own process
+        """
+        self._Host = Host
+        self._Port = Port
+        self._MoveTimeout = MoveTimeout
+        self._ReconnectTimeout = ReconnectTimeout
+        self._BotWorkers = BotWorkers
+        self._Executor = None
+        self._Server = None
+        self._Waiting = {}
+        self._Sessions = {}
+        self._Tasks = set()
+        self._ConnectionTasks = {}
+        self._NoOfGames = 0
 
-    def UpdateQueueAfterMove(self, Position):
+    async def Start(self):
         """
-        It moves the item at the given position to the back of the queue
+        It starts listening for clients
+        """
+        if self._BotWorkers != 0:
+            self._Executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._BotWorkers)
+        self._Server = await asyncio.start_server(self.__HandleConnection, self._Host, self._Port)
 
-        :param Position: The position of the item in the queue
+    def GetPort(self):
         """
-        self.__Queue.MoveItemToBack(Position - 1)
+        It returns the port the server is listening on, which is useful when it was started on port 0
+        :return: The port number.
+        """
+        return self._Server.sockets[0].getsockname()[1]
 
-    def UpdateMoveOptionQueueWithOffer(self, Position, NewMoveOption):
+    def GetNoOfSessions(self):
         """
-        It replaces the MoveOption at the given position in the queue with the given MoveOption
+        It returns the number of games being played
+        :return: The number of games.
+        """
+        return len(self._Tasks)
 
-        :param Position: The position in the queue to replace
-        :param NewMoveOption: This is the new move option that will be added to the queue
+    async def ServeForever(self):
         """
-        self.__Queue.Replace(Position, NewMoveOption)
+        It starts the server if it has not been started and serves clients until it is cancelled
+        """
+        if self._Server is None:
+            await self.Start()
+        try:
+            await self._Server.serve_forever()
+        finally:
+            await self.Close()
 
-    def GetScore(self):
+    async def Close(self):
         """
-        The function GetScore() returns the value of the private variable __Score
-        :return: The score of the player.
+        It stops listening, disconnects the clients, stops the games being played and shuts down the worker processes
         """
-        return self.__Score
+        if self._Server is not None:
+            self._Server.close()
+        for Connection in list(self._ConnectionTasks.values()):
+            Connection["writer"].close()
+        if self._ConnectionTasks:
+            await asyncio.gather(*self._ConnectionTasks, return_exceptions=True)
+        if self._Server is not None:
+            await self._Server.wait_closed()
+        for Task in list(self._Tasks):
+            Task.cancel()
+        if self._Tasks:
+            await asyncio.gather(*self._Tasks, return_exceptions=True)
+        if self._Executor is not None:
+            self._Executor.shutdown()
 
-    def GetName(self):
+    def __StartSession(self, Game, Names, BotNames, Connections):
         """
-        The function GetName() returns the value of the private variable __Name
-        :return: The name of the person.
+        It sets up a game session, connects its clients and starts playing it
+
+        :param Game: The Dastan game
+        :param Names: The names of Player One and Player Two
+        :param BotNames: For each player the name of the computer player, or None for a client
+        :param Connections: For each player the client's connection, or None
         """
-        return self.__Name
+        self._NoOfGames += 1
+        Session = GameSession(self._NoOfGames, Game, Names, BotNames, Connections)
+        for Index in range(2):
+            if Session.GetTokens()[Index] is not None:
+                self._Sessions[Session.GetTokens()[Index]] = (Session, Index)
+                Session.Attach(Index, Connections[Index])
+        Task = asyncio.ensure_future(self.__RunSession(Session))
+        self._Tasks.add(Task)
+        Task.add_done_callback(self._Tasks.discard)
 
-    def GetDirection(self):
+    async def __RunSession(self, Session):
         """
-        It returns the direction of the robot.
-        :return: The direction of the car.
+        It plays a game session and forgets its tokens once it is over
+
+        :param Session: The GameSession
         """
-        return self.__Direction
+        try:
+            await Session.Run(self._Executor, self._MoveTimeout, self._ReconnectTimeout)
+        finally:
+            Session.Release()
+            for Token in Session.GetTokens():
+                self._Sessions.pop(Token, None)
 
-    def ChangeScore(self, Amount):
+    def __Join(self, Connection, Message):
         """
-        The function ChangeScore() takes in a parameter called Amount, and adds it to the variable Score
+        It starts a game against a computer player, or matches the client with another client waiting for a game of the
+        same size
 
-        :param Amount: The amount to change the score by
+        :param Connection: The dictionary for the client's connection
+        :param Message: The join message
         """
-        self.__Score += Amount
+        Size = (Message.get("rows", 6), Message.get("columns", 6), Message.get("pieces", 4))
+        Opponent = Message.get("opponent", "human")
+        Name = str(Message.get("name", "Player"))
+        if Opponent != "human" and Opponent not in POLICY_NAMES:
+            SendMessage(Connection, {"type": "error", "message": "unknown opponent: " + str(Opponent)})
+            return
+        if not all(isinstance(Value, int) and not isinstance(Value, bool) for Value in Size):
+            SendMessage(Connection, {"type": "error", "message": "rows, columns and pieces must be integers"})
+            return
+        if Size[0] > SERVER_MAX_BOARD_SIZE or Size[1] > SERVER_MAX_BOARD_SIZE:
+            SendMessage(Connection, {"type": "error", "message": "a board can have at most " + str(
+                SERVER_MAX_BOARD_SIZE) + " rows and " + str(SERVER_MAX_BOARD_SIZE) + " columns"})
+            return
+        try:
+            Game = Dastan(*Size)
+        except ValueError as Error:
+            SendMessage(Connection, {"type": "error", "message": str(Error)})
+            return
+        if Opponent != "human":
+            self.__StartSession(Game, [Name, Opponent], [None, Opponent], [Connection, None])
+            return
+        Waiting = self._Waiting.pop(Size, None)
+        if Waiting is None or Waiting[0]["writer"].is_closing():
+            self._Waiting[Size] = (Connection, Name)
+            Connection["waiting"] = Size
+            SendMessage(Connection, {"type": "waiting"})
+            return
+        WaitingConnection, WaitingName = Waiting
+        WaitingConnection["waiting"] = None
+        self.__StartSession(Game, [WaitingName, Name], [None, None], [WaitingConnection, Connection])
 
-    def CheckPlayerMove(self, Pos, StartSquareReference, FinishSquareReference):
+    def __HandleMessage(self, Connection, Message):
         """
-        It checks if there is a move from StartSquareReference to FinishSquareReference in the position Pos
+        It acts on one message from a client
 
-        :param Pos: The position of the move in the queue
-        :param StartSquareReference: The reference of the square the player wants to move from
-        :param FinishSquareReference: The square that the player wants to move to
-        :return: A boolean value.
+        :param Connection: The dictionary for the client's connection
+        :param Message: The message
         """
-        Temp = self.__Queue.GetMoveOptionInPosition(Pos - 1)
-        return Temp.CheckIfThereIsAMoveToSquare(StartSquareReference, FinishSquareReference)
+        Type = Message.get("type") if isinstance(Message, dict) else None
+        if Type == "join":
+            if Connection["session"] is not None or Connection["waiting"] is not None:
+                SendMessage(Connection, {"type": "error", "message": "you are already in a game"})
+            else:
+                self.__Join(Connection, Message)
+        elif Type == "move":
+            if Connection["session"] is None:
+                SendMessage(Connection, {"type": "error", "message": "you are not in a game"})
+            else:
+                Problem = Connection["session"].SubmitMove(Connection["player"], Message.get("turn"),
+                                                           Message.get("action"))
+                if Problem is not None:
+                    SendMessage(Connection, {"type": "error", "message": Problem})
+        elif Type == "resume":
+            Place = self._Sessions.get(Message.get("token"))
+            if Place is None:
+                SendMessage(Connection, {"type": "error", "message": "there is no game for that token"})
+            else:
+                Place[0].Attach(Place[1], Connection)
+        else:
+            SendMessage(Connection, {"type": "error", "message": "unknown message type: " + str(Type)})
+
+    async def __HandleConnection(self, Reader, Writer):
+        """
+        It reads the messages from one client until it disconnects
+
+        :param Reader: The stream to read from
+        :param Writer: The stream to write to
+        """
+        Connection = {"writer": Writer, "session": None, "player": None, "waiting": None}
+        Task = asyncio.current_task()
+        self._ConnectionTasks[Task] = Connection
+        try:
+            while True:
+                Line = await Reader.readline()
+                if not Line:
+                    break
+                try:
+                    Message = json.loads(Line)
+                except ValueError:
+                    SendMessage(Connection, {"type": "error", "message": "messages must be JSON"})
+                    continue
+                self.__HandleMessage(Connection, Message)
+                await Writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            if Connection["waiting"] is not None and self._Waiting.get(Connection["waiting"], (None,))[0] is Connection:
+                del self._Waiting[Connection["waiting"]]
+            if Connection["session"] is not None:
+                Connection["session"].Detach(Connection["player"], Connection)
+            del self._ConnectionTasks[Task]
+            Writer.close()
+
+
+def Percentile(SortedValues, Fraction):
+    """
+    :param SortedValues: A sorted list of numbers, not empty
+    :param Fraction: The fraction of the way through the list, 0.5 for the median
+    :return: The value at that fraction of the way through the list.
+    """
+    return SortedValues[min(len(SortedValues) - 1, int(Fraction * len(SortedValues)))]
+
+
+async def RunLoadTestClient(Host, Port, Opponent, NoOfGames, Seed, Latencies):
+    """
+    It plays games on a game server as one client, choosing random legal moves, and times each move from sending it to
+    hearing that it has been made
+
+    :param Host: The address of the server
+    :param Port: The port of the server
+    :param Opponent: The opponent to ask for in the join message
+    :param NoOfGames: The number of games to play one after another
+    :param Seed: The seed for choosing the moves
+    :param Latencies: The list to add the round trip times, in seconds, to
+    :return: The number of games that were finished.
+    """
+    Generator = random.Random(Seed)
+    Reader, Writer = await asyncio.open_connection(Host, Port)
+    Finished = 0
+    try:
+        for Count in range(NoOfGames):
+            Writer.write((json.dumps({"type": "join", "name": "load test", "opponent": Opponent}) + "\n").encode())
+            await Writer.drain()
+            PlayerNumber = None
+            SentAt = None
+            while True:
+                Line = await Reader.readline()
+                if not Line:
+                    return Finished
+                Message = json.loads(Line)
+                if Message["type"] == "start":
+                    PlayerNumber = Message["player"]
+                elif Message["type"] == "state" and Message["your_turn"]:
+                    Action = Generator.choice(Message["legal_moves"]) if Message["legal_moves"] else list(PASS_ACTION)
+                    SentAt = time.perf_counter()
+                    Writer.write((json.dumps({"type": "move", "turn": Message["turn"], "action": Action}) +
+                                  "\n").encode())
+                    await Writer.drain()
+                elif Message["type"] == "moved" and Message["player"] == PlayerNumber and SentAt is not None:
+                    Latencies.append(time.perf_counter() - SentAt)
+                    SentAt = None
+                elif Message["type"] == "over":
+                    Finished += 1
+                    break
+                elif Message["type"] == "error":
+                    raise RuntimeError(Message["message"])
+    finally:
+        Writer.close()
+    return Finished
+
+
+async def RunLoadTest(Host, Port, NoOfConnections, GamesPerConnection=1, Opponent="random", Seed=0):
+    """
+    It opens many connections to a game server at once, plays games on all of them and works out the spread of the move
+    round trip times
+
+    :param Host: The address of the server
+    :param Port: The port of the server
+    :param NoOfConnections: The number of clients
+    :param GamesPerConnection: The number of games each client plays
+    :param Opponent: The opponent each client asks for; with "human" the clients are matched with each other
+    :param Seed: The seed for choosing the moves
+    :return: A dictionary of the numbers of games and moves, the time taken and the latency percentiles in milliseconds.
+    """
+    Latencies = []
+    StartTime = time.perf_counter()
+    Finished = await asyncio.gather(*[RunLoadTestClient(Host, Port, Opponent, GamesPerConnection, Seed + Count,
+                                                        Latencies) for Count in range(NoOfConnections)])
+    Results = {"connections": NoOfConnections, "games": sum(Finished), "moves": len(Latencies),
+               "seconds": time.perf_counter() - StartTime}
+    SortedLatencies = sorted(Latencies)
+    for Name, Fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)):
+        Results[Name + "_ms"] = 1000 * Percentile(SortedLatencies, Fraction) if SortedLatencies else 0.0
+    return Results
+
+
+def DisplayLoadTestResults(Results):
+    """
+    It prints the results of a load test
+
+    :param Results: The dictionary returned by RunLoadTest
+    """
+    print("Connections: " + str(Results["connections"]))
+    print("Games finished: " + str(Results["games"]))
+    print("Moves: " + str(Results["moves"]) + " in " + str(round(Results["seconds"], 2)) + " seconds")
+    print("Move round trip (ms): p50 " + str(round(Results["p50_ms"], 2)) + ", p90 " + str(
+        round(Results["p90_ms"], 2)) + ", p99 " + str(round(Results["p99_ms"], 2)) + ", max " + str(
+        round(Results["max_ms"], 2)))
 
 
 def Main():
     """
-    It creates a new game, plays it, and then prints "Goodbye!" and waits for the user to press enter
+    With no command it creates a new game, of 6 rows, 6 columns and 4 pieces each unless --rows, --columns and --pieces
+    say otherwise, plays it, and then prints "Goodbye!" and waits for the user to press enter. --display and
+    --display-every set the display policy, --record adds the game to a game record file and --profile adds its timings
+    and counts to a JSON lines file. The simulate command plays
+    many games between computer players instead. The serve command runs a game server for clients that connect over TCP,
+    and the loadtest command plays many games on a game server at once to measure how quickly it answers. --script plays
+    the game from a file of answers instead of the keyboard, and the transcripts command records golden transcripts of
+    games or checks that the game still plays them in the same way. The perft command counts the positions reachable
+    from the start, to check and time move generation, and the tablebase command solves the endgames of a small board
+    and saves them in a file for simulate --tablebase. The compare command plays random games on the bitboard and the
+    batched engines alongside the object board, failing if they ever disagree or if the MCTS search always sees the
+    same offers
     """
-    ThisGame = Dastan(6, 6, 4)
-    ThisGame.PlayGame()
+    Parser = argparse.ArgumentParser(description="Dastan")
+    Parser.add_argument("--rows", type=int, default=6)
+    Parser.add_argument("--columns", type=int, default=6)
+    Parser.add_argument("--pieces", type=int, default=4)
+    Parser.add_argument("--display", choices=DISPLAY_POLICIES, default="always")
+    Parser.add_argument("--display-every", type=int, default=1)
+    Parser.add_argument("--record", help="a game record file to add the game to")
+    Parser.add_argument("--profile", help="a JSON lines file to add the game's timings and counts to")
+    Parser.add_argument("--script", help="a file of answers, one per line, to play the game from")
+    Commands = Parser.add_subparsers(dest="Command")
+    Simulate = Commands.add_parser("simulate", help="play many games between computer players")
+    Simulate.add_argument("--games", type=int, default=1000)
+    Simulate.add_argument("--rows", type=int, default=6)
+    Simulate.add_argument("--columns", type=int, default=6)
+    Simulate.add_argument("--pieces", type=int, default=4)
+    Simulate.add_argument("--player-one", choices=POLICY_NAMES, default="random")
+    Simulate.add_argument("--player-two", choices=POLICY_NAMES, default="random")
+    Simulate.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    Simulate.add_argument("--seed", type=int, default=0)
+    Simulate.add_argument("--max-turns", type=int, default=500)
+    Simulate.add_argument("--record", help="a game record file to add the games to")
+    Simulate.add_argument("--profile", help="a JSON lines file to add each game's timings and counts to")
+    Simulate.add_argument("--tablebase", help="an endgame tablebase for both players to play from when they can")
+    Simulate.add_argument("--mcts-workers", type=int, default=1,
+                          help="the worker processes for each Monte Carlo player's search")
+    Serve = Commands.add_parser("serve", help="run a game server")
+    Serve.add_argument("--host", default="127.0.0.1")
+    Serve.add_argument("--port", type=int, default=8765)
+    Serve.add_argument("--move-timeout", type=float, default=30.0)
+    Serve.add_argument("--reconnect-timeout", type=float, default=60.0)
+    Serve.add_argument("--bot-workers", type=int, default=None)
+    LoadTest = Commands.add_parser("loadtest", help="measure how quickly a game server answers many clients")
+    LoadTest.add_argument("--host", default="127.0.0.1")
+    LoadTest.add_argument("--port", type=int, default=8765)
+    LoadTest.add_argument("--connections", type=int, default=100)
+    LoadTest.add_argument("--games", type=int, default=1, help="the number of games each connection plays")
+    LoadTest.add_argument("--opponent", choices=("human",) + POLICY_NAMES, default="random")
+    LoadTest.add_argument("--seed", type=int, default=0)
+    Transcripts = Commands.add_parser("transcripts", help="record or check golden transcripts of games")
+    Transcripts.add_argument("action", choices=("record", "check"))
+    Transcripts.add_argument("file", help="a JSON lines file of transcripts")
+    Transcripts.add_argument("--games", type=int, default=100)
+    Transcripts.add_argument("--rows", type=int, default=6)
+    Transcripts.add_argument("--columns", type=int, default=6)
+    Transcripts.add_argument("--pieces", type=int, default=4)
+    Transcripts.add_argument("--player-one", choices=POLICY_NAMES, default="random")
+    Transcripts.add_argument("--player-two", choices=POLICY_NAMES, default="random")
+    Transcripts.add_argument("--seed", type=int, default=0)
+    Transcripts.add_argument("--max-turns", type=int, default=500)
+    Transcripts.add_argument("--display", choices=DISPLAY_POLICIES, default="always")
+    Transcripts.add_argument("--display-every", type=int, default=1)
+    PerftCommand = Commands.add_parser("perft", help="count the positions reachable from the start")
+    PerftCommand.add_argument("depth", type=int, nargs="?", default=2)
+    PerftCommand.add_argument("--rows", type=int, default=6)
+    PerftCommand.add_argument("--columns", type=int, default=6)
+    PerftCommand.add_argument("--pieces", type=int, default=4)
+    PerftCommand.add_argument("--seed", type=int, default=0)
+    PerftCommand.add_argument("--enumerate-offers", action="store_true",
+                              help="follow all five offers after the offer is taken instead of a random one")
+    PerftCommand.add_argument("--engine", choices=PERFT_ENGINES, default="object")
+    PerftCommand.add_argument("--divide", action="store_true", help="show the count after each first action")
+    PerftCommand.add_argument("--check", action="store_true",
+                              help="compare the golden counts up to the depth instead, failing if any differ")
+    Tablebase = Commands.add_parser("tablebase", help="solve the endgames of a small board and save them")
+    Tablebase.add_argument("file", help="the file to save the tablebase in")
+    Tablebase.add_argument("--rows", type=int, default=4)
+    Tablebase.add_argument("--columns", type=int, default=2)
+    Tablebase.add_argument("--pieces-one", type=int, default=0, help="the most pieces Player One can have")
+    Tablebase.add_argument("--pieces-two", type=int, default=0, help="the most pieces Player Two can have")
+    Tablebase.add_argument("--options-one", nargs=5, choices=MOVE_OPTION_NAMES, default=MOVE_OPTION_NAMES,
+                           help="the five move options in Player One's queue")
+    Tablebase.add_argument("--options-two", nargs=5, choices=MOVE_OPTION_NAMES, default=MOVE_OPTION_NAMES,
+                           help="the five move options in Player Two's queue")
+    Compare = Commands.add_parser("compare", help="check the other engines against the object board")
+    Compare.add_argument("--games", type=int, default=20)
+    Compare.add_argument("--rows", type=int, default=6)
+    Compare.add_argument("--columns", type=int, default=6)
+    Compare.add_argument("--pieces", type=int, default=4)
+    Compare.add_argument("--seed", type=int, default=0)
+    Compare.add_argument("--max-turns", type=int, default=200)
+    Arguments = Parser.parse_args()
+    if Arguments.Command == "compare":
+        Difference = CompareBitboardWithObjectBoard(Arguments.rows, Arguments.columns, Arguments.pieces,
+                                                    Arguments.games, Arguments.seed, Arguments.max_turns)
+        if Difference is None:
+            print("Bitboard: agrees")
+        else:
+            print("Bitboard: differs, " + DescribeEngineDifference(Difference))
+        Agreed = Difference is None
+        if np is None:
+            print("Batched: not checked, as NumPy is not installed")
+        else:
+            Difference = CompareBatchedWithObjectBoard(Arguments.rows, Arguments.columns, Arguments.pieces,
+                                                       Arguments.games, Arguments.max_turns, Arguments.seed)
+            if Difference is None:
+                print("Batched: agrees")
+            else:
+                print("Batched: differs, " + DescribeEngineDifference(Difference))
+            Agreed = Agreed and Difference is None
+        OfferPositions = CheckMCTSOfferSampling(Arguments.rows, Arguments.columns, Arguments.pieces, Seed=Arguments.seed)
+        if OfferPositions is None:
+            print("MCTS offers: sampled")
+        elif OfferPositions:
+            print("MCTS offers: repeated, every iteration saw offer position " + str(OfferPositions[0]))
+        else:
+            print("MCTS offers: no iteration took the offer")
+        Agreed = Agreed and OfferPositions is None
+        if not Agreed:
+            sys.exit(1)
+        return
+    if Arguments.Command == "tablebase":
+        Stats = GenerateEndgameTablebase(Arguments.file, Arguments.rows, Arguments.columns,
+                                         (Arguments.pieces_one, Arguments.pieces_two),
+                                         (Arguments.options_one, Arguments.options_two))
+        print("Positions: " + str(Stats["positions"]))
+        print("Wins: " + str(Stats["wins"]) + ", losses: " + str(Stats["losses"]) + ", draws: " + str(Stats["draws"]))
+        print("Seconds: " + str(round(Stats["seconds"], 2)))
+        return
+    if Arguments.Command == "perft":
+        if Arguments.check:
+            Differences = CheckPerftGolden(Arguments.depth, Arguments.engine)
+            for R, C, NoOfPieces, Seed, Depth, Expected, Actual in Differences:
+                print(str(R) + "x" + str(C) + " with " + str(NoOfPieces) + " pieces, seed " + str(Seed) + ", depth " + str(
+                    Depth) + ": expected " + str(Expected) + " but got " + str(Actual))
+            if Differences:
+                sys.exit(1)
+            print("All golden counts match")
+            return
+        Results = RunPerft(Arguments.rows, Arguments.columns, Arguments.pieces, Arguments.depth, Arguments.seed,
+                           Arguments.enumerate_offers, Arguments.engine, Arguments.divide)
+        if Arguments.divide:
+            for Action, Nodes in sorted(Results["divide"].items()):
+                print(str(Action) + ": " + str(Nodes))
+        print("Nodes: " + str(Results["nodes"]))
+        print("Seconds: " + str(round(Results["seconds"], 3)))
+        print("Nodes per second: " + str(round(Results["nodes_per_second"])))
+        return
+    if Arguments.Command == "transcripts":
+        if Arguments.action == "record":
+            RecordTranscripts(Arguments.file, Arguments.games, (Arguments.player_one, Arguments.player_two),
+                              Arguments.rows, Arguments.columns, Arguments.pieces, Arguments.seed, Arguments.max_turns,
+                              Arguments.display, Arguments.display_every)
+            return
+        Differences = CheckTranscripts(Arguments.file)
+        for TranscriptNumber, LineNumber, Expected, Actual in Differences:
+            print("Transcript " + str(TranscriptNumber) + ", line " + str(LineNumber) + ": expected " + repr(
+                Expected) + " but got " + repr(Actual))
+        if Differences:
+            sys.exit(1)
+        return
+    if Arguments.Command == "serve":
+        Server = GameServer(Arguments.host, Arguments.port, Arguments.move_timeout, Arguments.reconnect_timeout,
+                            Arguments.bot_workers)
+        try:
+            asyncio.run(Server.ServeForever())
+        except KeyboardInterrupt:
+            pass
+        return
+    if Arguments.Command == "loadtest":
+        DisplayLoadTestResults(asyncio.run(RunLoadTest(Arguments.host, Arguments.port, Arguments.connections,
+                                                       Arguments.games, Arguments.opponent, Arguments.seed)))
+        return
+    if Arguments.Command == "simulate":
+        DisplaySimulationResults(RunSimulation(Arguments.games, (Arguments.player_one, Arguments.player_two),
+                                               Arguments.rows, Arguments.columns, Arguments.pieces, Arguments.workers,
+                                               Arguments.seed, Arguments.max_turns, Arguments.record,
+                                               Arguments.profile, Arguments.tablebase, Arguments.mcts_workers))
+        return
+    ThisGame = Dastan(Arguments.rows, Arguments.columns, Arguments.pieces)
+    ThisGame.SetDisplayPolicy(Arguments.display, Arguments.display_every)
+    if Arguments.profile is not None:
+        ThisGame.SetProfiler(GameProfiler())
+    if Arguments.script is not None:
+        with open(Arguments.script) as ScriptFile:
+            ThisGame.SetInputSource(ScriptedInput(ScriptFile))
+            try:
+                ThisGame.PlayGame()
+            except EOFError:
+                pass
+    else:
+        ThisGame.PlayGame()
+    if Arguments.profile is not None:
+        with open(Arguments.profile, "a") as ProfileFile:
+            ProfileFile.write(ThisGame.GetProfiler().GetJSONLine(seed=ThisGame.GetSeed()))
+    if Arguments.record is not None:
+        with GameRecordWriter(Arguments.record, Arguments.rows, Arguments.columns, Arguments.pieces) as Writer:
+            Writer.WriteGame(ThisGame)
     print("Goodbye!")
-    input()
+    if Arguments.script is None:
+        input()
 
 
 #
@@ -0,0 +1,324 @@
+# Benchmarks for the Dastan game in Paper1_ALvl_2023_Python3_Pub_0.0.0.py. They time the engine through its public
+# methods and the hooks it keeps for the tests, and compare the results with a baseline saved from an earlier run
+
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# The game program. Its file name is not a valid module name, so it is loaded from its path rather than imported
+GAME_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Paper1_ALvl_2023_Python3_Pub_0.0.0.py")
+
+
+def LoadGame(FileName=GAME_FILE):
+    """
+    It loads the game program as the module dastan, unless it has been loaded already, so that worker processes and
+    pickles can find it by that name
+
+    :param FileName: The name of the game program's file
+    :return: The module.
+    """
+    if "dastan" in sys.modules:
+        return sys.modules["dastan"]
+    Spec = importlib.util.spec_from_file_location("dastan", FileName)
+    Module = importlib.util.module_from_spec(Spec)
+    sys.modules["dastan"] = Module
+    Spec.loader.exec_module(Module)
+    return Module
+
+
+dastan = LoadGame()
+
+
+def CreateBenchmarkGame(R=6, C=6, NoOfPieces=4, NoOfTurns=10):
+    """
+    It makes a game for the benchmarks to time, a few random turns in so that it is not just the starting position
+
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :param NoOfTurns: The number of random turns to play first
+    :return: The Dastan game.
+    """
+    Game = dastan.Dastan(R, C, NoOfPieces, 0)
+    Policy = dastan.RandomPolicy(0)
+    for Turn in range(NoOfTurns):
+        if Game.IsGameOver():
+            break
+        Game.ApplyMove(Policy.ChooseMove(Game))
+    return Game
+
+
+# Each benchmark sets up what it needs and returns an operation with no arguments for TimeBenchmark to call over and
+# over, along with how many operations one call does
+def SetUpCheckSquareIsValidBenchmark():
+    Game = CreateBenchmarkGame()
+    References = [Game.GetSquareReference(Row, Column) for Row in range(0, 8) for Column in range(0, 8)]
+    CheckSquareIsValid = Game.CheckSquareIsValid
+
+    def Operation():
+        for SquareReference in References:
+            CheckSquareIsValid(SquareReference, True)
+            CheckSquareIsValid(SquareReference, False)
+
+    return Operation, 2 * len(References)
+
+
+def SetUpCheckPlayerMoveBenchmark():
+    Game = CreateBenchmarkGame()
+    CurrentPlayer = Game.GetCurrentPlayer()
+    ReferenceBase = Game.GetReferenceBase()
+    Moves = [(Choice, Game.GetSquareReference(3, 3), Game.GetSquareReference(Row, Column)) for Choice in range(1, 4) for
+             Row in range(1, 7) for Column in range(1, 7)]
+
+    def Operation():
+        for Choice, StartSquareReference, FinishSquareReference in Moves:
+            CurrentPlayer.CheckPlayerMove(Choice, StartSquareReference, FinishSquareReference, ReferenceBase)
+
+    return Operation, len(Moves)
+
+
+def SetUpCheckIfThereIsAMoveToSquareBenchmark():
+    Game = CreateBenchmarkGame()
+    ReferenceBase = Game.GetReferenceBase()
+    MoveOptions = [dastan.MOVE_OPTION_CATALOG[(Name, 1)] for Name in dastan.MOVE_OPTION_NAMES]
+    Start = Game.GetSquareReference(3, 3)
+    Finishes = [Game.GetSquareReference(Row, Column) for Row in range(1, 7) for Column in range(1, 7)]
+
+    def Operation():
+        for AMoveOption in MoveOptions:
+            for FinishSquareReference in Finishes:
+                AMoveOption.CheckIfThereIsAMoveToSquare(Start, FinishSquareReference, ReferenceBase)
+
+    return Operation, len(MoveOptions) * len(Finishes)
+
+
+def SetUpPointsForOccupancyBenchmark():
+    Game = CreateBenchmarkGame()
+    CurrentPlayer = Game.GetCurrentPlayer()
+    return lambda: Game.GetPointsForOccupancy(CurrentPlayer), 1
+
+
+def SetUpUncachedPointsForOccupancyBenchmark():
+    Game = CreateBenchmarkGame()
+    CurrentPlayer = Game.GetCurrentPlayer()
+
+    def Operation():
+        Game.ForgetPointsForOccupancy()
+        Game.GetPointsForOccupancy(CurrentPlayer)
+
+    return Operation, 1
+
+
+def SetUpAttackQueriesBenchmark():
+    Game = CreateBenchmarkGame()
+    Players = Game.GetPlayers()
+
+    def Operation():
+        for APlayer in Players:
+            Game.IsMirzaThreatened(APlayer, True)
+            Game.GetKotlaEntries(APlayer, True)
+            Game.GetAttackedSquares(APlayer, True)
+
+    return Operation, 3 * len(Players)
+
+
+def SetUpCreateMoveOptionBenchmark():
+    Game = CreateBenchmarkGame()
+
+    def Operation():
+        for Name in dastan.MOVE_OPTION_NAMES:
+            Game.CreateMoveOption(Name, 1)
+            Game.CreateMoveOption(Name, -1)
+
+    return Operation, 2 * len(dastan.MOVE_OPTION_NAMES)
+
+
+def SetUpMakeUnmakeMoveBenchmark():
+    Game = CreateBenchmarkGame()
+    LegalMoves = Game.GenerateLegalMoves()
+
+    def Operation():
+        for Action in LegalMoves:
+            Game.MakeMove(Action, 0)
+            Game.UnmakeMove()
+
+    return Operation, len(LegalMoves)
+
+
+def SetUpPerftBenchmark(Engine):
+    """
+    :param Engine: One of PERFT_ENGINES
+    :return: An operation that runs perft to depth 2 from the starting position of the 6x6 game with seed 0.
+    """
+    def Operation():
+        dastan.RunPerft(6, 6, 4, 2, 0, False, Engine)
+
+    return Operation, dastan.PERFT_GOLDEN[(6, 6, 4, 0)][1]
+
+
+def SetUpRandomGameBenchmark(R, C, NoOfPieces):
+    """
+    :param R: Number of rows
+    :param C: The number of columns in the board
+    :param NoOfPieces: The number of pieces each player has
+    :return: An operation that plays the same eight whole random games every time, so that the repeats and the runs
+    being compared do the same work.
+    """
+    def Operation():
+        for Seed in range(8):
+            dastan.PlayHeadlessGame(dastan.Dastan(R, C, NoOfPieces, Seed),
+                                    [dastan.RandomPolicy(Seed * 2), dastan.RandomPolicy(Seed * 2 + 1)], 500)
+
+    return Operation, 8
+
+
+BENCHMARKS = {
+    "check_square_is_valid": SetUpCheckSquareIsValidBenchmark,
+    "check_player_move": SetUpCheckPlayerMoveBenchmark,
+    "check_if_there_is_a_move_to_square": SetUpCheckIfThereIsAMoveToSquareBenchmark,
+    "check_if_game_over": lambda: (CreateBenchmarkGame().CheckIfGameOver, 1),
+    "points_for_occupancy": SetUpPointsForOccupancyBenchmark,
+    "points_for_occupancy_uncached": SetUpUncachedPointsForOccupancyBenchmark,
+    "attack_queries": SetUpAttackQueriesBenchmark,
+    "attack_maps_from_scratch": lambda: (CreateBenchmarkGame().CalculateAttackMaps, 1),
+    "create_move_option": SetUpCreateMoveOptionBenchmark,
+    "create_move_option_catalog": lambda: (dastan.CreateMoveOptionCatalog, 1),
+    "generate_legal_moves": lambda: (CreateBenchmarkGame().GenerateLegalMoves, 1),
+    "make_unmake_move": SetUpMakeUnmakeMoveBenchmark,
+    "perft_6x6": lambda: SetUpPerftBenchmark("object"),
+    "perft_6x6_bitboard": lambda: SetUpPerftBenchmark("bitboard"),
+    "random_game_6x6": lambda: SetUpRandomGameBenchmark(6, 6, 4),
+    "random_game_9x9": lambda: SetUpRandomGameBenchmark(9, 9, 6),
+    "random_game_20x20": lambda: SetUpRandomGameBenchmark(20, 20, 12),
+}
+
+
+def TimeBenchmark(Operation, OpsPerCall=1, Repeats=5, MinSeconds=0.2):
+    """
+    It times an operation. The number of calls in each repeat is first raised until a repeat takes at least MinSeconds,
+    then every repeat is timed on its own so that the variance between them can be reported
+
+    :param Operation: The operation to time, with no arguments
+    :param OpsPerCall: How many operations one call of Operation does
+    :param Repeats: The number of timed repeats
+    :param MinSeconds: The shortest time a repeat should take
+    :return: A dictionary of the operations per second of each repeat, their mean, standard deviation and the number of
+    calls in a repeat.
+    """
+    Calls = 1
+    while True:
+        StartTime = time.perf_counter()
+        for Count in range(Calls):
+            Operation()
+        Seconds = time.perf_counter() - StartTime
+        if Seconds >= MinSeconds:
+            break
+        Calls *= 2 if Seconds <= 0 else max(2, min(10, int(MinSeconds / Seconds) + 1))
+    OpsPerSecond = []
+    for Repeat in range(Repeats):
+        StartTime = time.perf_counter()
+        for Count in range(Calls):
+            Operation()
+        OpsPerSecond.append(Calls * OpsPerCall / (time.perf_counter() - StartTime))
+    return {"ops_per_second": statistics.mean(OpsPerSecond),
+            "stdev": statistics.stdev(OpsPerSecond) if Repeats > 1 else 0.0,
+            "repeats": OpsPerSecond, "calls_per_repeat": Calls}
+
+
+def RunBenchmarks(Names=None, Repeats=5, MinSeconds=0.2):
+    """
+    It runs the benchmarks and puts the results in a form that can be saved as JSON and compared with another run
+
+    :param Names: The names of the benchmarks to run, or None for all of them
+    :param Repeats: The number of timed repeats of each benchmark
+    :param MinSeconds: The shortest time a repeat should take
+    :return: A dictionary of the results and the machine they were measured on.
+    """
+    if Names is None:
+        Names = list(BENCHMARKS)
+    Results = {"python": platform.python_version(), "implementation": platform.python_implementation(),
+               "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "benchmarks": {}}
+    for Name in Names:
+        if Name not in BENCHMARKS:
+            raise ValueError("unknown benchmark: " + Name)
+        Operation, OpsPerCall = BENCHMARKS[Name]()
+        Results["benchmarks"][Name] = TimeBenchmark(Operation, OpsPerCall, Repeats, MinSeconds)
+    return Results
+
+
+def FindRegressions(Results, Baseline, Threshold=0.1):
+    """
+    It compares benchmark results with a baseline. A benchmark has regressed if its operations per second have fallen by
+    more than the threshold; benchmarks in only one of the two are ignored
+
+    :param Results: The results from RunBenchmarks
+    :param Baseline: Earlier results from RunBenchmarks
+    :param Threshold: The fraction the speed may fall by, 0.1 for 10%
+    :return: A list of tuples (Name, BaselineOpsPerSecond, OpsPerSecond) for the benchmarks that have regressed.
+    """
+    Regressions = []
+    for Name, Result in Results["benchmarks"].items():
+        if Name in Baseline["benchmarks"]:
+            BaselineOpsPerSecond = Baseline["benchmarks"][Name]["ops_per_second"]
+            if Result["ops_per_second"] < BaselineOpsPerSecond * (1 - Threshold):
+                Regressions.append((Name, BaselineOpsPerSecond, Result["ops_per_second"]))
+    return Regressions
+
+
+def DisplayBenchmarkResults(Results, Baseline=None):
+    """
+    It prints the operations per second of each benchmark with its standard deviation, and the change from the baseline
+    if there is one
+
+    :param Results: The results from RunBenchmarks
+    :param Baseline: Earlier results from RunBenchmarks, or None
+    """
+    for Name, Result in Results["benchmarks"].items():
+        Line = Name.ljust(36) + str(round(Result["ops_per_second"], 1)).rjust(14) + " ops/s +/- " + str(
+            round(100 * Result["stdev"] / Result["ops_per_second"], 1)) + "%"
+        if Baseline is not None and Name in Baseline["benchmarks"]:
+            Change = Result["ops_per_second"] / Baseline["benchmarks"][Name]["ops_per_second"] - 1
+            Line += " (" + ("+" if Change >= 0 else "") + str(round(100 * Change, 1)) + "% on baseline)"
+        print(Line)
+
+
+def Main():
+    """
+    It runs the benchmarks named on the command line, or all of them, and prints their speeds. --output saves the
+    results as JSON, and --baseline compares them with results saved earlier, failing if any benchmark is slower than
+    the baseline by more than the threshold
+    """
+    Parser = argparse.ArgumentParser(description="Dastan benchmarks")
+    Parser.add_argument("names", nargs="*", help="the benchmarks to run, all of them if none are given")
+    Parser.add_argument("--repeats", type=int, default=5)
+    Parser.add_argument("--min-seconds", type=float, default=0.2)
+    Parser.add_argument("--output", help="a JSON file to save the results in")
+    Parser.add_argument("--baseline", help="a JSON file of earlier results to compare with")
+    Parser.add_argument("--threshold", type=float, default=0.1)
+    Arguments = Parser.parse_args()
+    Results = RunBenchmarks(Arguments.names or None, Arguments.repeats, Arguments.min_seconds)
+    Baseline = None
+    if Arguments.baseline is not None:
+        with open(Arguments.baseline) as BaselineFile:
+            Baseline = json.load(BaselineFile)
+    DisplayBenchmarkResults(Results, Baseline)
+    if Arguments.output is not None:
+        with open(Arguments.output, "w") as OutputFile:
+            json.dump(Results, OutputFile, indent=2)
+    if Baseline is not None:
+        Regressions = FindRegressions(Results, Baseline, Arguments.threshold)
+        for Name, BaselineOpsPerSecond, OpsPerSecond in Regressions:
+            print(Name + " has regressed from " + str(round(BaselineOpsPerSecond, 1)) + " to " + str(
+                round(OpsPerSecond, 1)) + " ops/s")
+        if Regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    Main()